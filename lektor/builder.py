@@ -21,12 +21,16 @@ from lektor.build_programs import builtin_build_programs
 from lektor.buildfailures import FailureController
 from lektor.constants import PRIMARY_ALT
 from lektor.context import Context
+from lektor.imagetools.metadata import ImageMetadataCache
+from lektor.manifest import create_manifest_tables
+from lektor.manifest import forget_artifact
 from lektor.reporter import reporter
 from lektor.sourcesearch import find_files
 from lektor.utils import create_temp
 from lektor.utils import fs_enc
 from lektor.utils import process_extra_flags
 from lektor.utils import prune_file_and_folder
+from lektor.videotools import VideoInfoCache
 
 
 def create_tables(con):
@@ -83,6 +87,43 @@ def create_tables(con):
             ) {without_rowid};
         """
         )
+        con.execute(
+            f"""
+            create table if not exists image_info (
+                filename text,
+                mtime_ns integer,
+                size integer,
+                format text,
+                width real,
+                height real,
+                primary key (filename)
+            ) {without_rowid};
+        """
+        )
+        con.execute(
+            f"""
+            create table if not exists image_exif (
+                filename text,
+                mtime_ns integer,
+                size integer,
+                exif blob,
+                primary key (filename)
+            ) {without_rowid};
+        """
+        )
+        con.execute(
+            f"""
+            create table if not exists video_info (
+                filename text,
+                mtime_ns integer,
+                size integer,
+                width integer,
+                height integer,
+                duration integer,
+                primary key (filename)
+            ) {without_rowid};
+        """
+        )
         con.execute(
             f"""
             create table if not exists source_info (
@@ -96,6 +137,7 @@ def create_tables(con):
             ) {without_rowid};
         """
         )
+        create_manifest_tables(con)
     finally:
         con.close()
 
@@ -307,6 +349,7 @@ class BuildState:
             """,
                 [artifact_name],
             )
+            forget_artifact(con, artifact_name)
             con.commit()
         finally:
             con.close()
@@ -767,11 +810,15 @@ class Artifact:
 
     def render_template_into(self, template_name, this, **extra):
         """Renders a template into the artifact."""
-        rv = self.build_state.env.render_template(
+        # The output is streamed into the file, so that large pages need
+        # not be held in memory in their entirety.
+        chunks = self.build_state.env.generate_template(
             template_name, self.build_state.pad, this=this, **extra
         )
         with self.open("wb") as f:
-            f.write(rv.encode("utf-8") + b"\n")
+            for chunk in chunks:
+                f.write(chunk.encode("utf-8"))
+            f.write(b"\n")
 
     def _memorize_dependencies(
         self, dependencies=None, virtual_dependencies=None, for_failure=False
@@ -1038,6 +1085,7 @@ class PathCache:
     def __init__(self, env):
         self.file_info_cache = {}
         self.source_filename_cache = {}
+        self.raw_data_cache = {}
         self.env = env
 
     def to_source_filename(self, filename):
@@ -1085,6 +1133,18 @@ class PathCache:
             self.file_info_cache[fn] = rv = FileInfo(self.env, fn)
         return rv
 
+    def get_raw_data(self, pad, path, alt):
+        """Returns the raw data of a record, as loaded by
+        :meth:`lektor.db.Database.load_raw_data`.  Like file infos, this is
+        cached for the lifetime of the path cache.
+        """
+        key = (path, alt)
+        try:
+            return self.raw_data_cache[key]
+        except KeyError:
+            rv = self.raw_data_cache[key] = pad.db.load_raw_data(path, alt=alt)
+            return rv
+
 
 class Builder:
     def __init__(self, pad, destination_path, buildstate_path=None, extra_flags=None):
@@ -1098,6 +1158,8 @@ class Builder:
         else:
             self.meta_path = os.path.join(self.destination_path, ".lektor")
         self.failure_controller = FailureController(pad, self.destination_path)
+        self.image_metadata_cache = ImageMetadataCache(self.connect_to_database)
+        self.video_info_cache = VideoInfoCache(self.connect_to_database)
 
         try:
             os.makedirs(self.meta_path)
@@ -1222,6 +1284,8 @@ class Builder:
                 build_state.remove_artifact(aft)
 
             build_state.prune_source_infos()
+            self.image_metadata_cache.prune()
+            self.video_info_cache.prune()
             if all:
                 build_state.vacuum()
             self.env.plugin_controller.emit("after-prune", builder=self, all=all)
@@ -1239,6 +1303,8 @@ class Builder:
                 prog=prog,
             )
             prog.build()
+            self.image_metadata_cache.flush()
+            self.video_info_cache.flush()
             if build_state.updated_artifacts:
                 self.update_source_info(prog, build_state)
             self.env.plugin_controller.emit(
@@ -89,6 +89,15 @@ def cli(ctx, project=None, language=None):
     "the state of the build. Defaults to a directory named "
     "`.lektor` inside the output path.",
 )
+@click.option(
+    "--profile-templates",
+    "profile_path",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Record the render times of templates, includes, imports, blocks "
+    "and macros, print a summary after the build, and write the full "
+    "results as JSON to the given file.",
+)
 @extraflag
 @pass_context
 def build_cmd(
@@ -100,6 +109,7 @@ def build_cmd(
     verbosity,
     source_info_only,
     buildstate_path,
+    profile_path,
     extra_flags,
 ):
     """Builds the entire project into the final artifacts.
@@ -129,6 +139,12 @@ def build_cmd(
 
     env = ctx.get_env()
 
+    profiler = None
+    if profile_path is not None:
+        from lektor.environment.profiling import TemplateProfiler
+
+        profiler = env.jinja_env.profiler = TemplateProfiler()
+
     with CliReporter(env, verbosity=verbosity):
         builds = ["first"]
         if watch:
@@ -156,6 +172,11 @@ def build_cmd(
                     builder.prune()
                 success = failures == 0
 
+        if profiler is not None:
+            click.echo(profiler.format_report())
+            profiler.dump(profile_path)
+            click.secho(f"Template profile written to {profile_path}", fg="cyan")
+
         return sys.exit(0 if success else 1)
 
 
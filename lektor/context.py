@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from typing import NamedTuple
 
 from jinja2 import Undefined
 from werkzeug.local import LocalProxy
@@ -60,6 +61,17 @@ def get_locale(default="en_US"):
     return default
 
 
+class DependencyBundle(NamedTuple):
+    """A precomputed set of source filenames which are recorded as
+    dependencies together (see :meth:`Context.record_dependency_bundle`.)
+    """
+
+    # All the dependencies in the bundle.
+    dependencies: frozenset[str]
+    # The subset of the dependencies which affects URL resolution.
+    url_dependencies: frozenset[str]
+
+
 class Context:
     """The context is a thread local object that provides the system with
     general information about in which state it is.  The context is created
@@ -212,6 +224,8 @@ class Context:
         """Sometimes it can happen that while building an artifact another
         artifact needs building.  This function is generally used to record
         this request.
+
+        Returns the new artifact.
         """
         if self.build_state is None:
             raise TypeError(
@@ -226,6 +240,7 @@ class Context:
         )
         self.sub_artifacts.append((aft, build_func))
         reporter.report_sub_artifact(aft)
+        return aft
 
     def record_dependency(self, filename, affects_url=None):
         """Records a dependency from processing.
@@ -239,12 +254,34 @@ class Context:
         for coll in self._dependency_collectors:
             coll(filename)
 
+    def record_dependency_bundle(self, bundle):
+        """Records all the dependencies in a :class:`DependencyBundle`.
+
+        This is equivalent to, but cheaper than, calling
+        :meth:`record_dependency` for each of them.
+        """
+        if self._resolving_url:
+            dependencies = bundle.url_dependencies
+        else:
+            dependencies = bundle.dependencies
+        self.referenced_dependencies |= dependencies
+        for coll in self._dependency_collectors:
+            for filename in dependencies:
+                coll(filename)
+
     def record_virtual_dependency(self, virtual_source):
         """Records a dependency from processing."""
         self.referenced_virtual_dependencies.add(virtual_source)
         for coll in self._dependency_collectors:
             coll(virtual_source)
 
+    @property
+    def gathering_dependencies(self):
+        """Whether dependencies are being gathered (see
+        :meth:`gather_dependencies`).
+        """
+        return bool(self._dependency_collectors)
+
     @contextmanager
     def gather_dependencies(self, func):
         """For the duration of the `with` block the provided function will be
@@ -1,11 +1,14 @@
 import errno
+import hashlib
 import json
 import os
 from collections import OrderedDict
 
 from inifile import IniFile
+from jinja2.utils import LRUCache
 
 from lektor.context import get_ctx
+from lektor.sourceobj import VirtualSourceObject
 from lektor.utils import decode_flat_data
 from lektor.utils import iter_dotted_path_prefixes
 from lektor.utils import merge
@@ -27,6 +30,120 @@ def load_databag(filename):
         return None
 
 
+def _read_only(*args, **kwargs):
+    raise TypeError("databag values are read-only")
+
+
+class _FrozenDict(OrderedDict):
+    """A read-only ``OrderedDict``, used for values shared between pads.
+
+    Copying one (e.g. with :func:`copy.deepcopy`) gives a plain, mutable
+    ``OrderedDict``.
+    """
+
+    def __init__(self, items=()):
+        super().__init__()
+        for key, value in items:
+            OrderedDict.__setitem__(self, key, value)
+
+    def __reduce__(self):
+        return OrderedDict, (list(self.items()),)
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = move_to_end = _read_only
+
+
+class _FrozenList(list):
+    """A read-only ``list``, used for values shared between pads.
+
+    Copying one (e.g. with :func:`copy.deepcopy`) gives a plain list.
+    """
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = _read_only
+    sort = reverse = _read_only
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return _FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return _FrozenList(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, dict):
+        return OrderedDict((k, _thaw(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_thaw(v) for v in value]
+    return value
+
+
+# The maximum number of parsed databag files to keep
+DATABAG_CACHE_SIZE = 64
+
+
+class _DatabagCache:
+    """Caches parsed databag files, keyed by their mtime and size.
+
+    This is shared between all pads, so that large databags are not
+    re-parsed for every pad.  The cached values are read-only.  At most
+    :data:`DATABAG_CACHE_SIZE` files are kept, the least recently used
+    being discarded first.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(DATABAG_CACHE_SIZE)
+
+    def load(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return _freeze(load_databag(filename))
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(filename)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        rv = _freeze(load_databag(filename))
+        self._cache[filename] = (stamp, rv)
+        return rv
+
+
+_databag_cache = _DatabagCache()
+
+
+class DatabagValue(VirtualSourceObject):  # pylint: disable=abstract-method
+    def __init__(self, record, key):
+        """Virtual source representing the value found by looking up a
+        dotted key in the databags.
+        """
+        VirtualSourceObject.__init__(self, record)
+        self.key = key
+
+    @property
+    def path(self):
+        # Used as a key in Context.referenced_virtual_dependencies.
+        return f"{self.record.path}@databag/{self.key}"
+
+    def iter_source_filenames(self):
+        # The value is covered by the checksum.
+        return ()
+
+    def get_checksum(self, path_cache):
+        value, _, _ = self.pad.databags.resolve(self.key)
+        return hashlib.sha1(json.dumps(value, default=repr).encode()).hexdigest()
+
+
+def databag_resolver(node, url_path):
+    if not url_path or node.path != "/":
+        return None
+    return DatabagValue(node, "/".join(url_path))
+
+
 class Databags:
     def __init__(self, env):
         self.env = env
@@ -42,21 +159,27 @@ class Databags:
         except OSError:
             pass
 
-    def get_bag(self, name):
+    def _load_bag(self, name):
         sources = self._known_bags.get(name)
         if not sources:
-            return None
+            return None, ()
         rv = self._bags.get(name)
         if rv is None:
-            filenames = []
-            rv = OrderedDict()
-            for filename in sources:
-                filename = os.path.join(self.root_path, filename)
-                rv = merge(rv, load_databag(filename))
-                filenames.append(filename)
-            self._bags[name] = (rv, filenames)
-        else:
-            rv, filenames = rv
+            filenames = [os.path.join(self.root_path, x) for x in sources]
+            bags = [_databag_cache.load(x) for x in filenames]
+            if len(bags) == 1:
+                bag = bags[0]
+            else:
+                # The cached values are read-only, so merge copies of them.
+                bag = OrderedDict()
+                for data in bags:
+                    bag = merge(bag, _thaw(data))
+                bag = _freeze(bag)
+            rv = self._bags[name] = (bag, filenames)
+        return rv
+
+    def get_bag(self, name):
+        rv, filenames = self._load_bag(name)
 
         ctx = get_ctx()
         if ctx is not None:
@@ -65,11 +188,31 @@ class Databags:
 
         return rv
 
-    def lookup(self, key):
+    def resolve(self, key):
+        """Looks up a dotted key without recording any dependencies.
+
+        Returns a tuple of the value, the local key within the bag it was
+        found in, and the filenames of that bag.
+        """
         for prefix, local_key in iter_dotted_path_prefixes(key):
-            bag = self.get_bag(prefix)
+            bag, filenames = self._load_bag(prefix)
             if bag is not None:
                 if local_key is None:
-                    return bag
-                return resolve_dotted_value(bag, local_key)
-        return None
+                    return bag, None, filenames
+                return resolve_dotted_value(bag, local_key), local_key, filenames
+        return None, None, ()
+
+    def lookup(self, key):
+        rv, local_key, filenames = self.resolve(key)
+
+        ctx = get_ctx()
+        if ctx is not None:
+            root = ctx.pad.root
+            if local_key is not None and root is not None and "@" not in key:
+                # Only depend on the part of the bag that was looked up.
+                ctx.record_virtual_dependency(DatabagValue(root, key))
+            else:
+                for filename in filenames:
+                    ctx.record_dependency(filename)
+
+        return rv
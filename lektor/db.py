@@ -8,6 +8,7 @@ import operator
 import os
 import posixpath
 from collections import OrderedDict
+from contextlib import ExitStack
 from datetime import timedelta
 from functools import total_ordering
 from itertools import chain
@@ -27,6 +28,7 @@ from lektor import metaformat
 from lektor.assets import get_asset_root
 from lektor.constants import PRIMARY_ALT
 from lektor.context import Context
+from lektor.context import DependencyBundle
 from lektor.context import get_ctx
 from lektor.databags import Databags
 from lektor.datamodel import load_datamodels
@@ -34,7 +36,9 @@ from lektor.datamodel import load_flowblocks
 from lektor.editor import make_editor_session
 from lektor.filecontents import FileContents
 from lektor.imagetools import get_image_info
+from lektor.imagetools import make_image_picture
 from lektor.imagetools import make_image_thumbnail
+from lektor.imagetools import make_image_thumbnails
 from lektor.imagetools import read_exif
 from lektor.imagetools import ThumbnailMode
 from lektor.sourceobj import DBSourceObject
@@ -43,12 +47,12 @@ from lektor.utils import cleanup_path
 from lektor.utils import cleanup_url_path
 from lektor.utils import deprecated
 from lektor.utils import fs_enc
-from lektor.utils import locate_executable
 from lektor.utils import make_relative_url
 from lektor.utils import sort_normalize_string
 from lektor.utils import split_virtual_path
 from lektor.utils import untrusted_to_os_path
 from lektor.videotools import get_video_info
+from lektor.videotools import locate_video_executable
 from lektor.videotools import make_video_thumbnail
 
 
@@ -167,6 +171,15 @@ class Expression:  # noqa: PLW1641
         # pylint: disable=no-self-use
         return record
 
+    def _cache_key(self):
+        """A hashable value which identifies the expression, or `None`.
+
+        Two expressions with equal cache keys must always evaluate to
+        the same value.  `None` is returned if this can not be guaranteed.
+        """
+        # pylint: disable=no-self-use
+        return None
+
     def __eq__(self, other):
         return _BinExpr(self, _auto_wrap_expr(other), operator.eq)
 
@@ -195,32 +208,16 @@ class Expression:  # noqa: PLW1641
         return _ContainmentExpr(self, _auto_wrap_expr(item))
 
     def startswith(self, other):
-        return _BinExpr(
-            self,
-            _auto_wrap_expr(other),
-            lambda a, b: str(a).lower().startswith(str(b).lower()),
-        )
+        return _BinExpr(self, _auto_wrap_expr(other), _startswith)
 
     def endswith(self, other):
-        return _BinExpr(
-            self,
-            _auto_wrap_expr(other),
-            lambda a, b: str(a).lower().endswith(str(b).lower()),
-        )
+        return _BinExpr(self, _auto_wrap_expr(other), _endswith)
 
     def startswith_cs(self, other):
-        return _BinExpr(
-            self,
-            _auto_wrap_expr(other),
-            lambda a, b: str(a).startswith(str(b)),
-        )
+        return _BinExpr(self, _auto_wrap_expr(other), _startswith_cs)
 
     def endswith_cs(self, other):
-        return _BinExpr(
-            self,
-            _auto_wrap_expr(other),
-            lambda a, b: str(a).endswith(str(b)),
-        )
+        return _BinExpr(self, _auto_wrap_expr(other), _endswith_cs)
 
     def false(self):
         return _IsBoolExpr(self, False)
@@ -229,6 +226,22 @@ class Expression:  # noqa: PLW1641
         return _IsBoolExpr(self, True)
 
 
+def _startswith(a, b):
+    return str(a).lower().startswith(str(b).lower())
+
+
+def _endswith(a, b):
+    return str(a).lower().endswith(str(b).lower())
+
+
+def _startswith_cs(a, b):
+    return str(a).startswith(str(b))
+
+
+def _endswith_cs(a, b):
+    return str(a).endswith(str(b))
+
+
 # Query helpers for the template engine
 setattr(Expression, "and", lambda x, o: x & o)
 setattr(Expression, "or", lambda x, o: x | o)
@@ -253,6 +266,12 @@ class _IsBoolExpr(Expression):
             not is_undefined(val) and val not in (None, 0, False, "")
         ) == self.__true
 
+    def _cache_key(self):
+        expr_key = self.__expr._cache_key()
+        if expr_key is None:
+            return None
+        return self.__class__, expr_key, self.__true
+
 
 class _Literal(Expression):
     def __init__(self, value):
@@ -261,6 +280,13 @@ class _Literal(Expression):
     def __eval__(self, record):
         return self.__value
 
+    def _cache_key(self):
+        try:
+            hash(self.__value)
+        except TypeError:
+            return None
+        return self.__class__, type(self.__value), self.__value
+
 
 class _BinExpr(Expression):
     def __init__(self, left, right, op):
@@ -271,6 +297,13 @@ class _BinExpr(Expression):
     def __eval__(self, record):
         return self.__op(self.__left.__eval__(record), self.__right.__eval__(record))
 
+    def _cache_key(self):
+        left_key = self.__left._cache_key()
+        right_key = self.__right._cache_key()
+        if left_key is None or right_key is None:
+            return None
+        return self.__class__, left_key, right_key, self.__op
+
 
 class _ContainmentExpr(Expression):
     def __init__(self, seq, item):
@@ -284,6 +317,13 @@ class _ContainmentExpr(Expression):
             item = item["_id"]
         return item in seq
 
+    def _cache_key(self):
+        seq_key = self.__seq._cache_key()
+        item_key = self.__item._cache_key()
+        if seq_key is None or item_key is None:
+            return None
+        return self.__class__, seq_key, item_key
+
 
 class _RecordQueryField(Expression):
     def __init__(self, field):
@@ -295,6 +335,9 @@ class _RecordQueryField(Expression):
         except KeyError:
             return Undefined(obj=record, name=self.__field)
 
+    def _cache_key(self):
+        return self.__class__, self.__field
+
 
 class _RecordQueryProxy:
     def __getattr__(self, name):
@@ -320,6 +363,7 @@ class Record(DBSourceObject):
         super().__init__(pad)
         self._data = data
         self._bound_data = {}
+        self._field_dependencies = {}
         if page_num is not None and not self.supports_pagination:
             raise RuntimeError(f"{self.__class__.__name__} does not support pagination")
         self.page_num = page_num
@@ -337,6 +381,10 @@ class Record(DBSourceObject):
             # If we cannot find the model we fall back to the default one.
             return self.pad.db.default_model
 
+    @cached_property
+    def _dependency_bundle(self):
+        return self.pad.db.get_dependency_bundle(self)
+
     @property
     def alt(self):
         """Returns the alt of this source object."""
@@ -468,9 +516,11 @@ class Record(DBSourceObject):
         return rv
 
     def __contains__(self, name):
+        self._track_field_dependency(name)
         return name in self._data and not is_undefined(self._data[name])
 
     def __getitem__(self, name):
+        self._track_field_dependency(name)
         rv = self._bound_data.get(name, Ellipsis)
         if rv is not Ellipsis:
             return rv
@@ -480,6 +530,29 @@ class Record(DBSourceObject):
         self._bound_data[name] = rv
         return rv
 
+    def _get_field_dependency(self, name):
+        # All system fields are tracked together.
+        if name.startswith("_"):
+            name = FieldDependency.SYSTEM_FIELDS
+        rv = self._field_dependencies.get(name)
+        if rv is None:
+            rv = self._field_dependencies[name] = FieldDependency(self, name)
+        return rv
+
+    def _track_field_dependency(self, name):
+        """Records a dependency on the value of a field if field dependencies
+        are enabled and the record is being accessed while building some
+        other source, or while the dependencies of something which may be
+        reused elsewhere (e.g. a cached query) are being gathered.
+        """
+        ctx = get_ctx()
+        if ctx is None:
+            return
+        if ctx.source is self and not ctx.gathering_dependencies:
+            return
+        if self.pad.db.config.field_dependencies:
+            ctx.record_virtual_dependency(self._get_field_dependency(name))
+
     def __repr__(self):
         bits = [
             f"model={self._data['_model']!r}",
@@ -528,15 +601,176 @@ class Siblings(VirtualSourceObject):  # pylint: disable=abstract-method
         return max(mtimes) if mtimes else None
 
     def get_checksum(self, path_cache):
-        sums = "|".join(i.filename_and_checksum for i in self._file_infos(path_cache))
+        # The contents of the neighboring pages are tracked as regular
+        # dependencies (see iter_source_filenames), so here it is
+        # sufficient to identify which pages the neighbors are.
+        if self._prev_page is None and self._next_page is None:
+            return None
+        return "|".join(
+            page.path if page is not None else ""
+            for page in (self._prev_page, self._next_page)
+        )
+
 
-        return sums or None
+class SiblingIndex:
+    """The ordered sequence of children of a record used for prev/next navigation.
+
+    Uses the record's pagination query, if any, else its "children" query.
+    The index is computed once per pad (see :meth:`Pad.get_sibling_index`), so
+    that looking up the siblings of each child is a constant time operation.
+    """
+
+    def __init__(self, parent):
+        self.pad = parent.pad
+
+        # Don't track dependencies for this part.
+        with Context(pad=self.pad):
+            if parent.datamodel.pagination_config.enabled:
+                pagination = parent.pagination
+                siblings = pagination.config.get_pagination_query(parent)
+            else:
+                siblings = parent.children
+            self._keys = [(sibling.path, sibling.alt) for sibling in siblings]
+
+        self._positions = {key: idx for idx, key in enumerate(self._keys)}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _get(self, idx):
+        if not 0 <= idx < len(self._keys):
+            return None
+        path, alt = self._keys[idx]
+        with Context(pad=self.pad):
+            return self.pad.get(path, alt=alt, persist=False)
+
+    def get_neighbors(self, record):
+        """Return a ``(prev, next)`` tuple of the siblings of ``record``.
+
+        Either may be ``None``.  If ``record`` is not in the index, both are.
+        """
+        idx = self._positions.get((record.path, record.alt))
+        if idx is None:
+            return None, None
+        return self._get(idx - 1), self._get(idx + 1)
 
 
 def siblings_resolver(node, url_path):
     return node.get_siblings()
 
 
+class CollectionFingerprint(VirtualSourceObject):  # pylint: disable=abstract-method
+    def __init__(self, record):
+        """Virtual source representing the items stored below 'record'.
+
+        When the ``collection_fingerprints`` project setting is enabled,
+        queries depend on this rather than on the source files of each of
+        the items they iterate over.
+        """
+        VirtualSourceObject.__init__(self, record)
+        self._path = record.path + "@collection"
+
+    @property
+    def path(self):
+        # Used as a key in Context.referenced_virtual_dependencies.
+        return self._path
+
+    def iter_source_filenames(self):
+        # The item files are covered by the checksum.
+        return ()
+
+    def _iter_item_filenames(self):
+        db = self.pad.db
+        dir_path = db.to_fs_path(self.record["_path"])
+        content_files = ["contents.lr"]
+        if self.alt != PRIMARY_ALT:
+            content_files.append(f"contents+{self.alt}.lr")
+        try:
+            names = os.listdir(dir_path)
+        except OSError:
+            return
+        for name in names:
+            if db.env.is_uninteresting_source_name(name):
+                continue
+            filename = os.path.join(dir_path, name)
+            if os.path.isdir(filename):
+                for content_file in content_files:
+                    yield os.path.join(filename, content_file)
+            else:
+                # Attachments and their metadata files.
+                yield filename
+
+    def get_mtime(self, path_cache):
+        mtimes = [
+            info.mtime
+            for info in map(path_cache.get_file_info, self._iter_item_filenames())
+            if info.exists
+        ]
+        return max(mtimes) if mtimes else None
+
+    def get_checksum(self, path_cache):
+        dir_path = self.pad.db.to_fs_path(self.record["_path"])
+        h = hashlib.sha1()
+        for filename in sorted(self._iter_item_filenames()):
+            info = path_cache.get_file_info(filename)
+            if info.exists:
+                relname = os.path.relpath(filename, dir_path)
+                h.update(f"{relname}\0{info.mtime}\0{info.size}\0".encode())
+        return h.hexdigest()
+
+
+class FieldDependency(VirtualSourceObject):  # pylint: disable=abstract-method
+    # The pseudo field name used to track all system fields.
+    SYSTEM_FIELDS = "_system"
+
+    def __init__(self, record, field):
+        """Virtual source representing the value of a field of 'record'.
+
+        When the ``field_dependencies`` project setting is enabled, this is
+        what records which are iterated over by queries are tracked by.
+        """
+        VirtualSourceObject.__init__(self, record)
+        self.field = field
+        self._path = f"{record._data['_path']}@field/{field}"
+
+    @property
+    def path(self):
+        # Used as a key in Context.referenced_virtual_dependencies.
+        return self._path
+
+    def iter_source_filenames(self):
+        # The field value is covered by the checksum.
+        return ()
+
+    def get_checksum(self, path_cache):
+        # Each field of a record is checked separately, so only load the
+        # record's contents once.
+        raw_data = path_cache.get_raw_data(
+            self.pad, self.record._data["_path"], self.alt
+        )
+        if raw_data is None:
+            return None
+        if self.field == self.SYSTEM_FIELDS:
+            value = sorted(
+                (key, value) for key, value in raw_data.items() if key[:1] == "_"
+            )
+        else:
+            value = raw_data.get(self.field)
+        return hashlib.sha1(repr(value).encode()).hexdigest()
+
+
+def field_resolver(node, url_path):
+    if len(url_path) != 1 or not isinstance(node, Record):
+        return None
+    return node._get_field_dependency(url_path[0])
+
+
+def collection_resolver(node, url_path):
+    if url_path or not isinstance(node, Record) or node.is_attachment:
+        return None
+    return CollectionFingerprint(node)
+
+
 class Page(Record):
     """This represents a loaded record."""
 
@@ -710,31 +944,7 @@ class Page(Record):
 
     @cached_property
     def _siblings(self):
-        parent = self.parent
-        pagination_enabled = parent.datamodel.pagination_config.enabled
-
-        # Don't track dependencies for this part.
-        with Context(pad=self.pad):
-            if pagination_enabled:
-                pagination = parent.pagination
-                siblings = list(pagination.config.get_pagination_query(parent))
-            else:
-                siblings = list(parent.children)
-
-            prev_item, next_item = None, None
-            try:
-                me = siblings.index(self)
-            except ValueError:
-                # Self not in parents.children or not in parents.pagination.
-                pass
-            else:
-                if me > 0:
-                    prev_item = siblings[me - 1]
-
-                if me + 1 < len(siblings):
-                    next_item = siblings[me + 1]
-
-        return prev_item, next_item
+        return self.pad.get_sibling_index(self.parent).get_neighbors(self)
 
 
 class Attachment(Record):
@@ -826,7 +1036,17 @@ class Image(Attachment):
             return rv
         return Undefined("The format of the image could not be determined.")
 
-    def thumbnail(self, width=None, height=None, mode=None, upscale=None, quality=None):
+    def thumbnail(
+        self,
+        width=None,
+        height=None,
+        mode=None,
+        upscale=None,
+        quality=None,
+        *,
+        format=None,
+        effort=None,
+    ):
         """Utility to create thumbnails."""
 
         if mode is None:
@@ -848,6 +1068,49 @@ class Image(Attachment):
             mode=mode,
             upscale=upscale,
             quality=quality,
+            format=format,
+            effort=effort,
+        )
+
+    def thumbnails(self, widths, upscale=None, quality=None, format=None, effort=None):
+        """Utility to create thumbnails of several widths at once.
+
+        The result can be iterated over, and converts to a string suitable
+        for the ``srcset`` attribute of an ``<img>`` tag.
+        """
+        return make_image_thumbnails(
+            _require_ctx(self),
+            self.attachment_filename,
+            self.url_path,
+            [int(width) for width in widths],
+            upscale=upscale,
+            quality=quality,
+            format=format,
+            effort=effort,
+        )
+
+    def srcset(self, widths, upscale=None, quality=None, format=None, effort=None):
+        """Utility to create thumbnails of several widths, returning the
+        value for the ``srcset`` attribute of an ``<img>`` tag.
+        """
+        return self.thumbnails(
+            widths, upscale=upscale, quality=quality, format=format, effort=effort
+        ).srcset
+
+    def picture(self, widths, formats=None, upscale=None, quality=None):
+        """Utility to create the thumbnails for a ``<picture>`` element: sets
+        of thumbnails of several widths in modern formats (by default, those
+        of AVIF and WebP which are supported), and a fallback set in the
+        format of the image.
+        """
+        return make_image_picture(
+            _require_ctx(self),
+            self.attachment_filename,
+            self.url_path,
+            [int(width) for width in widths],
+            formats=formats,
+            upscale=upscale,
+            quality=quality,
         )
 
 
@@ -855,7 +1118,7 @@ def require_ffmpeg(f):
     """Decorator to help with error messages for ffmpeg template functions."""
     # If both ffmpeg and ffprobe executables are available we don't need to
     # override the function
-    if locate_executable("ffmpeg") and locate_executable("ffprobe"):
+    if locate_video_executable("ffmpeg") and locate_video_executable("ffprobe"):
         return f
 
     @functools.wraps(f)
@@ -1040,6 +1303,21 @@ class Query:
         if ctx is not None:
             ctx.record_dependency(self.pad.db.to_fs_path(self.path))
 
+        # Optionally, a single fingerprint of the collection takes the
+        # place of the dependencies on the source files of the items.
+        # If field dependencies are enabled, items are instead tracked by
+        # the values of the fields that are read from them.
+        track_fields = ctx is not None and self.pad.db.config.field_dependencies
+        use_fingerprint = (
+            ctx is not None
+            and not track_fields
+            and self_record is not None
+            and not self_record.is_attachment
+            and self.pad.db.config.collection_fingerprints
+        )
+        if use_fingerprint:
+            self.pad.db.track_record_dependency(CollectionFingerprint(self_record))
+
         for name, _, is_attachment in self.pad.db.iter_items(self.path, alt=self.alt):
             if not (
                 (is_attachment == self._include_attachments)
@@ -1047,7 +1325,18 @@ class Query:
             ):
                 continue
 
-            record = self._get(name, persist=False)
+            if use_fingerprint or track_fields:
+                # Don't track dependencies for this part.
+                with Context(pad=self.pad):
+                    record = self._get(name, persist=False)
+                for filename in self.pad.db.get_model_dependencies(record.datamodel):
+                    ctx.record_dependency(filename)
+                if track_fields:
+                    ctx.record_virtual_dependency(
+                        record._get_field_dependency(FieldDependency.SYSTEM_FIELDS)
+                    )
+            else:
+                record = self._get(name, persist=False)
             if self._matches(record):
                 yield record
 
@@ -1136,6 +1425,7 @@ class Query:
         rv = set()
 
         for item in self:
+            item._track_field_dependency(fieldname)
             if fieldname in item._data:
                 value = item._data[fieldname]
                 if isinstance(value, (list, tuple)):
@@ -1161,13 +1451,51 @@ class Query:
 
     __nonzero__ = __bool__
 
+    def _get_cache_key(self, order_by):
+        """The key under which the sorted results of this query are kept in
+        the pad's query cache, or `None` if they can not be cached.
+        """
+        if type(self)._iterate is not Query._iterate:
+            return None
+        filter_keys = []
+        for filter in self._filters or ():
+            filter_key = filter._cache_key()
+            if filter_key is None:
+                return None
+            filter_keys.append(filter_key)
+        return (
+            type(self),
+            self.path,
+            self.alt,
+            self._include_pages,
+            self._include_attachments,
+            self._include_hidden,
+            self._include_undiscoverable,
+            self._page_num,
+            tuple(filter_keys),
+            tuple(order_by),
+        )
+
+    def _iter_sorted(self, order_by):
+        return sorted(self._iterate(), key=lambda x: x.get_sort_key(order_by))
+
     def __iter__(self):
         """Iterates over all records matched."""
-        iterable = self._iterate()
-
         order_by = self.get_order_by()
-        if order_by:
-            iterable = sorted(iterable, key=lambda x: x.get_sort_key(order_by))
+        if not order_by:
+            iterable = self._iterate()
+        else:
+            # Sorting requires loading all matching records anyway, so
+            # the sorted results are cached.  The offset and limit are
+            # applied afterwards, so that all pages of a paginated query
+            # share the same cache entry.
+            cache_key = self._get_cache_key(order_by)
+            if cache_key is None:
+                iterable = self._iter_sorted(order_by)
+            else:
+                iterable = self.pad.query_cache.get(
+                    cache_key, lambda: self._iter_sorted(order_by), self.pad
+                )
 
         if self._offset is not None or self._limit is not None:
             iterable = islice(
@@ -1294,6 +1622,8 @@ class Database:
         self.config = config
         self.datamodels = load_datamodels(env)
         self.flowblocks = load_flowblocks(env)
+        self._dependent_models = {}
+        self._model_dependencies = {}
 
     def to_fs_path(self, path):
         """Convenience function to convert a path into an file system path."""
@@ -1432,6 +1762,13 @@ class Database:
         return self.get_implied_datamodel(path, is_attachment, pad, datamodel=datamodel)
 
     def iter_dependent_models(self, datamodel):
+        dependent_models = self._dependent_models.get(datamodel)
+        if dependent_models is None:
+            dependent_models = self._find_dependent_models(datamodel)
+            self._dependent_models[datamodel] = dependent_models
+        return iter(dependent_models)
+
+    def _find_dependent_models(self, datamodel):
         seen = set()
 
         def deep_find(datamodel):
@@ -1450,7 +1787,45 @@ class Database:
 
         deep_find(datamodel)
         seen.discard(datamodel)
-        return iter(seen)
+        return frozenset(seen)
+
+    def get_model_dependencies(self, datamodel):
+        """The filenames of a datamodel and the datamodels it depends on."""
+        rv = self._model_dependencies.get(datamodel)
+        if rv is None:
+            rv = set()
+            if datamodel.filename:
+                rv.add(datamodel.filename)
+                for dep_model in self.iter_dependent_models(datamodel):
+                    if dep_model.filename:
+                        rv.add(dep_model.filename)
+            rv = self._model_dependencies[datamodel] = frozenset(rv)
+        return rv
+
+    def get_dependency_bundle(self, record):
+        """Computes the :class:`~lektor.context.DependencyBundle` of the
+        source files that a record depends on.
+        """
+        url_dependencies = set()
+        dependencies = set()
+        for filename in record.iter_source_filenames():
+            # For Attachments, the actually attachment data
+            # does not affect the URL of the attachment.
+            if not (
+                isinstance(record, Attachment)
+                and filename == record.attachment_filename
+            ):
+                url_dependencies.add(filename)
+            dependencies.add(filename)
+        datamodel = getattr(record, "datamodel", None)
+        if datamodel:
+            # XXX: In the case that our datamodel is implied, then the
+            # datamodel depends on the datamodel(s) of our parent(s).
+            # We do not currently record that.
+            model_dependencies = self.get_model_dependencies(datamodel)
+            url_dependencies |= model_dependencies
+            dependencies |= model_dependencies
+        return DependencyBundle(frozenset(dependencies), frozenset(url_dependencies))
 
     def get_implied_datamodel(
         self, path, is_attachment=False, pad=None, datamodel=None
@@ -1493,24 +1868,14 @@ class Database:
     def track_record_dependency(self, record):
         ctx = get_ctx()
         if ctx is not None:
-            for filename in record.iter_source_filenames():
-                if isinstance(record, Attachment):
-                    # For Attachments, the actually attachment data
-                    # does not affect the URL of the attachment.
-                    affects_url = filename != record.attachment_filename
-                else:
-                    affects_url = True
-                ctx.record_dependency(filename, affects_url=affects_url)
+            if isinstance(record, Record):
+                # A record's source files do not change over its lifetime.
+                bundle = record._dependency_bundle
+            else:
+                bundle = self.get_dependency_bundle(record)
+            ctx.record_dependency_bundle(bundle)
             if isinstance(record, VirtualSourceObject):
                 ctx.record_virtual_dependency(record)
-            if getattr(record, "datamodel", None) and record.datamodel.filename:
-                ctx.record_dependency(record.datamodel.filename)
-                for dep_model in self.iter_dependent_models(record.datamodel):
-                    if dep_model.filename:
-                        ctx.record_dependency(dep_model.filename)
-            # XXX: In the case that our datamodel is implied, then the
-            # datamodel depends on the datamodel(s) of our parent(s).
-            # We do not currently record that.
         return record
 
     def process_data(self, data, datamodel, pad):
@@ -1575,7 +1940,9 @@ class Pad:
     def __init__(self, db: Database):
         self.db = db
         self.cache = RecordCache(db.config["EPHEMERAL_RECORD_CACHE_SIZE"])
+        self.query_cache = QueryCache(db.config["QUERY_CACHE_SIZE"])
         self.databags = Databags(db.env)
+        self._sibling_indexes = {}
 
     @property
     def config(self) -> Config:
@@ -1653,22 +2020,78 @@ class Pad:
                     alt = self.db.config.primary_alternative or PRIMARY_ALT
                 else:
                     alt = PRIMARY_ALT
-            node = self.get_root(alt=alt)
-            if node is None:
-                raise RuntimeError("Tree root could not be found.")
-
             pieces = clean_path.split("/")
             if pieces == [""]:
                 pieces = []
 
-            rv = node.resolve_url_path(pieces)
+            rv = self._resolve_record_route(alt, pieces)
+            if rv is Ellipsis:
+                node = self.get_root(alt=alt)
+                if node is None:
+                    raise RuntimeError("Tree root could not be found.")
+                rv = node.resolve_url_path(pieces)
             if rv is not None and (include_invisible or rv.is_visible):
                 return rv
 
         if include_assets:
-            return self.asset_root.resolve_url_path(pieces)
+            rv = self._resolve_asset_route(pieces)
+            if rv is Ellipsis:
+                rv = self.asset_root.resolve_url_path(pieces)
+            return rv
+        return None
+
+    @cached_property
+    def route_table(self):
+        """The :class:`lektor.routing.RouteTable` used to resolve URL paths.
+
+        The route table is only used if the environment has a
+        ``route_table_cache`` (e.g. because the project is being watched by
+        the development server), in which case it is shared with other pads.
+        Otherwise this is ``None``, and URL paths are resolved by walking
+        the record tree, since building the table for a single pad would
+        cost a walk of the whole tree.
+        """
+        route_table_cache = self.env.route_table_cache
+        if route_table_cache is not None:
+            return route_table_cache.get(self)
         return None
 
+    def _resolve_record_route(self, alt, pieces):
+        """Resolve a URL path to a record using the route table.
+
+        Returns ``Ellipsis`` if the route table can not resolve the URL path.
+        """
+        route_table = self.route_table
+        if route_table is None:
+            return Ellipsis
+        route = route_table.lookup_record(alt, pieces)
+        if route is None or route is Ellipsis:
+            return route
+        rv = self.get(route.path, alt=route.alt, page_num=route.page_num, persist=False)
+        if rv is None:
+            # The route table is out of date
+            return Ellipsis
+        return rv
+
+    def _resolve_asset_route(self, pieces):
+        """Resolve a URL path to an asset using the route table.
+
+        Returns ``Ellipsis`` if the route table can not resolve the URL path.
+        """
+        route_table = self.route_table
+        if route_table is None:
+            return Ellipsis
+        names = route_table.lookup_asset(pieces)
+        if names is None or names is Ellipsis:
+            return names
+        asset = self.asset_root
+        for name in names:
+            asset = asset.get_child(name)
+            if asset is None:
+                # The route table is out of date
+                return Ellipsis
+        return asset
+
     def get_root(self, alt=None):
         """The root page of the database."""
         if alt is None:
@@ -1777,6 +2200,9 @@ class Pad:
             return None
 
         rv = self.instance_from_data(raw_data, page_num=page_num)
+        profiler = self.env.jinja_env.profiler
+        if profiler is not None:
+            profiler.record_loaded()
 
         if persist:
             self.cache.persist(rv)
@@ -1827,6 +2253,18 @@ class Pad:
         cls = self.db.get_record_class(datamodel, data)
         return cls(self, data, page_num=page_num)
 
+    def get_sibling_index(self, record):
+        """Returns the :class:`SiblingIndex` for the children of a record.
+
+        The index is computed on first use and cached for the lifetime of
+        the pad.
+        """
+        key = (record["_path"], record.alt)
+        rv = self._sibling_indexes.get(key)
+        if rv is None:
+            rv = self._sibling_indexes[key] = SiblingIndex(record)
+        return rv
+
     def query(self, path=None, alt=PRIMARY_ALT):
         """Queries the database either at root level or below a certain
         path.  This is the recommended way to interact with toplevel data.
@@ -2148,6 +2586,51 @@ class Tree:
         )
 
 
+class QueryCache:
+    """The query cache holds the (sorted) results of queries, along with
+    the dependencies which were recorded while computing them.
+
+    When a cached result is reused, those dependencies are recorded again
+    in the current context, so that dependency tracking is not affected by
+    the cache.
+    """
+
+    def __init__(self, cache_size=100):
+        self.results = LRUCache(cache_size)
+
+    def flush(self):
+        """Flushes the cache"""
+        self.results.clear()
+
+    def get(self, cache_key, compute, pad):
+        """Returns the cached results for a query, computing them using the
+        ``compute`` function if necessary.
+        """
+        ctx = get_ctx()
+        if ctx is not None and ctx._resolving_url:
+            # Some dependencies are to be ignored while resolving URLs, so
+            # what we would record differs from what we would replay.
+            return compute()
+
+        cached = self.results.get(cache_key)
+        if cached is None:
+            dependencies = {}
+            with ExitStack() as stack:
+                if ctx is None:
+                    ctx = stack.enter_context(Context(pad=pad))
+                stack.enter_context(ctx.gather_dependencies(dependencies.setdefault))
+                records = list(compute())
+            cached = self.results[cache_key] = (records, tuple(dependencies))
+        elif ctx is not None:
+            records, dependencies = cached
+            for dependency in dependencies:
+                if isinstance(dependency, str):
+                    ctx.record_dependency(dependency)
+                else:
+                    ctx.record_virtual_dependency(dependency)
+        return cached[0]
+
+
 class RecordCache:
     """The record cache holds records either in an persistent or ephemeral
     section which helps the pad not load records it already saw.
@@ -115,3 +115,91 @@ def new_theme(ctx, **defaults):
 
     project = ctx.get_project(silent=True)
     theme_quickstart(defaults, project=project)
+
+
+@cli.command("thumbnail-cache", short_help="Shows or prunes the thumbnail cache.")
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Evict the least recently used thumbnails until the cache fits "
+    "within its size limit.",
+)
+@click.option(
+    "--max-size",
+    type=click.IntRange(min=0),
+    default=None,
+    help="The size limit to prune to, in megabytes.  Defaults to the "
+    "`thumbnail_cache_size` of the project.",
+)
+@pass_context
+def thumbnail_cache_cmd(ctx, prune, max_size):
+    """Shows statistics about the thumbnail cache.
+
+    Thumbnails are cached in the Lektor cache directory, shared between
+    all projects, so that they survive `lektor clean` and builds into
+    other output paths.  With `--prune`, the least recently used thumbnails
+    are evicted until the cache is within the given size.
+    """
+    from lektor.imagetools.cache import ThumbnailCache
+
+    megabyte = 1024 * 1024
+    cache = ThumbnailCache(ctx.get_project().get_thumbnail_cache_path())
+    stats = cache.stats()
+    click.echo(f"Thumbnail cache: {cache.directory}")
+    click.echo(f"  {stats.count} thumbnails, {stats.size / megabyte:.1f} MB")
+
+    if prune:
+        if max_size is not None:
+            limit = max_size * megabyte
+        else:
+            limit = ctx.get_env().load_config().thumbnail_cache_size
+        if limit is None:
+            click.echo("The thumbnail cache size is unlimited.")
+            return
+        removed = cache.prune(limit)
+        click.echo(
+            f"Evicted {removed.count} thumbnails, {removed.size / megabyte:.1f} MB"
+        )
+
+
+@cli.command("markdown-cache", short_help="Shows or prunes the markdown cache.")
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Evict the least recently used entries until the cache fits "
+    "within its size limit.",
+)
+@click.option(
+    "--max-size",
+    type=click.IntRange(min=0),
+    default=None,
+    help="The size limit to prune to, in megabytes.  Defaults to the "
+    "`markdown_cache_size` of the project.",
+)
+@pass_context
+def markdown_cache_cmd(ctx, prune, max_size):
+    """Shows statistics about the markdown cache.
+
+    Rendered markdown is cached in the Lektor cache directory, under the
+    project's directory, so that it is reused across builds.  With
+    `--prune`, the least recently used entries are evicted until the cache
+    is within the given size.
+    """
+    from lektor.markdown.cache import MarkdownCache
+
+    megabyte = 1024 * 1024
+    cache = MarkdownCache(ctx.get_project().get_markdown_cache_path())
+    stats = cache.stats()
+    click.echo(f"Markdown cache: {cache.directory}")
+    click.echo(f"  {stats.count} entries, {stats.size / megabyte:.1f} MB")
+
+    if prune:
+        if max_size is not None:
+            limit = max_size * megabyte
+        else:
+            limit = ctx.get_env().load_config().markdown_cache_size
+        if limit is None:
+            click.echo("The markdown cache size is unlimited.")
+            return
+        removed = cache.prune(limit)
+        click.echo(f"Evicted {removed.count} entries, {removed.size / megabyte:.1f} MB")
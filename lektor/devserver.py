@@ -15,6 +15,7 @@ from lektor.admin import WebAdmin
 from lektor.builder import Builder
 from lektor.db import Database
 from lektor.reporter import CliReporter
+from lektor.routing import RouteTableCache
 from lektor.utils import process_extra_flags
 from lektor.watcher import watch_project
 
@@ -48,6 +49,11 @@ class BackgroundBuilder(threading.Thread):
         self.verbosity = verbosity
         self.extra_flags = extra_flags
 
+        # Share URL routes between the pads of the admin server's requests.
+        # These are installed before the server starts, and are invalidated
+        # by the watcher.
+        self.route_table_cache = env.route_table_cache = RouteTableCache()
+
         # See https://github.com/samuelcolvin/watchfiles/pull/132
         self.stop_event = threading.Event()
 
@@ -77,6 +83,7 @@ class BackgroundBuilder(threading.Thread):
         with CliReporter(self.env, verbosity=self.verbosity):
             self.build(update_source_info_first=True)
             for _changes in watch:
+                self.route_table_cache.invalidate()
                 self.build()
 
 
@@ -251,8 +251,14 @@ class EditorSession:
                 self._delete_impl()
             else:
                 self._save_impl()
+            self._invalidate_route_table()
         self.closed = True
 
+    def _invalidate_route_table(self):
+        route_table_cache = self.pad.env.route_table_cache
+        if route_table_cache is not None:
+            route_table_cache.invalidate()
+
     def delete(self, recursive=None, delete_master=False):
         """Deletes the record.  How the delete works depends on what is being
         deleted:
@@ -296,6 +302,7 @@ class EditorSession:
 
         with atomic_open(fn, "wb") as f:
             shutil.copyfileobj(fp, f)
+        self._invalidate_route_table()
         return safe_filename
 
     def _attachment_delete_impl(self):
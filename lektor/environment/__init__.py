@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import fnmatch
+import hashlib
 import os
 import uuid
 from functools import update_wrapper
@@ -8,6 +9,7 @@ from typing import TYPE_CHECKING
 
 import babel.dates
 import jinja2
+from jinja2.bccache import Bucket
 from jinja2.loaders import split_template_path
 
 from lektor.constants import PRIMARY_ALT
@@ -23,6 +25,8 @@ from lektor.environment.config import ServerInfo  # noqa - reexport
 from lektor.environment.config import update_config_from_ini  # noqa - reexport
 from lektor.environment.expressions import Expression  # noqa - reexport
 from lektor.environment.expressions import FormatExpression  # noqa - reexport
+from lektor.environment.fragment_cache import FragmentCacheExtension
+from lektor.environment.profiling import ProfilingTemplate
 from lektor.markdown import Markdown
 from lektor.packages import load_packages
 from lektor.pluginsystem import initialize_plugins
@@ -159,6 +163,12 @@ def any_fnmatch(filename, patterns):
 
 
 class CustomJinjaEnvironment(jinja2.Environment):
+    template_class = ProfilingTemplate
+
+    # A :class:`lektor.environment.profiling.TemplateProfiler` which, if set,
+    # instruments templates subsequently loaded.
+    profiler = None
+
     def _load_template(self, name, globals):
         ctx = get_ctx()
 
@@ -185,6 +195,58 @@ class CustomJinjaEnvironment(jinja2.Environment):
             raise
 
 
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Persists compiled templates between runs.
+
+    Jinja discards cached bytecode if the template source or the Jinja
+    version changes.  Since the compiled code also depends on the extensions,
+    filters and tests (which plugins may add to), the cache keys also cover
+    those, as well as the names of the template globals.
+    """
+
+    def __init__(self, directory):
+        super().__init__(os.fspath(directory), "%s.cache")
+
+    @classmethod
+    def for_project(cls, project):
+        """Returns the bytecode cache for a project, or `None` if its cache
+        directory can not be created.
+        """
+        directory = project.get_template_cache_path()
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return None
+        return cls(directory)
+
+    @staticmethod
+    def get_environment_signature(environment):
+        """Summarizes what compiled templates depend on besides their source."""
+        return repr(
+            (
+                jinja2.__version__,
+                sorted(environment.extensions),
+                sorted(environment.filters),
+                sorted(environment.tests),
+                sorted(environment.globals),
+            )
+        )
+
+    def get_bucket(self, environment, name, filename, source):
+        h = hashlib.sha1(self.get_cache_key(name, filename).encode("utf-8"))
+        h.update(self.get_environment_signature(environment).encode("utf-8"))
+        bucket = Bucket(environment, h.hexdigest(), self.get_source_checksum(source))
+        self.load_bytecode(bucket)
+        return bucket
+
+    def dump_bytecode(self, bucket):
+        # Failing to cache a template should not fail the build.
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
 @jinja2.pass_context
 def lookup_from_bag(jinja_ctx, *args):
     pieces = ".".join(x for x in args if x)
@@ -219,8 +281,9 @@ class Environment:
 
         self.jinja_env = CustomJinjaEnvironment(
             autoescape=self.select_jinja_autoescape,
-            extensions=["jinja2.ext.do"],
+            extensions=["jinja2.ext.do", FragmentCacheExtension],
             loader=jinja2.FileSystemLoader(template_paths),
+            bytecode_cache=TemplateBytecodeCache.for_project(project),
         )
 
         from lektor.db import F  # pylint: disable=import-outside-toplevel
@@ -274,12 +337,23 @@ class Environment:
         self.custom_generators = []
         self.virtual_sources = {}
 
+        # If set, a lektor.routing.RouteTableCache used to share the URL
+        # route table between pads.  This is set while the project is being
+        # watched for changes.
+        self.route_table_cache = None
+
         if load_plugins:
             self.load_plugins()
         # pylint: disable=import-outside-toplevel
+        from lektor.databags import databag_resolver
+        from lektor.db import collection_resolver
+        from lektor.db import field_resolver
         from lektor.db import siblings_resolver
 
         self.virtualpathresolver("siblings")(siblings_resolver)
+        self.virtualpathresolver("collection")(collection_resolver)
+        self.virtualpathresolver("field")(field_resolver)
+        self.virtualpathresolver("databag")(databag_resolver)
 
     root_path: str
     build_programs: list[tuple[type[SourceObject], type[BuildProgram]]]
@@ -335,6 +409,13 @@ class Environment:
         ctx = self.make_default_tmpl_values(pad, this, values, alt, template=name)
         return self.jinja_env.get_or_select_template(name).render(ctx)
 
+    def generate_template(self, name, pad=None, this=None, values=None, alt=None):
+        """Like :meth:`render_template` but returns an iterator which
+        renders the template piece by piece.
+        """
+        ctx = self.make_default_tmpl_values(pad, this, values, alt, template=name)
+        return self.jinja_env.get_or_select_template(name).generate(ctx)
+
     def make_default_tmpl_values(
         self, pad=None, this=None, values=None, alt=None, template=None
     ):
@@ -15,6 +15,7 @@ from lektor.utils import secure_url
 
 DEFAULT_CONFIG = {
     "EPHEMERAL_RECORD_CACHE_SIZE": 500,
+    "QUERY_CACHE_SIZE": 100,
     "ATTACHMENT_TYPES": {
         # Only enable image formats here that we can handle in imagetools.
         # Right now this is limited to jpg, png and gif.
@@ -54,6 +55,13 @@ DEFAULT_CONFIG = {
 }
 
 
+# The default size limit of the thumbnail cache, in megabytes
+DEFAULT_THUMBNAIL_CACHE_SIZE = 1024
+
+# The default size limit of the markdown cache, in megabytes
+DEFAULT_MARKDOWN_CACHE_SIZE = 256
+
+
 def update_config_from_ini(config, inifile):
     for section_name in ("ATTACHMENT_TYPES", "PROJECT", "PACKAGES", "THEME_SETTINGS"):
         section_config = inifile.section_as_dict(section_name.lower())
@@ -276,3 +284,45 @@ class Config:
         if style in ("relative", "absolute", "external"):
             return style
         return "relative"
+
+    @cached_property
+    def collection_fingerprints(self):
+        """Whether queries depend on a fingerprint of the collection they
+        iterate over, rather than on the source files of each item.
+        """
+        value = self.values["PROJECT"].get("collection_fingerprints")
+        return bool_from_string(value, default=False)
+
+    @cached_property
+    def field_dependencies(self):
+        """Whether records iterated over by queries are tracked by the
+        values of the fields which are read, rather than by their source files.
+        """
+        value = self.values["PROJECT"].get("field_dependencies")
+        return bool_from_string(value, default=False)
+
+    @cached_property
+    def thumbnail_cache(self):
+        """Whether thumbnails are cached in the Lektor cache directory."""
+        value = self.values["PROJECT"].get("thumbnail_cache")
+        return bool_from_string(value, default=True)
+
+    @cached_property
+    def thumbnail_cache_size(self):
+        """The size limit of the thumbnail cache in bytes, or `None`."""
+        value = self.values["PROJECT"].get("thumbnail_cache_size")
+        try:
+            megabytes = int(value) if value else DEFAULT_THUMBNAIL_CACHE_SIZE
+        except ValueError:
+            megabytes = DEFAULT_THUMBNAIL_CACHE_SIZE
+        return megabytes * 1024 * 1024 if megabytes > 0 else None
+
+    @cached_property
+    def markdown_cache_size(self):
+        """The size limit of the markdown cache in bytes, or `None`."""
+        value = self.values["PROJECT"].get("markdown_cache_size")
+        try:
+            megabytes = int(value) if value else DEFAULT_MARKDOWN_CACHE_SIZE
+        except ValueError:
+            megabytes = DEFAULT_MARKDOWN_CACHE_SIZE
+        return megabytes * 1024 * 1024 if megabytes > 0 else None
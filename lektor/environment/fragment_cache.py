@@ -0,0 +1,204 @@
+"""The ``{% cache %}`` template tag.
+
+Parts of templates which render identically on many pages (headers,
+footers, navigation menus) can be wrapped in a ``cache`` block::
+
+    {% cache "main-nav" %}
+      <ul>{% for page in site.root.children %}...{% endfor %}</ul>
+    {% endcache %}
+
+The rendered fragment is memoized for the rest of the build (the lifetime of
+the pad), keyed by the template, the location of the block and the given key.
+The key must be hashable.  Anything the fragment varies with (e.g. ``this``)
+needs to be part of the key.  The alternative of the current page is always
+part of the key and, unless the project's ``url_style`` is ``absolute`` or
+``external``, so is the page's URL, as URLs generated within the fragment are
+relative to it.
+
+The dependencies recorded while rendering the fragment are replayed into the
+current context whenever the fragment is reused, so that dependency tracking
+is not affected by the cache.
+
+With ``persistent=true``, fragments are also reused across builds (for the
+lifetime of the environment) as long as their dependencies, and the
+template containing the block, are unchanged::
+
+    {% cache "footer", persistent=true %}...{% endcache %}
+
+At most :data:`PERSISTENT_FRAGMENT_CACHE_SIZE` of those are kept, the least
+recently used being discarded first.
+
+Fragments which declare sub-artifacts (such as thumbnails) are never cached.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Final
+from typing import NamedTuple
+from weakref import WeakKeyDictionary
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from jinja2.utils import LRUCache
+
+from lektor.context import get_ctx
+
+
+# The maximum number of fragments to keep across builds
+PERSISTENT_FRAGMENT_CACHE_SIZE: Final = 1000
+
+
+class _Fragment(NamedTuple):
+    output: str
+    # The dependencies recorded while rendering the fragment: filenames and
+    # virtual source objects.
+    dependencies: tuple
+    # Infos for checking whether those dependencies have changed, if the
+    # fragment is to be reused across builds.
+    source_infos: tuple = ()
+
+
+def _get_source_infos(pad, dependencies):
+    # pylint: disable=import-outside-toplevel
+    from lektor.builder import FileInfo
+    from lektor.builder import PathCache
+    from lektor.builder import VirtualSourceInfo
+
+    path_cache = PathCache(pad.env)
+    rv = []
+    for dependency in dependencies:
+        if isinstance(dependency, str):
+            info = FileInfo(pad.env, dependency)
+            # Fetch the current state of the file now, rather than when the
+            # info is compared.
+            if info.is_dir:
+                _ = info.checksum
+        else:
+            info = VirtualSourceInfo(
+                dependency.path,
+                dependency.alt,
+                dependency.get_mtime(path_cache),
+                dependency.get_checksum(path_cache),
+            )
+        rv.append(info)
+    return tuple(rv)
+
+
+def _revalidate(pad, fragment):
+    """Checks whether the dependencies of a fragment rendered during an
+    earlier build are unchanged.
+
+    Returns the fragment, with its virtual source dependencies loaded from
+    ``pad``, or `None` if the fragment is out of date.
+    """
+    # pylint: disable=import-outside-toplevel
+    from lektor.builder import FileInfo
+    from lektor.builder import PathCache
+    from lektor.builder import VirtualSourceInfo
+
+    path_cache = PathCache(pad.env)
+    dependencies = []
+    for info in fragment.source_infos:
+        if isinstance(info, FileInfo):
+            if not FileInfo(pad.env, info.filename).unchanged(info):
+                return None
+            dependencies.append(info.filename)
+        else:
+            source = pad.get(info.path, alt=info.alt)
+            if source is None:
+                return None
+            current = VirtualSourceInfo(
+                info.path,
+                info.alt,
+                source.get_mtime(path_cache),
+                source.get_checksum(path_cache),
+            )
+            if not current.unchanged(info):
+                return None
+            dependencies.append(source)
+    return fragment._replace(dependencies=tuple(dependencies))
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension implementing the ``{% cache %}`` tag."""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        self._lock = threading.Lock()
+        # The fragments rendered during each build, by pad
+        self._fragments = WeakKeyDictionary()
+        # The fragments which may be reused across builds
+        self._persistent_fragments = LRUCache(PERSISTENT_FRAGMENT_CACHE_SIZE)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        persistent = nodes.Const(False)
+        if parser.stream.skip_if("comma"):
+            option = parser.stream.expect("name")
+            if option.value != "persistent":
+                parser.fail(f"Unknown cache option {option.value!r}", option.lineno)
+            parser.stream.expect("assign")
+            persistent = parser.parse_expression()
+        block_id = nodes.Const((parser.name, parser.filename, lineno))
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render_fragment", [block_id, key, persistent])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _get_fragment(self, pad, cache_key, persistent):
+        with self._lock:
+            fragments = self._fragments.setdefault(pad, {})
+            rv = fragments.get(cache_key)
+            if rv is not None or not persistent:
+                return rv
+        rv = self._persistent_fragments.get(cache_key)
+        if rv is not None:
+            rv = _revalidate(pad, rv)
+            if rv is not None:
+                with self._lock:
+                    fragments[cache_key] = rv
+        return rv
+
+    def _render_fragment(self, block_id, key, persistent, caller):
+        ctx = get_ctx()
+        if ctx is None:
+            return caller()
+
+        alt = ctx.source.alt if ctx.source is not None else None
+        if ctx.pad.db.config.url_style in ("absolute", "external"):
+            cache_key = (block_id, key, alt)
+        else:
+            cache_key = (block_id, key, alt, ctx.base_url)
+        fragment = self._get_fragment(ctx.pad, cache_key, persistent)
+        if fragment is not None:
+            for dependency in fragment.dependencies:
+                if isinstance(dependency, str):
+                    ctx.record_dependency(dependency)
+                else:
+                    ctx.record_virtual_dependency(dependency)
+            return fragment.output
+
+        dependencies = {}
+        sub_artifact_count = len(ctx.sub_artifacts)
+        with ctx.gather_dependencies(dependencies.setdefault):
+            output = caller()
+        if len(ctx.sub_artifacts) != sub_artifact_count:
+            return output
+
+        fragment = _Fragment(output, tuple(dependencies))
+        with self._lock:
+            self._fragments.setdefault(ctx.pad, {})[cache_key] = fragment
+        if persistent:
+            # The block's own template is not necessarily a recorded
+            # dependency, but changes to it change the fragment.
+            _, template_filename, _ = block_id
+            if template_filename is not None:
+                dependencies.setdefault(template_filename)
+            fragment = fragment._replace(
+                source_infos=_get_source_infos(ctx.pad, tuple(dependencies))
+            )
+            self._persistent_fragments[cache_key] = fragment
+        return output
@@ -0,0 +1,234 @@
+"""Template render time instrumentation.
+
+When a :class:`TemplateProfiler` is installed on the Jinja environment (as
+``env.jinja_env.profiler``) before any templates are loaded, the render
+functions of each template loaded afterwards are instrumented to record,
+for every template, include, import, block and macro:
+
+- the number of calls;
+- the inclusive render time (including everything rendered from within);
+- the exclusive render time (excluding nested templates, blocks and macros);
+- the number of records loaded while rendering (inclusive and exclusive).
+
+The results are aggregated for as long as the profiler is installed, which
+for ``lektor build --profile-templates`` is the whole build.
+
+Template render functions are generators.  Only the time spent inside the
+generator counts towards its render time, not the time spent by the consumer
+(e.g. writing the output to an artifact) between chunks.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import asdict
+from dataclasses import dataclass
+from functools import partial
+from time import perf_counter
+
+import jinja2
+from jinja2.runtime import Macro
+
+
+@dataclass
+class TemplateStats:
+    """The aggregated profile of one template, include, import, block or macro."""
+
+    kind: str
+    name: str
+    calls: int = 0
+    inclusive_time: float = 0.0
+    exclusive_time: float = 0.0
+    inclusive_records: int = 0
+    exclusive_records: int = 0
+
+
+class _Frame:
+    __slots__ = ("stats", "child_time", "records")
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.child_time = 0.0
+        self.records = 0
+
+
+class TemplateProfiler:
+    """Collects render time statistics of templates."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+
+    @property
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+            return stack
+
+    def _get_stats(self, kind, name):
+        key = kind, name
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = TemplateStats(kind, name)
+        return stats
+
+    def _run(self, stats, func, *args, count_call=True):
+        """Calls ``func``, attributing the time spent to ``stats``."""
+        stack = self._stack
+        frame = _Frame(stats)
+        stack.append(frame)
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1].child_time += elapsed
+            with self._lock:
+                if count_call:
+                    stats.calls += 1
+                stats.inclusive_time += elapsed
+                stats.exclusive_time += elapsed - frame.child_time
+                stats.exclusive_records += frame.records
+            # Nested frames have added their records to all enclosing frames
+            # already, see :meth:`record_loaded`.
+
+    def _profile_generator(self, stats, gen):
+        """Iterates over a generator, attributing the time spent inside of
+        it to ``stats``.
+        """
+        count_call = True
+        while True:
+            try:
+                chunk = self._run(stats, next, gen, count_call=count_call)
+            except StopIteration:
+                return
+            count_call = False
+            yield chunk
+
+    def profile_render_func(self, kind, name, render_func):
+        """Wraps a render function (a generator function taking a Jinja
+        context) of a template or block.
+
+        Templates rendered from within another template (included templates
+        or templates extended by another template) are recorded with a
+        ``kind`` of ``include``.
+        """
+        template_stats = self._get_stats(kind, name)
+        include_stats = self._get_stats("include", name) if kind == "template" else None
+
+        def wrapper(context):
+            stats = template_stats
+            if include_stats is not None and self._stack:
+                stats = include_stats
+            return self._profile_generator(stats, render_func(context))
+
+        return wrapper
+
+    def profile_call(self, kind, name, func, *args):
+        """Calls ``func``, recording its render time."""
+        return self._run(self._get_stats(kind, name), func, *args)
+
+    def record_loaded(self):
+        """Attributes the loading of a record to the current template."""
+        stack = self._stack
+        if stack:
+            stack[-1].records += 1
+            with self._lock:
+                for frame in stack:
+                    frame.stats.inclusive_records += 1
+
+    def get_stats(self):
+        """Returns the collected statistics, ordered by descending inclusive
+        render time.
+        """
+        with self._lock:
+            rv = [TemplateStats(**asdict(stats)) for stats in self._stats.values()]
+        rv = [stats for stats in rv if stats.calls]
+        rv.sort(key=lambda x: (-x.inclusive_time, x.kind, x.name))
+        return rv
+
+    def to_json(self):
+        return [asdict(stats) for stats in self.get_stats()]
+
+    def dump(self, filename):
+        """Writes the collected statistics to a JSON file."""
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+            f.write("\n")
+
+    def format_report(self, limit=20):
+        """Formats the top ``limit`` entries as a table."""
+        rows = [
+            (
+                f"{stats.inclusive_time * 1000:.1f}",
+                f"{stats.exclusive_time * 1000:.1f}",
+                str(stats.calls),
+                str(stats.inclusive_records),
+                stats.kind,
+                stats.name,
+            )
+            for stats in self.get_stats()[:limit]
+        ]
+        header = ("incl ms", "excl ms", "calls", "records", "kind", "name")
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(4)]
+        lines = []
+        for row in [header, *rows]:
+            cells = [row[i].rjust(width) for i, width in enumerate(widths)]
+            lines.append("  ".join([*cells, row[4].ljust(7), row[5]]).rstrip())
+        return "\n".join(lines)
+
+
+class _ProfilingMacro(Macro):
+    def __init__(self, profiler, template_name, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._profiler = profiler
+        self._template_name = template_name
+
+    def _invoke(self, arguments, autoescape):
+        name = f"{self._template_name}:{self.name}"
+        return self._profiler.profile_call(
+            "macro", name, super()._invoke, arguments, autoescape
+        )
+
+
+class ProfilingTemplate(jinja2.Template):
+    """Template class which instruments templates if a profiler is installed
+    on the environment at the time they are loaded.
+    """
+
+    @classmethod
+    def _from_namespace(cls, environment, namespace, globals):
+        rv = super()._from_namespace(environment, namespace, globals)
+        profiler = getattr(environment, "profiler", None)
+        if profiler is None:
+            return rv
+
+        name = rv.name or "<string>"
+        rv.root_render_func = profiler.profile_render_func(
+            "template", name, rv.root_render_func
+        )
+        rv.blocks = {
+            block_name: profiler.profile_render_func(
+                "block", f"{name}:{block_name}", block
+            )
+            for block_name, block in rv.blocks.items()
+        }
+
+        # The render functions look up the macro class in their globals.
+        namespace["Macro"] = partial(_ProfilingMacro, profiler, name)
+        return rv
+
+    def make_module(self, vars=None, shared=False, locals=None):
+        profiler = getattr(self.environment, "profiler", None)
+        if profiler is None:
+            return super().make_module(vars, shared, locals)
+        return profiler.profile_call(
+            "import", self.name, super().make_module, vars, shared, locals
+        )
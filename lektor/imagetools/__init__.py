@@ -6,19 +6,31 @@ from ..utils import deprecated
 from .exif import read_exif
 from .image_info import get_image_info
 from .thumbnail import compute_dimensions
+from .thumbnail import get_available_formats
+from .thumbnail import make_image_picture
 from .thumbnail import make_image_thumbnail
+from .thumbnail import make_image_thumbnails
+from .thumbnail import Picture
+from .thumbnail import PictureSource
 from .thumbnail import Thumbnail
 from .thumbnail import ThumbnailMode
+from .thumbnail import ThumbnailSet
 
 
 __all__ = [
     "compute_dimensions",
+    "get_available_formats",
     "get_image_info",
     "get_quality",
+    "make_image_picture",
     "make_image_thumbnail",
+    "make_image_thumbnails",
+    "Picture",
+    "PictureSource",
     "read_exif",
     "Thumbnail",
     "ThumbnailMode",
+    "ThumbnailSet",
 ]
 
 
@@ -10,6 +10,7 @@ from types import SimpleNamespace
 
 import PIL.ExifTags
 import PIL.Image
+import PIL.ImageCms
 
 
 __all__ = ["ExifTags", "Transpose", "UnidentifiedImageError"]
@@ -57,5 +58,13 @@ else:
     )
 
 
+if hasattr(PIL.ImageCms, "Flags"):
+    # pillow >= 10.3
+    CMS_FLAG_NOCACHE = PIL.ImageCms.Flags.NOCACHE
+else:
+    # pylint: disable-next=no-member
+    CMS_FLAG_NOCACHE = PIL.ImageCms.FLAGS["NOCACHE"]  # type: ignore[attr-defined]
+
+
 # UnidentifiedImageError only exists in Pillow >= 7.0.0
 UnidentifiedImageError = getattr(PIL, "UnidentifiedImageError", OSError)
@@ -0,0 +1,197 @@
+"""A content-addressed cache of thumbnails.
+
+Thumbnails are stored in the Lektor cache directory, keyed by the checksum of
+the source image, the thumbnail parameters and the Pillow version.  Since the
+cache is independent of the project location and output path, thumbnails
+survive ``lektor clean``, fresh checkouts and builds into other output
+directories.
+
+The least recently used thumbnails are evicted when the cache grows beyond
+its size limit.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import os
+import threading
+from collections.abc import Iterator
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import PIL
+
+from lektor.utils import atomic_open
+
+
+if TYPE_CHECKING:
+    from lektor.db import Pad
+    from lektor.imagetools.thumbnail import ThumbnailParams
+
+
+# Fraction of the size limit that the cache is pruned down to, once exceeded
+_PRUNE_RATIO = 0.9
+
+
+@dataclasses.dataclass
+class ThumbnailCacheStats:
+    count: int
+    size: int
+
+
+class ThumbnailCache:
+    """Stores thumbnails, keyed by source checksum and thumbnail parameters."""
+
+    def __init__(self, directory: str | os.PathLike[str], max_size: int | None = None):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # The running total size of the cache, if known
+        self._size: int | None = None
+        # Checksums of source images, by filename and stat
+        self._checksums: dict[tuple[str, int, int], str] = {}
+
+    def _get_source_checksum(self, source_image: str | os.PathLike[str]) -> str:
+        filename = os.fspath(source_image)
+        st = os.stat(filename)
+        stamp = (filename, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            rv = self._checksums.get(stamp)
+        if rv is None:
+            h = hashlib.sha1()
+            with open(filename, "rb") as f:
+                while chunk := f.read(64 * 1024):
+                    h.update(chunk)
+            rv = h.hexdigest()
+            with self._lock:
+                self._checksums[stamp] = rv
+        return rv
+
+    def get_key(
+        self, source_image: str | os.PathLike[str], params: ThumbnailParams
+    ) -> str:
+        """Compute the cache key for a thumbnail of a source image."""
+        h = hashlib.sha1()
+        for bit in (
+            self._get_source_checksum(source_image),
+            params.format_info.format,
+            params.get_tag(),
+            PIL.__version__,
+        ):
+            h.update(bit.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        """Get a cached thumbnail."""
+        path = self._get_path(key)
+        try:
+            with path.open("rb") as f:
+                data = f.read()
+            # Mark as recently used.
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a thumbnail in the cache, evicting old thumbnails if the
+        cache grows beyond its size limit.
+        """
+        path = self._get_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_open(path, "wb") as f:
+                f.write(data)
+        except OSError:
+            # Failing to cache is not an error.
+            return
+
+        max_size = self.max_size
+        if max_size is None:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self.stats().size
+            else:
+                self._size += len(data)
+            exceeded = self._size > max_size
+        if exceeded:
+            self.prune(int(max_size * _PRUNE_RATIO))
+
+    def _iter_entries(self) -> Iterator[os.DirEntry[str]]:
+        try:
+            subdirs = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for subdir in subdirs:
+            if not subdir.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(subdir.path))
+            except OSError:
+                continue
+            for entry in entries:
+                # Skip temporary files of writes in progress.
+                if entry.is_file() and not entry.name.startswith("."):
+                    yield entry
+
+    def stats(self) -> ThumbnailCacheStats:
+        """Count the thumbnails in the cache and their total size."""
+        count = size = 0
+        for entry in self._iter_entries():
+            count += 1
+            size += entry.stat().st_size
+        return ThumbnailCacheStats(count, size)
+
+    def prune(self, max_size: int) -> ThumbnailCacheStats:
+        """Evict the least recently used thumbnails until the total size of
+        the cache is at most ``max_size`` bytes.
+
+        Returns the count and total size of the evicted thumbnails.
+        """
+        entries = []
+        total = 0
+        for entry in self._iter_entries():
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        entries.sort()
+
+        removed = ThumbnailCacheStats(0, 0)
+        for _, size, path in entries:
+            if total <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed.count += 1
+            removed.size += size
+
+        with self._lock:
+            self._size = total
+        return removed
+
+
+@cache
+def _get_shared_cache(directory: Path, max_size: int | None) -> ThumbnailCache:
+    return ThumbnailCache(directory, max_size)
+
+
+def get_thumbnail_cache(pad: Pad) -> ThumbnailCache | None:
+    """Get the thumbnail cache, as configured for the project.
+
+    Returns ``None`` if the thumbnail cache is disabled.
+    """
+    config = pad.db.config
+    if not config.thumbnail_cache:
+        return None
+    directory = pad.env.project.get_thumbnail_cache_path()
+    return _get_shared_cache(directory, config.thumbnail_cache_size)
@@ -20,6 +20,7 @@ import PIL.Image
 from ._compat import ExifTags
 from ._compat import UnidentifiedImageError
 from .image_info import TiffOrientation
+from .metadata import get_image_metadata_cache
 
 
 if TYPE_CHECKING:
@@ -389,11 +390,22 @@ class EXIFInfo:
         return orientation.is_transposed
 
 
-def read_exif(source: str | Path | SupportsRead[bytes]) -> EXIFInfo:
-    """Reads exif data from an image file."""
+def _read_exif(source: str | Path | SupportsRead[bytes]) -> PIL.Image.Exif:
     try:
         with PIL.Image.open(source) as image:
-            exif = image.getexif()
+            return image.getexif()
     except UnidentifiedImageError:
-        exif = PIL.Image.Exif()
-    return EXIFInfo(exif)
+        return PIL.Image.Exif()
+
+
+def read_exif(source: str | Path | SupportsRead[bytes]) -> EXIFInfo:
+    """Reads exif data from an image file.
+
+    If called from within a build, the Exif data is cached in the build state
+    (see :mod:`lektor.imagetools.metadata`).
+    """
+    if isinstance(source, (str, Path)):
+        cache = get_image_metadata_cache()
+        if cache is not None:
+            return EXIFInfo(cache.get_exif(source, _read_exif))
+    return EXIFInfo(_read_exif(source))
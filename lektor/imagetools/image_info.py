@@ -22,6 +22,7 @@ import PIL.Image
 
 from ._compat import ExifTags
 from ._compat import UnidentifiedImageError
+from .metadata import get_image_metadata_cache
 
 
 if TYPE_CHECKING:
@@ -177,15 +178,35 @@ def _save_position(fp: BinaryIO) -> Generator[BinaryIO]:
 
 
 def get_image_info(source: str | Path | BinaryIO) -> ImageInfo:
-    """Determine type and dimensions of an image file."""
+    """Determine type and dimensions of an image file.
+
+    If called from within a build, the result is cached in the build state
+    (see :mod:`lektor.imagetools.metadata`).
+    """
+    if not isinstance(source, (str, Path)):
+        warnings.warn(
+            "Passing a file object to 'get_image_info' is deprecated "
+            "since version 3.4.0. Pass a file path instead.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return _get_image_info(source)
+
+    cache = get_image_metadata_cache()
+    if cache is not None:
+        format, width, height = cache.get_image_info(source, _get_image_info)
+        if format is None:
+            return UnknownImageInfo()
+        if format == "svg":
+            return SvgImageInfo("svg", width, height)
+        assert width is not None and height is not None
+        return PILImageInfo(format, int(width), int(height))
+    return _get_image_info(source)
+
+
+def _get_image_info(source: str | Path | BinaryIO) -> ImageInfo:
     with suppress(UnidentifiedImageError), ExitStack() as stack:
         if not isinstance(source, (str, Path)):
-            warnings.warn(
-                "Passing a file object to 'get_image_info' is deprecated "
-                "since version 3.4.0. Pass a file path instead.",
-                DeprecationWarning,
-                stacklevel=2,
-            )
             stack.enter_context(_save_position(source))
 
         image = stack.enter_context(PIL.Image.open(source))
@@ -0,0 +1,196 @@
+"""A persistent cache of image metadata.
+
+Determining the format and dimensions of an image, or reading its Exif data,
+requires opening (and, for Exif data, parsing) the image file.  The
+:class:`ImageMetadataCache` of a builder stores that metadata in the build
+state database, keyed by the image's filename, modification time and size,
+so that it is read once, rather than once per pad (or per build).
+
+:func:`~lektor.imagetools.get_image_info` and
+:func:`~lektor.imagetools.read_exif` use the cache of the builder of the
+current build context, if there is one.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import struct
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import TypeAlias
+
+import PIL.Image
+
+
+# The modification time (in ns) and size of a file
+_Stamp: TypeAlias = tuple[int, int]
+# The format, width and height of an image (see ImageInfo)
+_InfoRow: TypeAlias = tuple[str | None, float | None, float | None]
+
+
+def _get_stamp(filename: str) -> _Stamp:
+    st = os.stat(filename)
+    return st.st_mtime_ns, st.st_size
+
+
+class ImageMetadataCache:
+    """Stores image infos and Exif data in the build state database.
+
+    The image infos of all images are loaded at once, when first needed.
+    Exif data, which can be large, is loaded image by image.  Newly read
+    metadata is written back by :meth:`flush`.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._infos: dict[str, tuple[_Stamp, _InfoRow]] | None = None
+        self._pending_infos: dict[str, tuple[_Stamp, _InfoRow]] = {}
+        self._pending_exifs: dict[str, tuple[_Stamp, bytes]] = {}
+
+    def _load_infos(self) -> dict[str, tuple[_Stamp, _InfoRow]]:
+        con = self._connect()
+        try:
+            rows = con.execute(
+                """
+                select filename, mtime_ns, size, format, width, height
+                  from image_info
+            """
+            ).fetchall()
+        finally:
+            con.close()
+        return {
+            filename: ((mtime_ns, size), (format, width, height))
+            for filename, mtime_ns, size, format, width, height in rows
+        }
+
+    def get_image_info(
+        self, source: str | Path, compute: Callable[[str], _InfoRow]
+    ) -> _InfoRow:
+        """Get the format, width and height of an image, calling ``compute``
+        if they are not cached.
+        """
+        filename = os.path.abspath(source)
+        stamp = _get_stamp(filename)
+        with self._lock:
+            if self._infos is None:
+                self._infos = self._load_infos()
+            cached = self._infos.get(filename)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        info = compute(filename)
+        with self._lock:
+            if self._infos is not None:
+                self._infos[filename] = stamp, info
+            self._pending_infos[filename] = stamp, info
+        return info
+
+    def _load_exif(self, filename: str, stamp: _Stamp) -> bytes | None:
+        with self._lock:
+            pending = self._pending_exifs.get(filename)
+        if pending is not None and pending[0] == stamp:
+            return pending[1]
+        con = self._connect()
+        try:
+            row = con.execute(
+                """
+                select exif from image_exif
+                 where filename = ? and mtime_ns = ? and size = ?
+            """,
+                [filename, *stamp],
+            ).fetchone()
+        finally:
+            con.close()
+        return None if row is None else row[0]
+
+    def get_exif(
+        self, source: str | Path, compute: Callable[[str], PIL.Image.Exif]
+    ) -> PIL.Image.Exif:
+        """Get the Exif data of an image, calling ``compute`` if it is not
+        cached.
+        """
+        filename = os.path.abspath(source)
+        stamp = _get_stamp(filename)
+        data = self._load_exif(filename, stamp)
+        if data is not None:
+            exif = PIL.Image.Exif()
+            exif.load(data)
+            return exif
+
+        exif = compute(filename)
+        try:
+            data = exif.tobytes()
+        except (TypeError, ValueError, struct.error):
+            # Some Exif data does not survive serialization.
+            return exif
+        with self._lock:
+            self._pending_exifs[filename] = stamp, data
+        return exif
+
+    def flush(self) -> None:
+        """Write any newly read metadata to the build state database."""
+        with self._lock:
+            infos, self._pending_infos = self._pending_infos, {}
+            exifs, self._pending_exifs = self._pending_exifs, {}
+        if not infos and not exifs:
+            return
+        con = self._connect()
+        try:
+            con.executemany(
+                """
+                insert or replace into image_info
+                    (filename, mtime_ns, size, format, width, height)
+                    values (?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (filename, *stamp, *info)
+                    for filename, (stamp, info) in infos.items()
+                ],
+            )
+            con.executemany(
+                """
+                insert or replace into image_exif
+                    (filename, mtime_ns, size, exif) values (?, ?, ?, ?)
+            """,
+                [(filename, *stamp, data) for filename, (stamp, data) in exifs.items()],
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def prune(self) -> None:
+        """Forget the metadata of images that no longer exist."""
+        self.flush()
+        con = self._connect()
+        try:
+            for table in ("image_info", "image_exif"):
+                filenames = [
+                    filename
+                    for (filename,) in con.execute(f"select filename from {table}")
+                    if not os.path.exists(filename)
+                ]
+                con.executemany(
+                    f"delete from {table} where filename = ?",
+                    [(filename,) for filename in filenames],
+                )
+            con.commit()
+        finally:
+            con.close()
+        with self._lock:
+            self._infos = None
+
+
+def get_image_metadata_cache() -> ImageMetadataCache | None:
+    """Get the image metadata cache of the builder of the current build
+    context, if any.
+    """
+    # pylint: disable=import-outside-toplevel
+    from lektor.context import get_ctx
+
+    ctx = get_ctx()
+    if ctx is None or ctx.build_state is None:
+        return None
+    return ctx.build_state.builder.image_metadata_cache  # type: ignore[no-any-return]
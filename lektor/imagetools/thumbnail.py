@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import dataclasses
+import hashlib
 import io
 import math
 import posixpath
@@ -17,16 +18,22 @@ from typing import Any
 from typing import ClassVar
 from typing import Final
 from typing import NamedTuple
+from typing import overload
 from typing import TYPE_CHECKING
 
 import PIL.Image
 import PIL.ImageCms
+from jinja2.utils import LRUCache
 
 from ..utils import get_dependent_url
+from ._compat import CMS_FLAG_NOCACHE
 from ._compat import PILLOW_VERSION_INFO
 from ._compat import Transpose  # PIL.Image.Transpose
+from .cache import get_thumbnail_cache
+from .cache import ThumbnailCache
 from .image_info import get_image_info
 from .image_info import get_image_orientation
+from .image_info import ImageInfo
 from .image_info import SvgImageInfo
 from .image_info import TiffOrientation
 from .image_info import UnknownImageInfo
@@ -49,8 +56,16 @@ class ThumbnailMode(Enum):
 
 class _FormatInfo:
     format: ClassVar[str]
+    mime_type: ClassVar[str]
     default_save_params: ClassVar[dict[str, Any]] = {}
     extensions: ClassVar[Sequence[str]]
+    supports_alpha: ClassVar[bool] = True
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Whether the installed Pillow can write images in this format."""
+        PIL.Image.init()
+        return cls.format in PIL.Image.SAVE
 
     @classmethod
     def get_save_params(cls, thumbnail_params: ThumbnailParams) -> dict[str, Any]:
@@ -98,11 +113,13 @@ class _FormatInfo:
 
 class _GifFormatInfo(_FormatInfo):
     format = "GIF"
+    mime_type = "image/gif"
     extensions = (".gif",)
 
 
 class _PngFormatInfo(_FormatInfo):
     format = "PNG"
+    mime_type = "image/png"
     default_save_params = {"compress_level": 7}
     extensions = (".png",)
 
@@ -123,8 +140,10 @@ class _PngFormatInfo(_FormatInfo):
 
 class _JpegFormatInfo(_FormatInfo):
     format = "JPEG"
+    mime_type = "image/jpeg"
     default_save_params = {"quality": 85}
     extensions = (".jpeg", ".jpg")
+    supports_alpha = False
 
     @staticmethod
     def _extra_save_params(
@@ -146,6 +165,70 @@ class ImageSize(NamedTuple):
     height: int
 
 
+class _WebpFormatInfo(_FormatInfo):
+    format = "WEBP"
+    mime_type = "image/webp"
+    default_save_params = {"quality": 80, "method": 4}
+    extensions = (".webp",)
+
+    @staticmethod
+    def _extra_save_params(
+        thumbnail_params: ThumbnailParams,
+    ) -> Iterator[tuple[str, Any]]:
+        if thumbnail_params.quality is not None:
+            yield "quality", thumbnail_params.quality
+        if thumbnail_params.effort is not None:
+            yield "method", min(6, max(0, thumbnail_params.effort))
+
+    @staticmethod
+    def _extra_tag_bits(thumbnail_params: ThumbnailParams) -> Iterable[str]:
+        if thumbnail_params.quality is not None:
+            yield f"q{thumbnail_params.quality}"
+        if thumbnail_params.effort is not None:
+            yield f"e{thumbnail_params.effort}"
+
+
+class _AvifFormatInfo(_WebpFormatInfo):
+    format = "AVIF"
+    mime_type = "image/avif"
+    default_save_params = {"quality": 60, "speed": 6}
+    extensions = (".avif",)
+
+    @staticmethod
+    def _extra_save_params(
+        thumbnail_params: ThumbnailParams,
+    ) -> Iterator[tuple[str, Any]]:
+        if thumbnail_params.quality is not None:
+            yield "quality", thumbnail_params.quality
+        if thumbnail_params.effort is not None:
+            # The AVIF encoder takes a speed, from 0 (slowest) to 10 (fastest).
+            yield "speed", 10 - min(10, max(0, thumbnail_params.effort))
+
+
+def _get_format_info(format: str) -> type[_FormatInfo]:
+    format = format.upper()
+    format_info_classes = [_FormatInfo]
+    while format_info_classes:
+        format_info_cls = format_info_classes.pop()
+        if getattr(format_info_cls, "format", None) == format:
+            return format_info_cls
+        format_info_classes.extend(format_info_cls.__subclasses__())
+    raise ValueError(f"unrecognized format ({format!r})")
+
+
+# Modern formats, in order of preference, for the sources of a <picture>
+PICTURE_FORMATS: Final = ("AVIF", "WEBP")
+
+
+def get_available_formats(formats: Iterable[str] = PICTURE_FORMATS) -> list[str]:
+    """Filter image formats, keeping only those which the installed Pillow
+    can write.
+    """
+    return [
+        format.upper() for format in formats if _get_format_info(format).is_available()
+    ]
+
+
 @dataclasses.dataclass
 class ThumbnailParams:
     """Encapsulates the parameters necessary to generate a thumbnail."""
@@ -154,15 +237,12 @@ class ThumbnailParams:
     format: str
     quality: int | None = None
     crop: bool = False
+    # Encoder effort, for formats which support it: the WebP "method", from 0
+    # (fastest) to 6, or the AVIF encoder effort, from 0 (fastest) to 10.
+    effort: int | None = None
 
     def __post_init__(self) -> None:
-        format = self.format.upper()
-        for format_info_cls in _FormatInfo.__subclasses__():
-            if format_info_cls.format == format:
-                break
-        else:
-            raise ValueError(f"unrecognized format ({self.format!r})")
-        self.format_info = format_info_cls
+        self.format_info = _get_format_info(self.format)
 
     def get_save_params(self) -> Mapping[str, Any]:
         """Get kwargs to pass to Image.save() when writing the thumbnail."""
@@ -246,16 +326,43 @@ SRGB_PROFILE: Final = PIL.ImageCms.createProfile("sRGB")
 SRGB_PROFILE_BYTES: Final = PIL.ImageCms.ImageCmsProfile(SRGB_PROFILE).tobytes()
 
 
-def _get_icc_transform(
+def _build_icc_transform(
     icc_profile: bytes, inMode: str, outMode: str
 ) -> PIL.ImageCms.ImageCmsTransform:
     """Construct ICC transform mapping icc_profile to sRGB."""
     profile = PIL.ImageCms.getOpenProfile(io.BytesIO(icc_profile))
-    transform = PIL.ImageCms.buildTransform(profile, SRGB_PROFILE, inMode, outMode)
+    # Transforms are shared between threads, which requires disabling the
+    # (one pixel) cache of the transform.
+    transform = PIL.ImageCms.buildTransform(
+        profile, SRGB_PROFILE, inMode, outMode, flags=CMS_FLAG_NOCACHE
+    )
     assert isinstance(transform, PIL.ImageCms.ImageCmsTransform)
     return transform
 
 
+# The maximum number of ICC transforms to keep
+ICC_TRANSFORM_CACHE_SIZE: Final = 32
+
+_icc_transforms = LRUCache(ICC_TRANSFORM_CACHE_SIZE)
+
+
+def _get_icc_transform(
+    icc_profile: bytes, inMode: str, outMode: str
+) -> PIL.ImageCms.ImageCmsTransform:
+    """Get ICC transform mapping icc_profile to sRGB.
+
+    Building a transform is relatively expensive.  Most images with an
+    embedded profile share one of a few profiles, so the most recently used
+    transforms are cached, keyed by a digest of the profile and the modes.
+    """
+    key = hashlib.sha1(icc_profile).digest(), inMode, outMode
+    transform: PIL.ImageCms.ImageCmsTransform | None = _icc_transforms.get(key)
+    if transform is None:
+        transform = _build_icc_transform(icc_profile, inMode, outMode)
+        _icc_transforms[key] = transform
+    return transform
+
+
 def _convert_to_rgb(image: PIL.Image.Image) -> PIL.Image.Image:
     # Ensure image is RGB before scaling
     targetMode = "RGBA" if image.mode.upper().endswith("A") else "RGB"
@@ -328,12 +435,37 @@ def _auto_orient_image(image: PIL.Image.Image) -> PIL.Image.Image:
     return image
 
 
+# When drafting, the JPEG decoder is asked for an image at least this many
+# times the size of the thumbnail.  (This is what Image.thumbnail() uses by
+# default.)
+_DRAFT_REDUCING_GAP: Final = 2
+
+
+def _draft_image(image: PIL.Image.Image, params: ThumbnailParams) -> None:
+    """Configure the image loader to downscale while decoding, if possible.
+
+    The JPEG decoder can downscale by factors of 2, 4, or 8 while decoding,
+    which is much faster than decoding the full image and resizing it.  This
+    must be called before the image is loaded.
+
+    Image.thumbnail() does the same, but it never upscales nor crops, so we do
+    it ourselves.
+    """
+    if image.format != "JPEG" or params.crop or PILLOW_VERSION_INFO < (7, 0):
+        return
+    width, height = params.size
+    if get_image_orientation(image).is_transposed:
+        width, height = height, width
+    if width > image.width or height > image.height:
+        return  # upscaling
+    image.draft(None, (width * _DRAFT_REDUCING_GAP, height * _DRAFT_REDUCING_GAP))
+
+
 def _create_thumbnail(
     image: PIL.Image.Image, params: ThumbnailParams
 ) -> PIL.Image.Image:
-    # XXX: There is an Image.thumbnail() method that can be significantly faster at
-    # down-scaling than Image.resize() in some particular cases. Perhaps we want to use
-    # that. (Image.thumbnail() never upscales, so we can only use it when down-scaling.)
+    # There is an Image.thumbnail() method that can be significantly faster at
+    # down-scaling than Image.resize() in some particular cases.
     #
     # Image.thumbnail *only* has a possible advantage when down-scaling JPEG images,
     # where it configures the image loader to help with the down-scaling.  (With other
@@ -358,15 +490,23 @@ def _create_thumbnail(
     # Thumbnail() by default uses reducing_gap=2.
     #
     # The big wins for .thumbnail() appear to come when downscaling by a factor of ~8 or
-    # more.
+    # more.  Those come from the loader's "draft" mode, which we use directly (see
+    # _draft_image) so that it also applies to the down-scaling done below.
+    _draft_image(image, params)
+    return _resize_image(_prepare_image(image), params)
 
+
+def _prepare_image(image: PIL.Image.Image) -> PIL.Image.Image:
+    """Convert and orient the source image, ready for scaling."""
     # Ensure image is in RGB (or RGBA) mode before scaling
     image = _convert_to_rgb(image)
 
     # transpose according to EXIF Orientation
-    image = _auto_orient_image(image)
+    return _auto_orient_image(image)
+
 
-    # resize
+def _resize_image(image: PIL.Image.Image, params: ThumbnailParams) -> PIL.Image.Image:
+    """Scale a prepared image (see _prepare_image) to a thumbnail."""
     resize_params: dict[str, Any] = {"reducing_gap": 3.0}
     if params.crop:
         resize_params["box"] = _compute_cropbox(params.size, image.width, image.height)
@@ -384,17 +524,164 @@ def _create_thumbnail(
     return thumbnail
 
 
+def _create_thumbnails(
+    image: PIL.Image.Image, params_list: Sequence[ThumbnailParams]
+) -> list[PIL.Image.Image]:
+    """Compute several thumbnails of an image, decoding it only once.
+
+    The thumbnails are computed from largest to smallest.  Each uncropped
+    thumbnail is scaled from the smallest thumbnail computed so far that is
+    still at least _DRAFT_REDUCING_GAP times its size, rather than from the
+    full source image.  Thumbnails which differ only in format (or quality)
+    are scaled only once.
+    """
+
+    def area(params: ThumbnailParams) -> int:
+        return params.size.width * params.size.height
+
+    if params_list and not any(params.crop for params in params_list):
+        _draft_image(image, max(params_list, key=area))
+    base = _prepare_image(image)
+
+    thumbnails: dict[tuple[ImageSize, bool], PIL.Image.Image] = {}
+    # Thumbnails which may serve as sources for smaller ones, smallest last
+    scaled: list[PIL.Image.Image] = []
+    for params in sorted(params_list, key=lambda params: -area(params)):
+        if (params.size, params.crop) in thumbnails:
+            continue
+        source = base
+        if not params.crop:
+            width, height = params.size
+            for candidate in reversed(scaled):
+                if (
+                    candidate.width >= width * _DRAFT_REDUCING_GAP
+                    and candidate.height >= height * _DRAFT_REDUCING_GAP
+                ):
+                    source = candidate
+                    break
+        # NB: the scaled thumbnails have already been converted to sRGB (and
+        # their ICC profile removed), so they are not converted twice.
+        thumbnail = _resize_image(source, params)
+        thumbnails[params.size, params.crop] = thumbnail
+        if not params.crop:
+            scaled.append(thumbnail)
+    return [thumbnails[params.size, params.crop] for params in params_list]
+
+
+def _encode(thumbnail: PIL.Image.Image, params: ThumbnailParams) -> bytes:
+    """Encode a thumbnail in the format given by its parameters."""
+    if thumbnail.mode == "RGBA" and not params.format_info.supports_alpha:
+        # Flatten onto a white background
+        flattened = PIL.Image.new("RGB", thumbnail.size, "white")
+        flattened.paste(thumbnail, mask=thumbnail.getchannel("A"))
+        flattened.info = thumbnail.info
+        thumbnail = flattened
+    buf = io.BytesIO()
+    thumbnail.save(buf, **params.get_save_params())
+    return buf.getvalue()
+
+
+def _encode_thumbnail(
+    source_image: str | Path | SupportsRead[bytes], thumbnail_params: ThumbnailParams
+) -> bytes:
+    """Compute the thumbnail for source image, returning the encoded image."""
+    with PIL.Image.open(source_image) as image:
+        thumbnail = _create_thumbnail(image, thumbnail_params)
+    return _encode(thumbnail, thumbnail_params)
+
+
 def _create_artifact(
     source_image: str | Path | SupportsRead[bytes],
     thumbnail_params: ThumbnailParams,
     artifact: Artifact,
+    cache: ThumbnailCache | None = None,
 ) -> None:
-    """Create artifact by computing thumbnail for source image."""
-    with PIL.Image.open(source_image) as image:
-        thumbnail = _create_thumbnail(image, thumbnail_params)
-        save_params = thumbnail_params.get_save_params()
+    """Create artifact by computing thumbnail for source image.
+
+    If a ``cache`` is given, the thumbnail is copied from there if possible,
+    otherwise the computed thumbnail is stored into it.
+    """
+    if cache is None:
+        data = _encode_thumbnail(source_image, thumbnail_params)
+    else:
+        assert isinstance(source_image, (str, Path))
+        key = cache.get_key(source_image, thumbnail_params)
+        cached = cache.get(key)
+        if cached is None:
+            data = _encode_thumbnail(source_image, thumbnail_params)
+            cache.put(key, data)
+        else:
+            data = cached
+
     with artifact.open("wb") as fp:
-        thumbnail.save(fp, **save_params)
+        fp.write(data)
+
+
+class _ThumbnailBatch:
+    """Computes a set of thumbnails of the same source image.
+
+    When the first of their artifacts is built, the thumbnails whose
+    artifacts are not current are computed from a single decode of the
+    source image.
+    """
+
+    def __init__(self, source_image: str | Path, cache: ThumbnailCache | None = None):
+        self.source_image = source_image
+        self.cache = cache
+        self._thumbnails: list[tuple[Artifact, ThumbnailParams]] = []
+        self._data: dict[tuple[str, str], bytes] | None = None
+
+    @staticmethod
+    def _get_key(params: ThumbnailParams) -> tuple[str, str]:
+        return params.format_info.format, params.get_tag()
+
+    def add(self, artifact: Artifact, params: ThumbnailParams) -> None:
+        """Add the thumbnail for an artifact to the batch."""
+        self._thumbnails.append((artifact, params))
+
+    def _encode_thumbnails(self, artifact: Artifact) -> dict[tuple[str, str], bytes]:
+        # ``artifact`` is being built, and is thus known not to be current.
+        cache = self.cache
+        data: dict[tuple[str, str], bytes] = {}
+        cache_keys: dict[tuple[str, str], str] = {}
+        todo: list[ThumbnailParams] = []
+        for aft, params in self._thumbnails:
+            if aft is not artifact and aft.is_current:
+                continue
+            key = self._get_key(params)
+            if cache is not None:
+                cache_keys[key] = cache.get_key(self.source_image, params)
+                cached = cache.get(cache_keys[key])
+                if cached is not None:
+                    data[key] = cached
+                    continue
+            todo.append(params)
+
+        if todo:
+            with PIL.Image.open(self.source_image) as image:
+                thumbnails = _create_thumbnails(image, todo)
+            for params, thumbnail in zip(todo, thumbnails, strict=True):
+                key = self._get_key(params)
+                data[key] = _encode(thumbnail, params)
+                if cache is not None:
+                    cache.put(cache_keys[key], data[key])
+        return data
+
+    def create_artifact(
+        self, thumbnail_params: ThumbnailParams, artifact: Artifact
+    ) -> None:
+        """Create the artifact for one of the thumbnails of the batch."""
+        if self._data is None:
+            self._data = self._encode_thumbnails(artifact)
+        data = self._data.pop(self._get_key(thumbnail_params), None)
+        if data is None:
+            # The artifact is being built a second time.
+            _create_artifact(
+                self.source_image, thumbnail_params, artifact, cache=self.cache
+            )
+            return
+        with artifact.open("wb") as fp:
+            fp.write(data)
 
 
 def _get_thumbnail_url_path(
@@ -409,21 +696,23 @@ def _get_thumbnail_url_path(
     )
 
 
-def make_image_thumbnail(
-    ctx: Context,
-    source_image: str | Path,
+def _plan_thumbnail(
+    image_info: ImageInfo,
     source_url_path: str,
     *,
-    width: int | None = None,
-    height: int | None = None,
-    mode: ThumbnailMode = ThumbnailMode.DEFAULT,
-    upscale: bool | None = None,
-    quality: int | None = None,
-) -> Thumbnail:
-    """Helper method that can create thumbnails from within the build process
-    of an artifact.
+    width: int | None,
+    height: int | None,
+    mode: ThumbnailMode,
+    upscale: bool | None,
+    quality: int | None,
+    format: str | None = None,
+    effort: int | None = None,
+) -> tuple[Thumbnail, ThumbnailParams | None]:
+    """Determine the size and URL of a thumbnail.
+
+    Returns the thumbnail, and the parameters needed to compute it, or `None`
+    if the source image is to be used as is.
     """
-    image_info = get_image_info(source_image)
     if isinstance(image_info, UnknownImageInfo):
         raise RuntimeError("Cannot process unknown images")
 
@@ -452,27 +741,173 @@ def make_image_thumbnail(
     if isinstance(image_info, SvgImageInfo):
         # XXX: Since we don't always know the original dimensions,
         # we currently omit the upscaling check for SVG images.
-        return Thumbnail(source_url_path, size.width, size.height)
+        return Thumbnail(source_url_path, size.width, size.height), None
+
+    source_format = image_info.format.upper()
+    if format is None:
+        format = source_format
+    elif not _get_format_info(format).is_available():
+        raise ValueError(f"Writing {format.upper()} images is not supported.")
 
     would_upscale = size.width > image_info.width or size.height > image_info.height
     if would_upscale and not upscale:
-        return Thumbnail(source_url_path, image_info.width, image_info.height)
+        if _get_format_info(format) is _get_format_info(source_format):
+            return Thumbnail(source_url_path, image_info.width, image_info.height), None
+        # Convert the image without scaling it.
+        size = ImageSize(image_info.width, image_info.height)
 
     thumbnail_params = ThumbnailParams(
         size=size,
-        format=image_info.format.upper(),
+        format=format,
         quality=quality,
         crop=mode == ThumbnailMode.CROP,
+        effort=effort,
     )
     dst_url_path = _get_thumbnail_url_path(source_url_path, thumbnail_params)
+    return Thumbnail(dst_url_path, size.width, size.height), thumbnail_params
+
+
+def make_image_thumbnail(
+    ctx: Context,
+    source_image: str | Path,
+    source_url_path: str,
+    *,
+    width: int | None = None,
+    height: int | None = None,
+    mode: ThumbnailMode = ThumbnailMode.DEFAULT,
+    upscale: bool | None = None,
+    quality: int | None = None,
+    format: str | None = None,
+    effort: int | None = None,
+) -> Thumbnail:
+    """Helper method that can create thumbnails from within the build process
+    of an artifact.
+
+    By default, the thumbnail has the same format as the source image.  A
+    different ``format`` (e.g. ``"webp"`` or ``"avif"``) may be given.
+    """
+    thumbnail, thumbnail_params = _plan_thumbnail(
+        get_image_info(source_image),
+        source_url_path,
+        width=width,
+        height=height,
+        mode=mode,
+        upscale=upscale,
+        quality=quality,
+        format=format,
+        effort=effort,
+    )
+    if thumbnail_params is not None:
+        ctx.add_sub_artifact(
+            artifact_name=thumbnail.url_path,
+            sources=[source_image],
+            build_func=partial(
+                _create_artifact,
+                source_image,
+                thumbnail_params,
+                cache=get_thumbnail_cache(ctx.pad),
+            ),
+        )
+    return thumbnail
 
-    ctx.add_sub_artifact(
-        artifact_name=dst_url_path,
-        sources=[source_image],
-        build_func=partial(_create_artifact, source_image, thumbnail_params),
+
+class _ThumbnailPlanner:
+    """Plans "fit"-mode thumbnails of several widths of an image, and adds
+    the sub-artifacts for them as a single batch.
+    """
+
+    def __init__(self, source_image: str | Path, source_url_path: str):
+        self.source_image = source_image
+        self.source_url_path = source_url_path
+        self.image_info = get_image_info(source_image)
+        self.todo: dict[str, ThumbnailParams] = {}
+
+    def plan(self, widths: Iterable[int], **kwargs: Any) -> ThumbnailSet:
+        thumbnails = []
+        for width in widths:
+            thumbnail, thumbnail_params = _plan_thumbnail(
+                self.image_info,
+                self.source_url_path,
+                width=width,
+                height=None,
+                mode=ThumbnailMode.FIT,
+                **kwargs,
+            )
+            thumbnails.append(thumbnail)
+            if thumbnail_params is not None:
+                self.todo.setdefault(thumbnail.url_path, thumbnail_params)
+        return ThumbnailSet(thumbnails)
+
+    def add_sub_artifacts(self, ctx: Context) -> None:
+        batch = _ThumbnailBatch(self.source_image, cache=get_thumbnail_cache(ctx.pad))
+        for dst_url_path, thumbnail_params in self.todo.items():
+            artifact = ctx.add_sub_artifact(
+                artifact_name=dst_url_path,
+                sources=[self.source_image],
+                build_func=partial(batch.create_artifact, thumbnail_params),
+            )
+            batch.add(artifact, thumbnail_params)
+
+
+def make_image_thumbnails(
+    ctx: Context,
+    source_image: str | Path,
+    source_url_path: str,
+    widths: Iterable[int],
+    *,
+    upscale: bool | None = None,
+    quality: int | None = None,
+    format: str | None = None,
+    effort: int | None = None,
+) -> ThumbnailSet:
+    """Create "fit"-mode thumbnails of several widths of an image.
+
+    This is like calling :func:`make_image_thumbnail` once per width, except
+    that all the thumbnails which need to be built are computed from a single
+    decode of the source image.
+    """
+    planner = _ThumbnailPlanner(source_image, source_url_path)
+    rv = planner.plan(
+        widths, upscale=upscale, quality=quality, format=format, effort=effort
     )
+    planner.add_sub_artifacts(ctx)
+    return rv
 
-    return Thumbnail(dst_url_path, size.width, size.height)
+
+def make_image_picture(
+    ctx: Context,
+    source_image: str | Path,
+    source_url_path: str,
+    widths: Iterable[int],
+    *,
+    formats: Iterable[str] | None = None,
+    upscale: bool | None = None,
+    quality: int | None = None,
+) -> Picture:
+    """Create the thumbnails for a ``<picture>`` element.
+
+    For each of ``formats`` (by default, AVIF and WebP) which the installed
+    Pillow can write, a set of "fit"-mode thumbnails of the given widths is
+    created.  So is a fallback set in the format of the source image.  All
+    thumbnails which need to be built are computed from a single decode of
+    the source image.
+    """
+    widths = list(widths)
+    planner = _ThumbnailPlanner(source_image, source_url_path)
+    if formats is None:
+        formats = get_available_formats()
+    if isinstance(planner.image_info, SvgImageInfo):
+        formats = []
+    sources = [
+        PictureSource(
+            _get_format_info(format).mime_type,
+            planner.plan(widths, upscale=upscale, quality=quality, format=format),
+        )
+        for format in formats
+    ]
+    img = planner.plan(widths, upscale=upscale, quality=quality)
+    planner.add_sub_artifacts(ctx)
+    return Picture(sources, img)
 
 
 @dataclasses.dataclass(frozen=True)
@@ -485,3 +920,72 @@ class Thumbnail:
 
     def __str__(self) -> str:
         return posixpath.basename(self.url_path)
+
+
+class ThumbnailSet(Sequence[Thumbnail]):
+    """A sequence of thumbnails of the same image, in different sizes.
+
+    The thumbnails are ordered as requested.  Converting to a string gives the
+    value for the ``srcset`` attribute of an ``<img>`` tag.
+    """
+
+    def __init__(self, thumbnails: Iterable[Thumbnail]):
+        self._thumbnails = tuple(thumbnails)
+
+    @overload
+    def __getitem__(self, index: int) -> Thumbnail: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Thumbnail]: ...
+
+    def __getitem__(self, index: int | slice) -> Thumbnail | Sequence[Thumbnail]:
+        return self._thumbnails[index]
+
+    def __len__(self) -> int:
+        return len(self._thumbnails)
+
+    @property
+    def srcset(self) -> str:
+        """The thumbnails as candidates for a ``srcset`` attribute.
+
+        Duplicates (e.g. the source image, which is used as is for widths that
+        would need upscaling) are omitted.
+        """
+        seen = set()
+        candidates = []
+        for thumbnail in self._thumbnails:
+            if thumbnail.url_path not in seen:
+                seen.add(thumbnail.url_path)
+                candidates.append(f"{thumbnail} {thumbnail.width}w")
+        return ", ".join(candidates)
+
+    def __str__(self) -> str:
+        return self.srcset
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self._thumbnails)!r})"
+
+
+@dataclasses.dataclass(frozen=True)
+class PictureSource:
+    """The thumbnails of an image in one format, for a ``<source>`` element."""
+
+    type: str  # the MIME type
+    thumbnails: ThumbnailSet
+
+    @property
+    def srcset(self) -> str:
+        return self.thumbnails.srcset
+
+
+@dataclasses.dataclass(frozen=True)
+class Picture:
+    """The thumbnails for a ``<picture>`` element.
+
+    ``sources`` holds the thumbnails in modern formats, in order of
+    preference, for the ``<source>`` elements.  ``img`` holds the thumbnails
+    in the format of the source image, for the fallback ``<img>`` element.
+    """
+
+    sources: Sequence[PictureSource]
+    img: ThumbnailSet
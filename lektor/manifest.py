@@ -0,0 +1,281 @@
+"""A manifest of the artifacts in the output folder, for publishers.
+
+Publishers record the checksum, size and modification time of each artifact
+in the ``artifact_manifest`` table of the build state database, when they
+first need its checksum.  Later deploys use the manifest to determine the
+checksums of the files in the output folder without reading those which
+have not changed since.  Builds do not read artifacts back to checksum
+them; the builder only forgets the artifacts it removes.
+
+Publishers also record, per target, the checksums of the artifacts that were
+last published successfully (in the ``published_artifacts`` table), so that
+they can find the artifacts which changed since.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import NamedTuple
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+
+class ManifestEntry(NamedTuple):
+    """The checksum of an artifact, and the size and modification time of its
+    file when the checksum was computed.
+    """
+
+    checksum: str
+    size: int
+    mtime_ns: int
+
+
+def create_manifest_tables(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        create table if not exists artifact_manifest (
+            artifact text,
+            checksum text,
+            size integer,
+            mtime_ns integer,
+            primary key (artifact)
+        )
+    """
+    )
+    con.execute(
+        """
+        create table if not exists published_artifacts (
+            target text,
+            artifact text,
+            checksum text,
+            primary key (target, artifact)
+        )
+    """
+    )
+    con.execute(
+        """
+        create table if not exists git_blobs (
+            checksum text,
+            oid text,
+            primary key (checksum)
+        )
+    """
+    )
+    con.execute(
+        """
+        create table if not exists publish_targets (
+            target text,
+            deploys_since_full integer,
+            primary key (target)
+        )
+    """
+    )
+
+
+def compute_manifest_entry(filename: str) -> ManifestEntry:
+    """Compute the manifest entry for a file."""
+    h = hashlib.sha1()
+    with open(filename, "rb") as f:
+        st = os.fstat(f.fileno())
+        while chunk := f.read(64 * 1024):
+            h.update(chunk)
+    return ManifestEntry(h.hexdigest(), st.st_size, st.st_mtime_ns)
+
+
+def forget_artifact(con: sqlite3.Connection, artifact_name: str) -> None:
+    """Remove an artifact from the manifest."""
+    con.execute(
+        "delete from artifact_manifest where artifact = ?",
+        [artifact_name.strip("/")],
+    )
+
+
+def get_target_key(target_url: str) -> str:
+    """The key under which the artifacts published to a target are recorded.
+
+    This is the target URL, without any password.
+    """
+    url = urlsplit(target_url)
+    if url.password is not None:
+        userinfo, _, hostport = url.netloc.rpartition("@")
+        username = userinfo.partition(":")[0]
+        url = url._replace(netloc=f"{username}@{hostport}")
+    return urlunsplit(url)
+
+
+class PublishManifest:
+    """The manifest of an output folder, as seen by publishers."""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+
+    @classmethod
+    def for_output_path(cls, output_path: str) -> PublishManifest | None:
+        """Open the manifest of an output folder.
+
+        Returns ``None`` if the output folder has no build state.
+        """
+        filename = os.path.join(output_path, ".lektor", "buildstate")
+        if not os.path.isfile(filename):
+            return None
+
+        def connect() -> sqlite3.Connection:
+            return sqlite3.connect(filename, isolation_level=None, timeout=10)
+
+        con = connect()
+        try:
+            create_manifest_tables(con)
+        finally:
+            con.close()
+        return cls(connect)
+
+    def get_entries(self) -> dict[str, ManifestEntry]:
+        """Get the manifest entries of all artifacts."""
+        con = self._connect()
+        try:
+            rows = con.execute(
+                "select artifact, checksum, size, mtime_ns from artifact_manifest"
+            ).fetchall()
+        finally:
+            con.close()
+        return {
+            artifact: ManifestEntry(checksum, size, mtime_ns)
+            for artifact, checksum, size, mtime_ns in rows
+        }
+
+    def update_entries(self, entries: Mapping[str, ManifestEntry]) -> None:
+        """Store manifest entries which publishers had to compute."""
+        if not entries:
+            return
+        con = self._connect()
+        try:
+            con.execute("begin")
+            con.executemany(
+                """
+                insert or replace into artifact_manifest
+                    (artifact, checksum, size, mtime_ns) values (?, ?, ?, ?)
+            """,
+                [(artifact, *entry) for artifact, entry in entries.items()],
+            )
+            con.execute("commit")
+        finally:
+            con.close()
+
+    def get_published(self, target_url: str) -> dict[str, str]:
+        """Get the checksums of the artifacts last published to a target."""
+        con = self._connect()
+        try:
+            rows = con.execute(
+                "select artifact, checksum from published_artifacts where target = ?",
+                [get_target_key(target_url)],
+            ).fetchall()
+        finally:
+            con.close()
+        return dict(rows)
+
+    def get_deploys_since_full(self, target_url: str) -> int | None:
+        """Get the number of incremental deploys to a target since all its
+        artifacts were recorded with :meth:`set_published`.
+
+        Returns ``None`` if nothing was published to the target.
+        """
+        con = self._connect()
+        try:
+            row = con.execute(
+                "select deploys_since_full from publish_targets where target = ?",
+                [get_target_key(target_url)],
+            ).fetchone()
+        finally:
+            con.close()
+        return None if row is None else row[0]  # type: ignore[no-any-return]
+
+    def set_published(
+        self, target_url: str, artifacts: Iterable[tuple[str, str]]
+    ) -> None:
+        """Record the artifacts (and their checksums) published to a target."""
+        target = get_target_key(target_url)
+        con = self._connect()
+        try:
+            con.execute("begin")
+            con.execute("delete from published_artifacts where target = ?", [target])
+            con.executemany(
+                """
+                insert into published_artifacts (target, artifact, checksum)
+                    values (?, ?, ?)
+            """,
+                [(target, artifact, checksum) for artifact, checksum in artifacts],
+            )
+            con.execute(
+                """
+                insert or replace into publish_targets (target, deploys_since_full)
+                    values (?, 0)
+            """,
+                [target],
+            )
+            con.execute("commit")
+        finally:
+            con.close()
+
+    def update_published(
+        self,
+        target_url: str,
+        changed: Iterable[tuple[str, str]],
+        removed: Iterable[str],
+    ) -> None:
+        """Record an incremental deploy of changed artifacts (and their
+        checksums) to a target, and the artifacts removed from it.
+        """
+        target = get_target_key(target_url)
+        con = self._connect()
+        try:
+            con.execute("begin")
+            con.executemany(
+                """
+                insert or replace into published_artifacts
+                    (target, artifact, checksum) values (?, ?, ?)
+            """,
+                [(target, artifact, checksum) for artifact, checksum in changed],
+            )
+            con.executemany(
+                "delete from published_artifacts where target = ? and artifact = ?",
+                [(target, artifact) for artifact in removed],
+            )
+            con.execute(
+                """
+                update publish_targets set deploys_since_full = deploys_since_full + 1
+                 where target = ?
+            """,
+                [target],
+            )
+            con.execute("commit")
+        finally:
+            con.close()
+
+    def get_git_blobs(self) -> dict[str, str]:
+        """Get the ids of the git blobs of artifacts, by checksum, as
+        recorded by previous deploys to GitHub pages.
+        """
+        con = self._connect()
+        try:
+            rows = con.execute("select checksum, oid from git_blobs").fetchall()
+        finally:
+            con.close()
+        return dict(rows)
+
+    def set_git_blobs(self, blobs: Mapping[str, str]) -> None:
+        """Record the ids of the git blobs of the current artifacts."""
+        con = self._connect()
+        try:
+            con.execute("begin")
+            con.execute("delete from git_blobs")
+            con.executemany(
+                "insert into git_blobs (checksum, oid) values (?, ?)", blobs.items()
+            )
+            con.execute("commit")
+        finally:
+            con.close()
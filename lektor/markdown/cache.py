@@ -0,0 +1,281 @@
+"""A persistent cache of rendered markdown.
+
+Rendered markdown is stored on disk, under the project's directory in the
+Lektor cache directory, so that it is reused across builds.  Entries are
+keyed by a hash of the markdown source, the path and alt of the record it
+belongs to, the base URL, the field options, and a fingerprint of the
+markdown configuration (see :meth:`MarkdownController.get_config_fingerprint`).
+
+The dependencies recorded while rendering (e.g. on the records that links
+resolve to) are stored along with the result.  A cached result is only used
+if those dependencies are unchanged, in which case they are replayed into the
+current build context.
+
+The least recently used entries are evicted when the cache grows beyond its
+size limit.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Hashable
+from collections.abc import Iterator
+from typing import Any
+from typing import TYPE_CHECKING
+
+from jinja2.utils import LRUCache
+
+from lektor.utils import atomic_open
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from lektor.context import Context
+    from lektor.db import Pad
+    from lektor.markdown.controller import RenderResult
+
+
+def _dump_dependencies(pad: Pad, dependencies: Any) -> list[list[Any]]:
+    # lektor.builder (indirectly) imports this module, so these imports are
+    # deferred to call time.
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from lektor.builder import FileInfo
+    from lektor.builder import PathCache
+
+    path_cache = PathCache(pad.env)
+    rv = []
+    for dependency in dependencies:
+        if isinstance(dependency, str):
+            info = FileInfo(pad.env, dependency)
+            checksum = info.checksum if info.is_dir else None
+            rv.append(
+                ["file", dependency, info.mtime, info.size, info.is_dir, checksum]
+            )
+        else:
+            rv.append(
+                [
+                    "virtual",
+                    dependency.path,
+                    dependency.alt,
+                    dependency.get_mtime(path_cache),
+                    dependency.get_checksum(path_cache),
+                ]
+            )
+    return rv
+
+
+def _load_dependencies(pad: Pad, infos: list[list[Any]]) -> list[Any] | None:
+    """Checks whether the dependencies stored with a cache entry are
+    unchanged.
+
+    Returns the dependencies (filenames and virtual sources), or `None` if
+    any of them have changed.
+    """
+    # lektor.builder (indirectly) imports this module, so these imports are
+    # deferred to call time.
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from lektor.builder import FileInfo
+    from lektor.builder import PathCache
+    from lektor.builder import VirtualSourceInfo
+
+    path_cache = PathCache(pad.env)
+    rv = []
+    for kind, *info in infos:
+        if kind == "file":
+            filename, mtime, size, is_dir, checksum = info
+            old = FileInfo(pad.env, filename, mtime, size, checksum, is_dir)
+            if not FileInfo(pad.env, filename).unchanged(old):
+                return None
+            rv.append(filename)
+        else:
+            path, alt, mtime, checksum = info
+            source = pad.get(path, alt=alt)
+            if source is None:
+                return None
+            current = VirtualSourceInfo(
+                path, alt, source.get_mtime(path_cache), source.get_checksum(path_cache)
+            )
+            if not current.unchanged(VirtualSourceInfo(path, alt, mtime, checksum)):
+                return None
+            rv.append(source)
+    return rv
+
+
+# Fraction of the size limit that the cache is pruned down to, once exceeded
+_PRUNE_RATIO = 0.9
+
+
+@dataclasses.dataclass
+class MarkdownCacheStats:
+    count: int
+    size: int
+
+
+class MarkdownCache:
+    """Stores rendered markdown on disk.
+
+    The most recently used entries are also kept in memory.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        capacity: int = 1024,
+        max_size: int | None = None,
+    ):
+        self.directory = os.fspath(directory)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._recent = LRUCache(capacity)
+        # The running total size of the cache on disk, if known
+        self._size: int | None = None
+
+    @staticmethod
+    def get_key(*parts: Hashable) -> str:
+        """Compute a cache key from JSON-serializable parts."""
+        data = json.dumps(parts, sort_keys=True, default=repr)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def _get_filename(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read(self, key: str) -> str | None:
+        with self._lock:
+            rv = self._recent.get(key)
+        if rv is None:
+            filename = self._get_filename(key)
+            try:
+                with open(filename, encoding="utf-8") as f:
+                    rv = f.read()
+                # Mark as recently used.
+                os.utime(filename)
+            except OSError:
+                return None
+            with self._lock:
+                self._recent[key] = rv
+        return rv
+
+    def _write(self, key: str, data: str) -> None:
+        with self._lock:
+            self._recent[key] = data
+        filename = self._get_filename(key)
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with atomic_open(filename, "w", encoding="utf-8") as f:
+                f.write(data)
+        except OSError:
+            # Failing to cache is not an error.
+            return
+
+        max_size = self.max_size
+        if max_size is None:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self.stats().size
+            else:
+                self._size += len(data.encode("utf-8"))
+            exceeded = self._size > max_size
+        if exceeded:
+            self.prune(int(max_size * _PRUNE_RATIO))
+
+    def _iter_entries(self) -> Iterator[os.DirEntry[str]]:
+        try:
+            subdirs = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for subdir in subdirs:
+            if not subdir.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(subdir.path))
+            except OSError:
+                continue
+            for entry in entries:
+                # Skip temporary files of writes in progress.
+                if entry.is_file() and not entry.name.startswith("."):
+                    yield entry
+
+    def stats(self) -> MarkdownCacheStats:
+        """Count the entries stored on disk and their total size."""
+        count = size = 0
+        for entry in self._iter_entries():
+            count += 1
+            size += entry.stat().st_size
+        return MarkdownCacheStats(count, size)
+
+    def prune(self, max_size: int) -> MarkdownCacheStats:
+        """Evict the least recently used entries from disk until the total
+        size of the cache is at most ``max_size`` bytes.
+
+        Returns the count and total size of the evicted entries.
+        """
+        entries = []
+        total = 0
+        for entry in self._iter_entries():
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        entries.sort()
+
+        removed = MarkdownCacheStats(0, 0)
+        for _, size, path in entries:
+            if total <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed.count += 1
+            removed.size += size
+
+        with self._lock:
+            self._size = total
+        return removed
+
+    def get(self, key: str, ctx: Context) -> RenderResult | None:
+        """Look up a rendered result.
+
+        If found, the dependencies recorded while rendering it are recorded
+        in ``ctx``.
+        """
+        # pylint: disable=import-outside-toplevel
+        from lektor.markdown.controller import RenderResult
+
+        data = self._read(key)
+        if data is None:
+            return None
+        try:
+            html, meta, infos = json.loads(data)
+        except ValueError:
+            return None
+        dependencies = _load_dependencies(ctx.pad, infos)
+        if dependencies is None:
+            return None
+        for dependency in dependencies:
+            if isinstance(dependency, str):
+                ctx.record_dependency(dependency)
+            else:
+                ctx.record_virtual_dependency(dependency)
+        return RenderResult(html, meta)
+
+    def set(
+        self, key: str, result: RenderResult, dependencies: Any, ctx: Context
+    ) -> None:
+        """Store a rendered result, along with the dependencies recorded
+        while rendering it.
+        """
+        try:
+            meta = json.dumps(result.meta)
+        except (TypeError, ValueError):
+            return
+        if json.loads(meta) != result.meta:
+            # The metadata set by some plugin does not survive serialization.
+            return
+        infos = _dump_dependencies(ctx.pad, dependencies)
+        data = json.dumps([result.html, result.meta, infos])
+        self._write(key, data)
@@ -1,3 +1,5 @@
+import os
+import sys
 import threading
 from abc import ABC
 from abc import abstractmethod
@@ -6,6 +8,7 @@ from collections.abc import Hashable
 from collections.abc import Mapping
 from collections.abc import MutableMapping
 from dataclasses import dataclass
+from importlib import metadata
 from typing import Any
 from typing import NamedTuple
 from typing import Optional
@@ -16,6 +19,7 @@ from werkzeug.utils import cached_property
 
 from lektor.context import Context
 from lektor.context import get_ctx
+from lektor.markdown.cache import MarkdownCache
 from lektor.sourceobj import SourceObject
 
 
@@ -142,13 +146,50 @@ class RenderResult(NamedTuple):
     meta: Meta
 
 
+def _describe_code(obj: Any) -> list[Any]:
+    """Describe the code of a class or function.
+
+    This includes the modification time of the module defining it, so that
+    the description changes when (e.g.) a plugin under development is edited.
+    """
+    module = getattr(obj, "__module__", None)
+    filename = getattr(sys.modules.get(module), "__file__", None)
+    try:
+        mtime = os.stat(filename).st_mtime_ns if filename else None
+    except OSError:
+        mtime = None
+    return [module, getattr(obj, "__qualname__", None), mtime]
+
+
+def _describe_config(value: Any) -> Any:
+    """Describe a markdown configuration value, for fingerprinting."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Mapping):
+        return sorted(
+            ([_describe_config(k), _describe_config(v)] for k, v in value.items()),
+            key=repr,
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [_describe_config(item) for item in value]
+    if isinstance(value, type) or callable(value):
+        return _describe_code(value)
+    return _describe_code(type(value))
+
+
 class MarkdownController(ABC):
     def __init__(self, env: "Environment") -> None:
         self.env = env
+        # The configuration that the parser was made with
+        self.config: Any = None
 
     @abstractmethod
     def make_parser(self) -> Callable[[str], str]:  # () -> mistune.Mistune
-        """Construct a mistune parser"""
+        """Construct a mistune parser
+
+        Implementations should store the configuration object passed to the
+        ``markdown-config`` event as ``self.config``.
+        """
 
     @cached_property
     def parser(self) -> Callable[[str], str]:  # () -> mistune.Mistune
@@ -168,10 +209,93 @@ class MarkdownController(ABC):
             return None
         return ctx.base_url
 
+    @cached_property
+    def render_cache(self) -> MarkdownCache:
+        return MarkdownCache(
+            self.env.project.get_markdown_cache_path(),
+            max_size=self.env.load_config().markdown_cache_size,
+        )
+
+    @cached_property
+    def config_fingerprint(self) -> str | None:
+        """A fingerprint of the markdown configuration.
+
+        This covers the configuration made by plugins in response to the
+        ``markdown-config`` and ``markdown-lexer-config`` events (renderer
+        mixins, mistune plugins and options), as well as the code of the
+        renderer and of all loaded Lektor plugins.
+
+        Returns ``None`` if some plugin has disabled caching of rendered
+        markdown by setting ``config.cacheable = False``.
+        """
+        _ = self.parser
+        config = self.config
+        if config is None or not getattr(config, "cacheable", True):
+            return None
+        plugins = sorted(
+            [plugin_id, plugin.version, _describe_code(type(plugin))]
+            for plugin_id, plugin in self.env.plugins.items()
+        )
+        return MarkdownCache.get_key(
+            metadata.version("Lektor"),
+            _describe_code(type(self)),
+            _describe_config(vars(config)),
+            plugins,
+        )
+
+    def get_render_cache_key(
+        self, source: str, record: SourceObject | None, field_options: FieldOptions
+    ) -> str | None:
+        """Get the key of a rendered result in the persistent render cache.
+
+        Returns ``None`` if the result should not be cached.
+        """
+        ctx = get_ctx()
+        fingerprint = self.config_fingerprint
+        base_url = self.get_cache_key()
+        if ctx is None or fingerprint is None or base_url is None:
+            return None
+        if isinstance(record, SourceObject):
+            record_key = [record.path, record.alt]
+        elif record is None:
+            record_key = None
+        else:
+            return None
+        return MarkdownCache.get_key(
+            fingerprint,
+            # The project configuration determines the style of URLs.
+            ctx.pad.db.config.values,
+            base_url,
+            record_key,
+            dict(field_options),
+            source,
+        )
+
     def render(
         self, source: str, record: SourceObject | None, field_options: FieldOptions
     ) -> RenderResult:
-        """Render markdown string"""
+        """Render markdown string
+
+        Results are looked up in (and stored into) the persistent render cache.
+        """
+        key = self.get_render_cache_key(source, record, field_options)
+        if key is None:
+            return self._render(source, record, field_options)
+
+        ctx = require_ctx()
+        result = self.render_cache.get(key, ctx)
+        if result is None:
+            dependencies: dict[Any, None] = {}
+            sub_artifact_count = len(ctx.sub_artifacts)
+            with ctx.gather_dependencies(dependencies.setdefault):
+                result = self._render(source, record, field_options)
+            if len(ctx.sub_artifacts) == sub_artifact_count:
+                self.render_cache.set(key, result, dependencies, ctx)
+        return result
+
+    def _render(
+        self, source: str, record: SourceObject | None, field_options: FieldOptions
+    ) -> RenderResult:
         meta: Meta = {}
         self.env.plugin_controller.emit("markdown-meta-init", meta=meta, record=record)
         with RendererContext(record, meta, field_options):
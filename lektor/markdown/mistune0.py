@@ -52,6 +52,8 @@ class MarkdownConfig:
         }
         self.renderer_base = ImprovedRenderer
         self.renderer_mixins: list[type] = []
+        # Set to false to disable the persistent render cache.
+        self.cacheable = True
 
     def make_renderer(self) -> ImprovedRenderer:
         bases = tuple(self.renderer_mixins) + (self.renderer_base,)
@@ -70,6 +72,7 @@ class MarkdownController0(MarkdownController, threading.local):
         env = self.env
         cfg = MarkdownConfig()
         env.plugin_controller.emit("markdown-config", config=cfg)
+        self.config = cfg
         renderer = cfg.make_renderer()
         env.plugin_controller.emit(
             "markdown-lexer-config", config=cfg, renderer=renderer
@@ -62,6 +62,11 @@ class MarkdownConfig:
         }
         self.renderer_base = ImprovedRenderer
         self.renderer_mixins: list[type] = []
+        # Plugins whose rendering depends on more than the markdown source,
+        # the field options, the base URL and the path of the record (e.g. on
+        # other fields of the record) should set this to false to disable
+        # the persistent cache of rendered markdown.
+        self.cacheable = True
         self.parser_options: ParserConfigDict = {
             "plugins": list(self.DEFAULT_PLUGINS),
         }
@@ -78,6 +83,7 @@ class MarkdownController2(MarkdownController):
         cfg = MarkdownConfig()
         # FIXME: call different hooks here for mistune 2?
         env.plugin_controller.emit("markdown-config", config=cfg)
+        self.config = cfg
         renderer = cfg.make_renderer()
         env.plugin_controller.emit(
             "markdown-lexer-config", config=cfg, renderer=renderer
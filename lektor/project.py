@@ -136,6 +136,23 @@ class Project:
 
         return Path(get_cache_dir(), cache_name, h.hexdigest())
 
+    def get_template_cache_path(self) -> Path:
+        """The path where compiled templates are cached."""
+        return Path(get_cache_dir(), "templates", self.id)
+
+    def get_markdown_cache_path(self) -> Path:
+        """The path where rendered markdown is cached."""
+        return Path(get_cache_dir(), "markdown", self.id)
+
+    def get_thumbnail_cache_path(self) -> Path:
+        """The path where thumbnails are cached.
+
+        The thumbnail cache is content-addressed, and so is shared between
+        all projects.
+        """
+        # pylint: disable=no-self-use
+        return Path(get_cache_dir(), "thumbnails")
+
     def content_path_from_filename(self, filename):
         """Given a filename returns the content path or None if
         not in project.
@@ -5,19 +5,29 @@ import hashlib
 import io
 import os
 import posixpath
+import queue
+import stat
+import threading
+import time
 import urllib.parse
 from collections.abc import Callable
 from collections.abc import Generator
 from collections.abc import Iterable
 from collections.abc import Iterator
 from collections.abc import Mapping
+from collections.abc import MutableMapping
 from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from contextlib import AbstractContextManager
 from contextlib import contextmanager
 from contextlib import ExitStack
 from contextlib import suppress
 from ftplib import Error as FTPError
+from functools import cached_property
 from inspect import cleandoc
+from itertools import chain
 from pathlib import Path
 from subprocess import CalledProcessError
 from subprocess import CompletedProcess
@@ -35,6 +45,8 @@ from werkzeug.datastructures import MultiDict
 
 from lektor.compat import werkzeug_urls_URL
 from lektor.exception import LektorException
+from lektor.manifest import compute_manifest_entry
+from lektor.manifest import PublishManifest
 from lektor.utils import bool_from_string
 from lektor.utils import locate_executable
 from lektor.utils import portable_popen
@@ -297,10 +309,144 @@ class Publisher:
     ) -> Iterator[str]:
         raise NotImplementedError()
 
+    @cached_property
+    def manifest(self) -> PublishManifest | None:
+        """The manifest of the output folder, if it has been built."""
+        return PublishManifest.for_output_path(self.output_path)
+
+    def iter_artifacts(
+        self,
+        is_ignored: Callable[[str], bool] | None = None,
+        *,
+        include_dir_links: bool = False,
+    ) -> Iterator[tuple[str, str, str]]:
+        """Iterates over all artifacts in the build folder and yields the
+        artifacts.
+
+        Yields ``(artifact_name, filename, checksum)`` tuples.  Checksums
+        are taken from the manifest of the output folder, where possible,
+        rather than computed.
+
+        Files and folders for which ``is_ignored`` returns true are skipped.
+        It is passed their path within the build folder (e.g. ``"a/b.html"``).
+        By default, their name is checked with
+        :meth:`Environment.is_ignored_artifact`.
+
+        Symbolic links to folders are not followed.  If
+        ``include_dir_links`` is true, they are yielded themselves, with a
+        checksum of the link's target path.
+        """
+        if is_ignored is None:
+            env = self.env
+
+            def is_ignored(path: str) -> bool:
+                return env.is_ignored_artifact(posixpath.basename(path))
+
+        manifest = self.manifest
+        entries = manifest.get_entries() if manifest is not None else {}
+        new_entries = {}
+
+        for dirpath, dirnames, filenames in os.walk(self.output_path):
+            prefix = os.path.relpath(dirpath, self.output_path)
+            prefix = (
+                "" if prefix == os.curdir else prefix.replace(os.path.sep, "/") + "/"
+            )
+            dirnames[:] = [x for x in dirnames if not is_ignored(prefix + x)]
+            if include_dir_links:
+                for dirname in dirnames:
+                    full_path = os.path.join(dirpath, dirname)
+                    if os.path.islink(full_path):
+                        target = os.readlink(full_path)
+                        checksum = hashlib.sha1(os.fsencode(target)).hexdigest()
+                        yield prefix + dirname, full_path, checksum
+            for filename in filenames:
+                if is_ignored(prefix + filename):
+                    continue
+                full_path = os.path.join(self.output_path, dirpath, filename)
+                local_path = full_path[len(self.output_path) :].lstrip(os.path.sep)
+                if os.path.altsep:
+                    local_path = local_path.lstrip(os.path.altsep)
+                artifact_name = local_path.replace(os.path.sep, "/")
+                try:
+                    st = os.stat(full_path)
+                    entry = entries.get(artifact_name)
+                    if entry is None or (entry.size, entry.mtime_ns) != (
+                        st.st_size,
+                        st.st_mtime_ns,
+                    ):
+                        entry = new_entries[artifact_name] = compute_manifest_entry(
+                            full_path
+                        )
+                    checksum = entry.checksum
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    checksum = hashlib.sha1().hexdigest()
+                yield artifact_name, full_path, checksum
+
+        if manifest is not None:
+            manifest.update_entries(new_entries)
+
+    def iter_changed_artifacts(self, target_url: str) -> Iterator[tuple[str, str, str]]:
+        """Iterates over the artifacts which changed since they were last
+        published to a target (see :meth:`record_published`).
+
+        Yields ``(artifact_name, filename, checksum)`` tuples, like
+        :meth:`iter_artifacts`.
+        """
+        manifest = self.manifest
+        published = manifest.get_published(target_url) if manifest is not None else {}
+        for artifact_name, filename, checksum in self.iter_artifacts():
+            if published.get(artifact_name) != checksum:
+                yield artifact_name, filename, checksum
+
+    def iter_removed_artifacts(self, target_url: str) -> Iterator[str]:
+        """Iterates over the names of the artifacts which were published to
+        a target, but are no longer in the build folder.
+        """
+        manifest = self.manifest
+        published = manifest.get_published(target_url) if manifest is not None else {}
+        for artifact_name in sorted(published):
+            filename = os.path.join(self.output_path, *artifact_name.split("/"))
+            if not os.path.isfile(filename):
+                yield artifact_name
+
+    def record_published(self, target_url: str, artifacts: Mapping[str, str]) -> None:
+        """Record that the artifacts, a mapping of artifact names to
+        checksums, were published successfully to a target.
+        """
+        manifest = self.manifest
+        if manifest is not None:
+            manifest.set_published(target_url, artifacts.items())
+
+    def record_published_changes(
+        self,
+        target_url: str,
+        changed: Mapping[str, str],
+        removed: Iterable[str] = (),
+    ) -> None:
+        """Record that the changed artifacts, a mapping of artifact names to
+        checksums, were published successfully to a target, and that the
+        removed artifacts were deleted from it.
+        """
+        manifest = self.manifest
+        if manifest is not None:
+            manifest.update_published(target_url, changed.items(), removed)
+
+
+# The default number of incremental rsync deploys between full ones
+DEFAULT_RSYNC_FULL_EVERY = 20
+
 
 class RsyncPublisher(Publisher):
     @contextmanager
-    def get_command(self, target_url, credentials):
+    def get_command(self, target_url, credentials, files_from=None):
+        """Get the rsync command for a deploy.
+
+        If ``files_from`` is set, only the files listed in it (separated by
+        null characters) are transferred, or deleted if they no longer exist
+        and the ``delete`` option is set.
+        """
         credentials = credentials or {}
         argline = ["rsync", "-rclzv", "--exclude=.lektor"]
         target = []
@@ -313,7 +459,11 @@ class RsyncPublisher(Publisher):
             argline.extend(("--exclude", file))
 
         delete = options.get("delete", False) in ("", "on", "yes", "true", "1", None)
-        if delete:
+        if files_from is not None:
+            argline.extend(("--from0", "--files-from", os.fspath(files_from)))
+            if delete:
+                argline.append("--delete-missing-args")
+        elif delete:
             argline.append("--delete-after")
 
         with _ssh_command(credentials, url.port) as ssh_command:
@@ -334,8 +484,61 @@ class RsyncPublisher(Publisher):
             yield Command(argline, env=env)
 
     def publish(self, target_url, credentials=None, **extra):
+        options = _parse_query(urlsplit(target_url).query, keep_blank_values=True)
+        if options.get("incremental") not in ("", "on", "yes", "true", "1"):
+            with self.get_command(target_url, credentials) as client:
+                yield from client
+            return
+
+        try:
+            full_every = int(options.get("full_every", DEFAULT_RSYNC_FULL_EVERY))
+        except ValueError:
+            self.fail("The full_every parameter of the target URL must be a number")
+        manifest = self.manifest
+        deploys = None
+        if manifest is not None:
+            deploys = manifest.get_deploys_since_full(target_url)
+        if deploys is None or deploys + 1 >= full_every:
+            yield from self.publish_full(target_url, credentials)
+        else:
+            yield from self.publish_incremental(target_url, credentials)
+
+    def publish_full(self, target_url, credentials=None):
+        """Deploy all artifacts, and record them as published."""
+        artifacts = {
+            artifact_name: checksum
+            for artifact_name, _, checksum in self.iter_artifacts()
+        }
         with self.get_command(target_url, credentials) as client:
-            yield from client
+            rv = yield from client
+        if rv.returncode == 0:
+            self.record_published(target_url, artifacts)
+
+    def publish_incremental(self, target_url, credentials=None):
+        """Deploy the artifacts which changed, or were removed, since the
+        last deploy to the target.
+        """
+        options = _parse_query(urlsplit(target_url).query, keep_blank_values=True)
+        delete = options.get("delete", False) in ("", "on", "yes", "true", "1", None)
+        changed = {
+            artifact_name: checksum
+            for artifact_name, _, checksum in self.iter_changed_artifacts(target_url)
+        }
+        removed = list(self.iter_removed_artifacts(target_url)) if delete else []
+        if not changed and not removed:
+            yield "Nothing changed since the last deploy."
+            self.record_published_changes(target_url, {})
+            return
+
+        yield f"Deploying {len(changed)} changed and {len(removed)} removed files."
+        with TemporaryDirectory() as tmpdir:
+            files_from = os.path.join(tmpdir, "files-from")
+            with open(files_from, "w", encoding="utf-8") as f:
+                f.writelines(f"{name}\0" for name in chain(changed, removed))
+            with self.get_command(target_url, credentials, files_from) as client:
+                rv = yield from client
+        if rv.returncode == 0:
+            self.record_published_changes(target_url, changed, removed)
 
 
 class FtpConnection:
@@ -505,6 +708,12 @@ class FtpConnection:
             self.log_buffer.append(str(e))
         self._known_folders.discard(filename)
 
+    def close(self):
+        try:
+            self.con.quit()
+        except Exception:  # pylint: disable=broad-except
+            self.con.close()
+
 
 class FtpTlsConnection(FtpConnection):
     @staticmethod
@@ -522,8 +731,15 @@ class FtpTlsConnection(FtpConnection):
         return connected
 
 
+# The default number of connections used to upload artifacts
+DEFAULT_FTP_CONNECTIONS = 4
+
+
 class FtpPublisher(Publisher):
     connection_class = FtpConnection
+    # How often uploaded artifacts are appended to the listing on the server
+    listing_flush_count = 100
+    listing_flush_interval = 10.0
 
     @staticmethod
     def read_existing_artifacts(con):
@@ -546,48 +762,118 @@ class FtpPublisher(Publisher):
                 rv[artifact_name] = items[1]
         return rv, duplicates
 
-    def iter_artifacts(self):
-        """Iterates over all artifacts in the build folder and yields the
-        artifacts.
-        """
-        for dirpath, dirnames, filenames in os.walk(self.output_path):
-            dirnames[:] = [x for x in dirnames if not self.env.is_ignored_artifact(x)]
-            for filename in filenames:
-                if self.env.is_ignored_artifact(filename):
-                    continue
-                full_path = os.path.join(self.output_path, dirpath, filename)
-                local_path = full_path[len(self.output_path) :].lstrip(os.path.sep)
-                if os.path.altsep:
-                    local_path = local_path.lstrip(os.path.altsep)
-                h = hashlib.sha1()
-                try:
-                    with open(full_path, "rb") as f:
-                        while 1:
-                            item = f.read(4096)
-                            if not item:
-                                break
-                            h.update(item)
-                except OSError as e:
-                    if e.errno != errno.ENOENT:
-                        raise
-                yield (
-                    local_path.replace(os.path.sep, "/"),
-                    full_path,
-                    h.hexdigest(),
-                )
-
     @staticmethod
     def get_temp_filename(filename):
         dirname, basename = posixpath.split(filename)
         return posixpath.join(dirname, "." + basename + ".tmp")
 
     def upload_artifact(self, con, artifact_name, source_file, checksum):
+        """Upload an artifact.  Returns whether the upload succeeded."""
+        # pylint: disable=unused-argument
         with open(source_file, "rb") as source:
             tmp_dst = self.get_temp_filename(artifact_name)
             con.log_buffer.append(f"000 Updating {artifact_name}")
-            con.upload_file(tmp_dst, source, mkdir=True)
+            if not con.upload_file(tmp_dst, source, mkdir=True):
+                return False
             con.rename_file(tmp_dst, artifact_name)
-            con.append(".lektor/listing", f"{artifact_name}|{checksum}\n")
+        return True
+
+    def connect_pool(self, con, target_url, credentials=None):
+        """Open the additional connections used to upload artifacts.
+
+        The number of connections, including ``con``, is set by the
+        ``connections`` parameter of the target URL.  Returns the connections
+        which could be opened.
+        """
+        options = _parse_query(urlsplit(target_url).query)
+        try:
+            count = int(options.get("connections", DEFAULT_FTP_CONNECTIONS))
+        except ValueError:
+            self.fail("The connections parameter of the target URL must be a number")
+        pool = [con]
+        for _ in range(count - 1):
+            other = self.connection_class(target_url, credentials)
+            if not other.connect():
+                # The server may limit the number of connections per user.
+                con.log_buffer.extend(other.log_buffer)
+                break
+            other.log_buffer.clear()
+            pool.append(other)
+        con.log_buffer.append(f"000 Uploading over {len(pool)} connection(s)")
+        return pool
+
+    def upload_artifacts(self, pool, artifacts):
+        """Upload artifacts concurrently, one per connection of the pool.
+
+        ``artifacts`` is an iterable of ``(artifact_name, source_file,
+        checksum)`` tuples.  Yields the log of each upload, as it completes,
+        and returns the names of the artifacts which failed to upload.
+
+        Uploaded artifacts are journaled, and appended to the listing on the
+        server every :attr:`listing_flush_count` uploads or
+        :attr:`listing_flush_interval` seconds, so that an interrupted deploy
+        need not upload them again.
+        """
+        idle = queue.SimpleQueue()
+        for con in pool:
+            idle.put(con)
+        # Appends to the listing must not be interleaved.
+        append_lock = threading.Lock()
+
+        def upload(artifact):
+            con = idle.get()
+            try:
+                ok = self.upload_artifact(con, *artifact) is not False
+                return artifact, ok, list(con.drain_log())
+            finally:
+                idle.put(con)
+
+        def append_to_listing(lines):
+            con = idle.get()
+            try:
+                with append_lock:
+                    con.append(".lektor/listing", "".join(lines))
+                return None, True, list(con.drain_log())
+            finally:
+                idle.put(con)
+
+        journal = []
+        failed = []
+        last_flush = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(pool)) as executor:
+            pending = set()
+
+            def process(done):
+                nonlocal last_flush
+                for future in done:
+                    artifact, ok, log = future.result()
+                    yield from log
+                    if artifact is None:
+                        continue
+                    artifact_name, _, checksum = artifact
+                    if ok:
+                        journal.append(f"{artifact_name}|{checksum}\n")
+                    else:
+                        failed.append(artifact_name)
+                now = time.monotonic()
+                if journal and (
+                    len(journal) >= self.listing_flush_count
+                    or now - last_flush >= self.listing_flush_interval
+                ):
+                    pending.add(executor.submit(append_to_listing, journal[:]))
+                    journal.clear()
+                    last_flush = now
+
+            for artifact in artifacts:
+                pending.add(executor.submit(upload, artifact))
+                # Limit the number of queued uploads.
+                if len(pending) >= 2 * len(pool):
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from process(done)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from process(done)
+        return failed
 
     def consolidate_listing(self, con, current_artifacts):
         server_artifacts, duplicates = self.read_existing_artifacts(con)
@@ -625,17 +911,36 @@ class FtpPublisher(Publisher):
         yield from con.drain_log()
 
         yield "000 Begin sync ..."
+        pool = self.connect_pool(con, target_url, credentials)
+        yield from con.drain_log()
         current_artifacts = {}
-        for artifact_name, filename, checksum in self.iter_artifacts():
-            current_artifacts[artifact_name] = checksum
-            if checksum != committed_artifacts.get(artifact_name):
-                self.upload_artifact(con, artifact_name, filename, checksum)
-                yield from con.drain_log()
+
+        def iter_changed_artifacts():
+            for artifact_name, filename, checksum in self.iter_artifacts():
+                current_artifacts[artifact_name] = checksum
+                if checksum != committed_artifacts.get(artifact_name):
+                    yield artifact_name, filename, checksum
+
+        try:
+            failed = yield from self.upload_artifacts(pool, iter_changed_artifacts())
+        finally:
+            for other in pool[1:]:
+                other.close()
         yield "000 Sync done!"
 
+        # Keep the listing entries of artifacts which failed to upload, so
+        # that the upload is retried by the next deploy.
+        for artifact_name in failed:
+            if artifact_name in committed_artifacts:
+                current_artifacts[artifact_name] = committed_artifacts[artifact_name]
+            else:
+                del current_artifacts[artifact_name]
+
         yield "000 Consolidating server state ..."
         self.consolidate_listing(con, current_artifacts)
         yield from con.drain_log()
+        con.close()
+        self.record_published(target_url, current_artifacts)
 
         yield "000 All done!"
 
@@ -738,6 +1043,88 @@ class GitRepo(AbstractContextManager["GitRepo"]):
             cred_file.write_text(f"https://{userpass}@github.com\n")
             self.run("config", "credential.helper", f'store --file "{cred_file}"')
 
+    def hash_objects(self, filenames: Sequence[str]) -> list[str]:
+        """Write the contents of files to the object database.
+
+        Returns the object ids of the files' blobs.
+        """
+        if not filenames:
+            return []
+        return self.run(
+            "hash-object",
+            "-w",
+            "--stdin-paths",
+            input="".join(f"{filename}\n" for filename in filenames),
+            capture_stdout=True,
+        ).stdout.split()
+
+    def missing_objects(self, oids: Iterable[str]) -> set[str]:
+        """Determine which of the given objects are not in the object
+        database.
+        """
+        input = "".join(f"{oid}\n" for oid in oids)
+        if not input:
+            return set()
+        output = self.run(
+            "cat-file", "--batch-check", input=input, capture_stdout=True
+        ).stdout
+        return {
+            line.split()[0] for line in output.splitlines() if line.endswith(" missing")
+        }
+
+    def add_artifacts_to_index(
+        self,
+        artifacts: Iterable[tuple[str, str, str]],
+        blobs: MutableMapping[str, str],
+    ) -> None:
+        """Add artifacts to the index, hashing only files whose blobs are not
+        yet known.
+
+        ``artifacts`` is an iterable of ``(artifact_name, filename,
+        checksum)`` tuples (see :meth:`Publisher.iter_artifacts`).
+        ``blobs`` maps the checksums of artifacts to the ids of the blobs
+        with their contents, as recorded by previous deploys.  It is updated
+        with the blobs written to the object database.
+
+        Symbolic links are added by ``git add``, so that they are kept as
+        links.
+        """
+        files = []
+        links = []
+        for artifact_name, filename, checksum in artifacts:
+            st = os.lstat(filename)
+            if stat.S_ISLNK(st.st_mode):
+                links.append(artifact_name)
+            else:
+                mode = "100755" if st.st_mode & stat.S_IXUSR else "100644"
+                files.append((artifact_name, filename, checksum, mode))
+
+        missing = self.missing_objects(
+            {blobs[checksum] for _, _, checksum, _ in files if checksum in blobs}
+        )
+        to_hash = {}
+        for _, filename, checksum, _ in files:
+            oid = blobs.get(checksum)
+            if oid is None or oid in missing:
+                to_hash.setdefault(checksum, filename)
+        oids = self.hash_objects(list(to_hash.values()))
+        blobs.update(zip(to_hash, oids, strict=True))
+
+        if files:
+            index_info = "".join(
+                f"{mode} {blobs[checksum]}\t{artifact_name}\n"
+                for artifact_name, _, checksum, mode in files
+            )
+            self.run("update-index", "--add", "--index-info", input=index_info)
+        if links:
+            self.run(
+                "add",
+                "--force",
+                "--pathspec-from-file=-",
+                "--pathspec-file-nul",
+                input="".join(f":(literal){name}\0" for name in links),
+            )
+
     def add_to_index(self, filename: str, content: str) -> None:
         """Create a file in the index.
 
@@ -755,12 +1142,20 @@ class GitRepo(AbstractContextManager["GitRepo"]):
         branch: str,
         cname: str | None = None,
         preserve_history: bool = True,
+        *,
+        artifacts: Iterable[tuple[str, str, str]] | None = None,
+        blobs: MutableMapping[str, str] | None = None,
     ) -> Iterator[str]:
         """Publish the contents of the work tree to GitHub pages.
 
         :param push_url: The URL to push to.
         :param branch: The branch to push to
         :param cname: Optional. Create a top-level ``CNAME`` with given contents.
+        :param artifacts: Optional. The files of the work tree to publish,
+            with their checksums.  If given, the index is built with
+            :meth:`add_artifacts_to_index`, rather than by ``git add``.
+        :param blobs: Optional. The blob ids of artifacts, by checksum, as
+            passed to :meth:`add_artifacts_to_index`.
         """
         refspec = f"refs/heads/{branch}"
         if preserve_history:
@@ -775,9 +1170,12 @@ class GitRepo(AbstractContextManager["GitRepo"]):
                 yield f"Creating new branch {branch}"
 
         # At this point, the index is still empty. Add all but .lektor dir to index
-        yield from _prefix_output(
-            self.popen("add", "--force", "--all", "--", ".", ":(exclude).lektor")
-        )
+        if artifacts is not None:
+            self.add_artifacts_to_index(artifacts, {} if blobs is None else blobs)
+        else:
+            yield from _prefix_output(
+                self.popen("add", "--force", "--all", "--", ".", ":(exclude).lektor")
+            )
         if cname is not None:
             self.add_to_index("CNAME", f"{cname}\n")
 
@@ -827,12 +1225,34 @@ class GithubPagesPublisher(Publisher):
 
         yield from iter(warnings)
 
+        # Blobs of the artifacts are reused from previous deploys, so that
+        # only new or changed artifacts need to be hashed by git.
+        manifest = self.manifest
+        blobs = manifest.get_git_blobs() if manifest is not None else {}
+        # Like `git add`, this includes dotfiles and links to folders, but
+        # not the build state.
+        artifacts = list(
+            self.iter_artifacts(lambda path: path == ".lektor", include_dir_links=True)
+        )
+
         with GitRepo(self.output_path) as repo:
             if push_url.startswith("https:"):
                 repo.set_https_credentials(creds)
             else:
                 repo.set_ssh_credentials(creds)
-            yield from repo.publish_ghpages(push_url, branch, cname, preserve_history)
+            yield from repo.publish_ghpages(
+                push_url,
+                branch,
+                cname,
+                preserve_history,
+                artifacts=artifacts,
+                blobs=blobs,
+            )
+
+        if manifest is not None:
+            manifest.set_git_blobs(
+                {checksum: blobs[checksum] for _, _, checksum in artifacts}
+            )
 
     def _parse_url(
         self, target_url: str
@@ -0,0 +1,232 @@
+"""A precomputed table mapping URL paths to the sources they resolve to.
+
+Resolving a URL path by walking the record tree (see
+:meth:`lektor.db.Pad.resolve_url_path`) requires scanning the children of
+each record along the way.  The :class:`RouteTable` computes the result of
+that walk for every reachable URL path at once, so that subsequent lookups
+are a dictionary access.
+
+The route table only answers for URL paths which resolve unambiguously.
+For any URL path that might be claimed by more than one source (or that might
+be claimed by a custom URL resolver) the lookup methods return ``Ellipsis``,
+so that its resolution is left to the tree walk.
+"""
+
+from __future__ import annotations
+
+import threading
+from types import EllipsisType
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+from lektor.context import Context
+
+
+if TYPE_CHECKING:
+    from collections.abc import Collection
+
+    from lektor.assets import Asset
+    from lektor.assets import Directory
+    from lektor.db import Pad
+    from lektor.db import Record
+
+
+class RecordRoute(NamedTuple):
+    """The record that a URL path resolves to."""
+
+    path: str
+    alt: str
+    page_num: int | None = None
+
+
+# A marker used in the route maps for URL paths which resolve ambiguously.
+_AMBIGUOUS = Ellipsis
+
+
+def _add_route(routes, key, route):
+    """Add a route to a route map, marking any conflicting routes as ambiguous."""
+    existing = routes.get(key, route)
+    routes[key] = route if existing == route else _AMBIGUOUS
+
+
+def _add_record_routes(
+    routes: dict[tuple[str, str], RecordRoute | EllipsisType],
+    root: Record,
+    include_shadowable: bool = True,
+) -> bool:
+    """Walk the record tree, mimicking :meth:`lektor.db.Page.resolve_url_path`,
+    adding a route for each URL path found to ``routes``.
+
+    Note that the URL path at which a record is found need not match its
+    ``url_path`` (e.g. for children replaced via ``replaced_with``.)
+
+    If ``include_shadowable`` is false, URL paths which could be shadowed by a
+    custom URL resolver (those involving slugs that contain slashes, or an
+    explicit ``index.html``) are skipped.
+
+    Returns ``True`` if all URL paths which resolve to a record were found.
+    """
+    alt = root.alt
+    complete = include_shadowable
+    seen = set()
+    stack = [(root, "")]
+
+    def add(url_path, route):
+        _add_route(routes, (alt, url_path.strip("/")), route)
+
+    while stack:
+        node, prefix = stack.pop()
+
+        path = node["_path"]
+        pg = node.datamodel.pagination_config
+        if pg.enabled:
+            add(prefix, RecordRoute(path, node.alt, 1))
+            suffix = pg.url_suffix.strip("/")
+            for page_num in range(2, pg.count_pages(node) + 1):
+                add(
+                    f"{prefix}/{suffix}/{page_num}",
+                    RecordRoute(path, node.alt, page_num),
+                )
+        else:
+            add(prefix, RecordRoute(path, node.alt))
+
+        if include_shadowable and (pg.enabled or "." not in node["_slug"]):
+            # An explicit "index.html" resolves to the (unpaginated) page.
+            add(f"{prefix}/index.html", RecordRoute(path, node.alt))
+
+        # Only descend into the children of each record once.  (This guards
+        # against cycles introduced by child replacement queries.)
+        if (path, node.alt) in seen:
+            complete = False
+            continue
+        seen.add((path, node.alt))
+
+        children = node.children.include_undiscoverable(True).include_hidden(True)
+        for child in children:
+            slug = child["_slug"]
+            if slug and (include_shadowable or "/" not in slug):
+                stack.append((child, f"{prefix}/{slug}"))
+
+        for attachment in node.attachments:
+            slug = attachment["_slug"]
+            if slug and (include_shadowable or "/" not in slug):
+                add(
+                    f"{prefix}/{slug}",
+                    RecordRoute(attachment["_path"], attachment.alt),
+                )
+
+    return complete
+
+
+def _add_asset_routes(
+    routes: dict[str, tuple[str, ...] | EllipsisType], asset_root: Directory
+) -> None:
+    """Walk the asset tree, mimicking :meth:`lektor.assets.Directory.resolve_url_path`,
+    adding a route for each URL path found to ``routes``.
+
+    The routes are the sequences of asset names leading from the asset root
+    to the asset.
+    """
+    stack: list[tuple[Asset, tuple[str, ...]]] = [(asset_root, ())]
+    while stack:
+        asset, names = stack.pop()
+        _add_route(routes, "/".join(names), names)
+        for child in asset.children:
+            child_names = (*names, child.name)
+            if child.url_name != child.name:
+                _add_route(routes, "/".join((*names, child.url_name)), child_names)
+            stack.append((child, child_names))
+
+
+class RouteTable:
+    """A map from URL paths to the records and assets they resolve to."""
+
+    def __init__(
+        self,
+        record_routes: dict[tuple[str, str], RecordRoute | EllipsisType],
+        asset_routes: dict[str, tuple[str, ...] | EllipsisType],
+        complete_alts: Collection[str] = (),
+    ):
+        self._record_routes = record_routes
+        self._asset_routes = asset_routes
+        # The alts for which record_routes contains all resolvable URL paths
+        self._complete_alts = frozenset(complete_alts)
+
+    @classmethod
+    def build(cls, pad: Pad) -> RouteTable:
+        """Build the route table for a pad by walking its record and asset trees."""
+        # Custom URL resolvers get a chance to resolve a URL path before
+        # slugs containing slashes (or an explicit "index.html") are matched,
+        # so we can not know how those resolve.
+        include_shadowable = not pad.env.custom_url_resolvers
+
+        record_routes: dict[tuple[str, str], RecordRoute | EllipsisType] = {}
+        asset_routes: dict[str, tuple[str, ...] | EllipsisType] = {}
+        complete_alts = set()
+
+        # Don't track dependencies for this part.
+        with Context(pad=pad):
+            for alt in pad.config.iter_alternatives():
+                root = pad.get_root(alt=alt)
+                if root is None:
+                    continue
+                if _add_record_routes(record_routes, root, include_shadowable):
+                    complete_alts.add(alt)
+
+            _add_asset_routes(asset_routes, pad.asset_root)
+
+        return cls(record_routes, asset_routes, complete_alts)
+
+    def __len__(self) -> int:
+        return len(self._record_routes) + len(self._asset_routes)
+
+    def lookup_record(
+        self, alt: str, pieces: list[str]
+    ) -> RecordRoute | EllipsisType | None:
+        """Find the route to the record for a URL path.
+
+        ``pieces`` is the URL path (with any alt prefix or suffix removed),
+        split into pieces.  Returns ``None`` if the URL path does not resolve
+        to a record, or ``Ellipsis`` if that can not be determined from the
+        route table.
+        """
+        rv = self._record_routes.get((alt, "/".join(pieces)))
+        if rv is None and alt not in self._complete_alts:
+            return Ellipsis
+        return rv
+
+    def lookup_asset(self, pieces: list[str]) -> tuple[str, ...] | EllipsisType | None:
+        """Find the names leading to the asset for a URL path.
+
+        Returns ``None`` if the URL path does not resolve to an asset, or
+        ``Ellipsis`` if that can not be determined from the route table.
+        """
+        return self._asset_routes.get("/".join(pieces))
+
+
+class RouteTableCache:
+    """Share a route table between pads.
+
+    Pads are generally short-lived.  (E.g. the admin server creates a new
+    pad for each request.)  When something is watching the project for
+    changes, it may install one of these on the environment (as
+    ``env.route_table_cache``) so that a single route table is shared between
+    pads.  The watcher must call :meth:`invalidate` whenever the
+    project changes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._route_table: RouteTable | None = None
+
+    def get(self, pad: Pad) -> RouteTable:
+        """Get the current route table, building it using ``pad`` if necessary."""
+        with self._lock:
+            if self._route_table is None:
+                self._route_table = RouteTable.build(pad)
+            return self._route_table
+
+    def invalidate(self) -> None:
+        """Discard the current route table."""
+        with self._lock:
+            self._route_table = None
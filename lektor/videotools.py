@@ -1,8 +1,14 @@
 import decimal
+import functools
 import json
 import os
+import shutil
 import subprocess
+import tempfile
+import threading
+import weakref
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from lektor.imagetools import Thumbnail
@@ -222,12 +228,159 @@ def get_suffix(seek, width, height, mode, quality):
     return "_".join(bits)
 
 
+@functools.cache
+def _locate_executable(exe_file, path, pathext):
+    # The search path is only passed as part of the cache key, so that
+    # changes to it are noticed.
+    del path, pathext
+    return locate_executable(exe_file)
+
+
+def locate_video_executable(exe_file):
+    """Locate ``ffmpeg`` or ``ffprobe`` in the search path.
+
+    Lookups are cached for the lifetime of the process.
+    """
+    return _locate_executable(
+        exe_file, os.environ.get("PATH"), os.environ.get("PATHEXT")
+    )
+
+
+class VideoInfoCache:
+    """Stores the video information read by ffprobe in the build state
+    database, keyed by the video's filename, modification time and size.
+
+    The information about all videos is loaded at once, when first needed.
+    Newly probed videos are written back by :meth:`flush`.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._infos = None
+        self._pending = {}
+
+    def _load(self):
+        con = self._connect()
+        try:
+            rows = con.execute(
+                """
+                select filename, mtime_ns, size, width, height, duration
+                  from video_info
+            """
+            ).fetchall()
+        finally:
+            con.close()
+        return {
+            filename: ((mtime_ns, size), (width, height, duration))
+            for filename, mtime_ns, size, width, height, duration in rows
+        }
+
+    def get_video_info(self, source, compute):
+        """Get the information about a video, calling ``compute`` if it is
+        not cached.
+        """
+        filename = os.path.abspath(source)
+        st = os.stat(filename)
+        stamp = st.st_mtime_ns, st.st_size
+        with self._lock:
+            if self._infos is None:
+                self._infos = self._load()
+            cached = self._infos.get(filename)
+        if cached is not None and cached[0] == stamp:
+            width, height, duration = cached[1]
+            return {
+                "width": width,
+                "height": height,
+                "duration": (
+                    None if duration is None else timedelta(microseconds=duration)
+                ),
+            }
+
+        info = compute(filename)
+        duration = info["duration"]
+        row = (
+            info["width"],
+            info["height"],
+            None if duration is None else duration // timedelta(microseconds=1),
+        )
+        with self._lock:
+            if self._infos is not None:
+                self._infos[filename] = stamp, row
+            self._pending[filename] = stamp, row
+        return info
+
+    def flush(self):
+        """Write any newly probed video information to the build state
+        database.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        con = self._connect()
+        try:
+            con.executemany(
+                """
+                insert or replace into video_info
+                    (filename, mtime_ns, size, width, height, duration)
+                    values (?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (filename, *stamp, *row)
+                    for filename, (stamp, row) in pending.items()
+                ],
+            )
+            con.commit()
+        finally:
+            con.close()
+
+    def prune(self):
+        """Forget the information about videos that no longer exist."""
+        self.flush()
+        con = self._connect()
+        try:
+            filenames = [
+                filename
+                for (filename,) in con.execute("select filename from video_info")
+                if not os.path.exists(filename)
+            ]
+            con.executemany(
+                "delete from video_info where filename = ?",
+                [(filename,) for filename in filenames],
+            )
+            con.commit()
+        finally:
+            con.close()
+        with self._lock:
+            self._infos = None
+
+
+def _get_video_info_cache():
+    # pylint: disable=import-outside-toplevel
+    from lektor.context import get_ctx
+
+    ctx = get_ctx()
+    if ctx is None or ctx.build_state is None:
+        return None
+    return ctx.build_state.builder.video_info_cache
+
+
 def get_video_info(filename):
     """Read video information using ffprobe if available.
 
     Returns a dict with: width, height and duration.
+
+    Within a build, the information is cached in the build state database.
     """
-    ffprobe = locate_executable("ffprobe")
+    cache = _get_video_info_cache()
+    if cache is None:
+        return _get_video_info(filename)
+    return cache.get_video_info(filename, _get_video_info)
+
+
+def _get_video_info(filename):
+    ffprobe = locate_video_executable("ffprobe")
     if ffprobe is None:
         raise RuntimeError("Failed to locate ffprobe")
 
@@ -276,6 +429,145 @@ def get_video_info(filename):
     return info
 
 
+# The maximum number of concurrently running ffmpeg processes
+FFMPEG_MAX_PROCESSES = max(1, (os.cpu_count() or 1) // 2)
+
+# The parameters of a frame extracted from a video
+_FrameParams = namedtuple(
+    "_FrameParams", ["seek", "resize_dim", "crop_dim", "quality", "format"]
+)
+
+
+@functools.cache
+def _get_ffmpeg_pool():
+    return ThreadPoolExecutor(
+        max_workers=FFMPEG_MAX_PROCESSES, thread_name_prefix="lektor-ffmpeg"
+    )
+
+
+def _run_ffmpeg(cmdline):
+    return portable_popen(cmdline).wait()
+
+
+def _get_output_args(params, input_index, output):
+    vfilter = (
+        "thumbnail",
+        f"scale={params.resize_dim.width}:{params.resize_dim.height}",
+        f"crop={params.crop_dim.width}:{params.crop_dim.height}",
+    )
+    args = ["-map", f"{input_index}:v:0", "-vf", ",".join(vfilter), "-frames:v", "1"]
+    if params.quality is not None:
+        args.extend(["-qscale:v", str(get_ffmpeg_quality(params.quality))])
+    args.append(output)
+    return args
+
+
+def _extract_frame(ffmpeg, source_video, params, output):
+    cmdline = [
+        ffmpeg,
+        "-loglevel",
+        "-8",
+        "-ss",
+        get_timecode(params.seek),  # Input seeking since it's faster
+        "-i",
+        source_video,
+        *_get_output_args(params, 0, output),
+    ]
+
+    reporter.report_debug_info("ffmpeg cmd line", cmdline)
+    returncode = _run_ffmpeg(cmdline)
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {returncode}")
+
+    if not os.path.exists(output):
+        msg = (
+            f"Unable to create video thumbnail for {source_video!r}. "
+            "Maybe the seek is outside of the video duration?"
+        )
+        raise RuntimeError(msg)
+
+
+def _cleanup_when_done(future, tmpdir):
+    future.add_done_callback(lambda _: tmpdir.cleanup())
+
+
+class _VideoFrameBatch:
+    """Extracts a set of frames of the same source video.
+
+    The frames whose artifacts need building are extracted by a single
+    ffmpeg process, with one input (seeked to the frame) and one output per
+    frame.  The process is run on a bounded pool, so that the frames of
+    several videos are extracted concurrently.
+
+    If the batch fails, frames are extracted one by one, so that errors are
+    reported for the artifacts that caused them.
+
+    The extracted frames are written to a temporary directory.  This is
+    removed once all of them have been moved into place, or otherwise
+    (e.g. if some of the artifacts are not built after a failure) once the
+    batch is discarded and ffmpeg has finished.
+    """
+
+    def __init__(self, ffmpeg, source_video):
+        self.ffmpeg = ffmpeg
+        self.source_video = source_video
+        self._frames = {}
+        self._outputs = {}
+        self._future = None
+        self._cleanup = None
+
+    def add(self, artifact, params):
+        """Add the frame for an artifact to the batch."""
+        self._frames[artifact.artifact_name] = artifact, params
+
+    def start(self, artifact=None):
+        """Start extracting the frames whose artifacts are not current.
+
+        ``artifact`` is an artifact which is being built, and is thus known
+        not to be current.
+        """
+        if self._future is not None:
+            return
+        todo = [
+            (artifact_name, params)
+            for artifact_name, (aft, params) in self._frames.items()
+            if aft is artifact or not aft.is_current
+        ]
+        if not todo:
+            return
+
+        # pylint: disable-next=consider-using-with
+        tmpdir = tempfile.TemporaryDirectory(prefix="lektor-ffmpeg-")
+        cmdline = [self.ffmpeg, "-loglevel", "-8"]
+        for _, params in todo:
+            cmdline.extend(["-ss", get_timecode(params.seek), "-i", self.source_video])
+        for index, (artifact_name, params) in enumerate(todo):
+            output = os.path.join(tmpdir.name, f"{index}.{params.format}")
+            self._outputs[artifact_name] = output
+            cmdline.extend(_get_output_args(params, index, output))
+
+        reporter.report_debug_info("ffmpeg cmd line", cmdline)
+        self._future = _get_ffmpeg_pool().submit(_run_ffmpeg, cmdline)
+        self._cleanup = weakref.finalize(self, _cleanup_when_done, self._future, tmpdir)
+
+    def create_artifact(self, artifact, params):
+        """Create the artifact for one of the frames of the batch."""
+        artifact.ensure_dir()
+        output = self._outputs.pop(artifact.artifact_name, None)
+        try:
+            if (
+                output is not None
+                and self._future.result() == 0
+                and os.path.exists(output)
+            ):
+                shutil.move(output, artifact.dst_filename)
+                return
+        finally:
+            if self._cleanup is not None and not self._outputs:
+                self._cleanup()
+        _extract_frame(self.ffmpeg, self.source_video, params, artifact.dst_filename)
+
+
 def make_video_thumbnail(
     ctx,
     source_video,
@@ -311,7 +603,7 @@ def make_video_thumbnail(
     if seek < timedelta(0):
         raise ValueError("Seek must not be negative")
 
-    ffmpeg = locate_executable("ffmpeg")
+    ffmpeg = locate_video_executable("ffmpeg")
     if ffmpeg is None:
         raise RuntimeError("Failed to locate ffmpeg")
     info = get_video_info(source_video)
@@ -326,46 +618,24 @@ def make_video_thumbnail(
     if quality is None and format == "jpg":
         quality = 95
 
-    def build_thumbnail_artifact(artifact):
-        artifact.ensure_dir()
+    params = _FrameParams(seek, resize_dim, crop_dim, quality, format)
+    batches = ctx.cache.setdefault(__name__ + ":frame-batches", {})
+    batch = batches.get(source_video)
+    if batch is None:
+        batch = batches[source_video] = _VideoFrameBatch(ffmpeg, source_video)
 
-        vfilter = (
-            "thumbnail",
-            f"scale={resize_dim.width}:{resize_dim.height}",
-            f"crop={crop_dim.width}:{crop_dim.height}",
-        )
-
-        cmdline = [
-            ffmpeg,
-            "-loglevel",
-            "-8",
-            "-ss",
-            get_timecode(seek),  # Input seeking since it's faster
-            "-i",
-            source_video,
-            "-vf",
-            ",".join(vfilter),
-            "-frames:v",
-            "1",
-            "-qscale:v",
-            str(get_ffmpeg_quality(quality)),
-            artifact.dst_filename,
-        ]
-
-        reporter.report_debug_info("ffmpeg cmd line", cmdline)
-        proc = portable_popen(cmdline)
-        if proc.wait() != 0:
-            raise RuntimeError(f"ffmpeg exited with code {proc.returncode}")
-
-        if not os.path.exists(artifact.dst_filename):
-            msg = (
-                f"Unable to create video thumbnail for {source_video!r}. "
-                "Maybe the seek is outside of the video duration?"
-            )
-            raise RuntimeError(msg)
-
-    ctx.sub_artifact(artifact_name=dst_url_path, sources=[source_video])(
-        build_thumbnail_artifact
+    def build_thumbnail_artifact(artifact):
+        # Start extracting the frames of all videos of the page, so that
+        # independent videos are processed concurrently.
+        for other in batches.values():
+            other.start(artifact if other is batch else None)
+        batch.create_artifact(artifact, params)
+
+    artifact = ctx.add_sub_artifact(
+        artifact_name=dst_url_path,
+        sources=[source_video],
+        build_func=build_thumbnail_artifact,
     )
+    batch.add(artifact, params)
 
     return Thumbnail(dst_url_path, crop_dim.width, crop_dim.height)
@@ -0,0 +1,86 @@
+import os
+
+import PIL.Image
+import pytest
+
+from lektor.imagetools.cache import get_thumbnail_cache
+from lektor.imagetools.cache import ThumbnailCache
+from lektor.imagetools.thumbnail import ImageSize
+from lektor.imagetools.thumbnail import ThumbnailParams
+
+
+@pytest.fixture
+def source_image(tmp_path):
+    path = tmp_path / "source.png"
+    PIL.Image.new("RGB", (40, 30), "#999").save(path)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ThumbnailCache(tmp_path / "cache")
+
+
+def test_get_key(cache, source_image):
+    params = ThumbnailParams(ImageSize(20, 15), "PNG")
+    key = cache.get_key(source_image, params)
+    assert cache.get_key(source_image, params) == key
+    assert (
+        cache.get_key(source_image, ThumbnailParams(ImageSize(20, 15), "JPEG")) != key
+    )
+    assert cache.get_key(source_image, ThumbnailParams(ImageSize(8, 6), "PNG")) != key
+
+    PIL.Image.new("RGB", (40, 30), "#000").save(source_image)
+    assert cache.get_key(source_image, params) != key
+
+
+def test_get_put(cache):
+    assert cache.get("0123abcd") is None
+    cache.put("0123abcd", b"data")
+    assert cache.get("0123abcd") == b"data"
+    assert cache.stats().count == 1
+    assert cache.stats().size == 4
+
+
+def _put_aged(cache, key, data, age):
+    cache.put(key, data)
+    path = cache.directory / key[:2] / key
+    mtime = path.stat().st_mtime - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_prune_evicts_least_recently_used(cache):
+    _put_aged(cache, "aa01", b"x" * 10, 300)
+    _put_aged(cache, "bb02", b"x" * 10, 200)
+    _put_aged(cache, "cc03", b"x" * 10, 100)
+    # Reading an entry marks it as recently used.
+    assert cache.get("aa01") is not None
+
+    removed = cache.prune(15)
+    assert (removed.count, removed.size) == (2, 20)
+    assert cache.get("aa01") is not None
+    assert cache.get("bb02") is None
+    assert cache.get("cc03") is None
+
+
+def test_put_evicts_beyond_max_size(tmp_path):
+    cache = ThumbnailCache(tmp_path, max_size=25)
+    _put_aged(cache, "aa01", b"x" * 10, 200)
+    _put_aged(cache, "bb02", b"x" * 10, 100)
+    cache.put("cc03", b"x" * 10)
+    assert cache.get("aa01") is None
+    assert cache.stats().size == 20
+
+
+def test_get_thumbnail_cache(scratch_pad, scratch_project):
+    cache = get_thumbnail_cache(scratch_pad)
+    assert cache.directory == scratch_project.get_thumbnail_cache_path()
+    assert cache.max_size == 1024 * 1024 * 1024
+    assert get_thumbnail_cache(scratch_pad) is cache
+
+
+def test_get_thumbnail_cache_disabled(scratch_project_data, scratch_env):
+    project_file = scratch_project_data / "Scratch.lektorproject"
+    with project_file.open("a") as fp:
+        fp.write("\n[project]\nthumbnail_cache = no\n")
+    assert get_thumbnail_cache(scratch_env.new_pad()) is None
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from lektor.context import Context
+from lektor.imagetools.exif import _read_exif
+from lektor.imagetools.exif import EXIFInfo
+from lektor.imagetools.exif import read_exif
+from lektor.imagetools.image_info import _get_image_info
+from lektor.imagetools.image_info import get_image_info
+from lektor.imagetools.image_info import PILImageInfo
+from lektor.imagetools.image_info import SvgImageInfo
+from lektor.imagetools.image_info import UnknownImageInfo
+from lektor.imagetools.metadata import ImageMetadataCache
+
+
+HERE = Path(__file__).parent
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    image_path = tmp_path / "test.jpg"
+    shutil.copy(HERE / "exif-test-1.jpg", image_path)
+    return image_path
+
+
+@pytest.fixture
+def new_cache(builder):
+    def new_cache():
+        return ImageMetadataCache(builder.connect_to_database)
+
+    return new_cache
+
+
+def test_get_image_info(new_cache, image_path, mocker):
+    compute = mocker.Mock(wraps=_get_image_info)
+    cache = new_cache()
+    info = cache.get_image_info(image_path, compute)
+    assert info == PILImageInfo("jpeg", 1, 1)
+    assert cache.get_image_info(image_path, compute) == info
+    assert compute.call_count == 1
+
+    cache.flush()
+    assert new_cache().get_image_info(image_path, compute) == info
+    assert compute.call_count == 1
+
+
+def test_get_image_info_recomputed_if_changed(new_cache, image_path, mocker):
+    compute = mocker.Mock(wraps=_get_image_info)
+    cache = new_cache()
+    cache.get_image_info(image_path, compute)
+    cache.flush()
+
+    shutil.copy(HERE / "exif-test-2.gif", image_path)
+    info = new_cache().get_image_info(image_path, compute)
+    assert info.format == "gif"
+    assert compute.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "info",
+    [
+        PILImageInfo("png", 10, 20),
+        SvgImageInfo("svg", 1.5, None),
+        UnknownImageInfo(),
+    ],
+)
+def test_get_image_info_roundtrip(new_cache, image_path, info):
+    cache = new_cache()
+    cache.get_image_info(image_path, lambda filename: info)
+    cache.flush()
+    assert new_cache().get_image_info(image_path, _get_image_info) == info
+
+
+def test_get_exif(new_cache, image_path, mocker):
+    compute = mocker.Mock(wraps=_read_exif)
+    cache = new_cache()
+    expected = EXIFInfo(_read_exif(image_path)).to_dict()
+    assert EXIFInfo(cache.get_exif(image_path, compute)).to_dict() == expected
+    assert EXIFInfo(cache.get_exif(image_path, compute)).to_dict() == expected
+    assert compute.call_count == 1
+
+    cache.flush()
+    exif = new_cache().get_exif(image_path, compute)
+    assert EXIFInfo(exif).to_dict() == expected
+    assert compute.call_count == 1
+
+
+def test_prune(new_cache, image_path, tmp_path):
+    other_path = tmp_path / "other.jpg"
+    shutil.copy(image_path, other_path)
+    cache = new_cache()
+    for path in image_path, other_path:
+        cache.get_image_info(path, _get_image_info)
+        cache.get_exif(path, _read_exif)
+    other_path.unlink()
+    cache.prune()
+
+    con = cache._connect()
+    try:
+        for table in "image_info", "image_exif":
+            rows = con.execute(f"select filename from {table}").fetchall()
+            assert rows == [(os.path.abspath(image_path),)]
+    finally:
+        con.close()
+
+
+def test_cache_used_within_build(builder, image_path, mocker):
+    get_info = mocker.spy(builder.image_metadata_cache, "get_image_info")
+    get_exif = mocker.spy(builder.image_metadata_cache, "get_exif")
+    build_state = builder.new_build_state()
+    with Context(build_state.new_artifact("dummy-artifact")):
+        assert get_image_info(image_path) == PILImageInfo("jpeg", 1, 1)
+        assert read_exif(image_path).camera_make == "NIKON CORPORATION"
+    assert get_info.call_count == 1
+    assert get_exif.call_count == 1
+
+
+def test_cache_not_used_outside_build(builder, image_path, mocker):
+    get_info = mocker.spy(builder.image_metadata_cache, "get_image_info")
+    assert get_image_info(image_path) == PILImageInfo("jpeg", 1, 1)
+    assert read_exif(image_path)
+    assert get_info.call_count == 0
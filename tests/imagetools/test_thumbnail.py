@@ -5,28 +5,44 @@ import html.parser
 import io
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
 
 import PIL
+import PIL.ImageChops
+import PIL.ImageCms
+import PIL.ImageStat
+import PIL.JpegImagePlugin
 import pytest
+from jinja2.utils import LRUCache
 from pytest import approx
 
+import lektor.imagetools.thumbnail
 from lektor.context import Context
 from lektor.db import Image
+from lektor.imagetools.cache import ThumbnailCache
 from lektor.imagetools.thumbnail import _compute_cropbox
 from lektor.imagetools.thumbnail import _convert_icc_profile_to_srgb
 from lektor.imagetools.thumbnail import _create_artifact
 from lektor.imagetools.thumbnail import _create_thumbnail
+from lektor.imagetools.thumbnail import _create_thumbnails
+from lektor.imagetools.thumbnail import _encode
+from lektor.imagetools.thumbnail import _get_icc_transform
 from lektor.imagetools.thumbnail import _get_thumbnail_url_path
 from lektor.imagetools.thumbnail import compute_dimensions
 from lektor.imagetools.thumbnail import CropBox
+from lektor.imagetools.thumbnail import get_available_formats
 from lektor.imagetools.thumbnail import get_image_info
+from lektor.imagetools.thumbnail import ICC_TRANSFORM_CACHE_SIZE
 from lektor.imagetools.thumbnail import ImageSize
+from lektor.imagetools.thumbnail import make_image_picture
 from lektor.imagetools.thumbnail import make_image_thumbnail
+from lektor.imagetools.thumbnail import make_image_thumbnails
 from lektor.imagetools.thumbnail import Thumbnail
 from lektor.imagetools.thumbnail import ThumbnailMode
 from lektor.imagetools.thumbnail import ThumbnailParams
+from lektor.imagetools.thumbnail import ThumbnailSet
 
 
 HERE = Path(__file__).parent
@@ -35,6 +51,11 @@ ICC_PROFILE_TEST_JPG = DEMO_PROJECT / "icc-profile-test/rgb-to-gbr-test.jpg"
 CMYK_ICC_PROFILE_TEST = DEMO_PROJECT / "icc-profile-test/CGATS001Compat-v2-micro.icc"
 NONIMAGE_FILE_PATH = Path(__file__)  # we are not an image
 
+requires_modern_formats = pytest.mark.skipif(
+    get_available_formats(["avif", "webp"]) != ["AVIF", "WEBP"],
+    reason="Pillow can not write AVIF and WebP images",
+)
+
 
 def test_ThumbnailParams_unrecognized_format():
     with pytest.raises(ValueError, match="unrecognized format"):
@@ -53,6 +74,10 @@ def test_ThumbnailParams_unrecognized_format():
         ("PNG", 180, {"format": "PNG", "compress_level": 9}),
         ("PNG", 75, {"format": "PNG", "compress_level": 7}),
         ("PNG", -10, {"format": "PNG", "compress_level": 0}),
+        ("WEBP", None, {"format": "WEBP", "quality": 80, "method": 4}),
+        ("webp", 60, {"format": "WEBP", "quality": 60, "method": 4}),
+        ("AVIF", None, {"format": "AVIF", "quality": 60, "speed": 6}),
+        ("AVIF", 50, {"format": "AVIF", "quality": 50, "speed": 6}),
     ],
 )
 def test_ThumbnailParams_get_save_params(format, quality, expected):
@@ -60,6 +85,21 @@ def test_ThumbnailParams_get_save_params(format, quality, expected):
     assert thumbnail_params.get_save_params() == expected
 
 
+@pytest.mark.parametrize(
+    "format, effort, expected",
+    [
+        ("WEBP", 6, {"format": "WEBP", "quality": 80, "method": 6}),
+        ("WEBP", 9, {"format": "WEBP", "quality": 80, "method": 6}),
+        ("AVIF", 8, {"format": "AVIF", "quality": 60, "speed": 2}),
+        ("AVIF", 0, {"format": "AVIF", "quality": 60, "speed": 10}),
+        ("JPEG", 5, {"format": "JPEG", "quality": 85}),
+    ],
+)
+def test_ThumbnailParams_get_save_params_effort(format, effort, expected):
+    thumbnail_params = ThumbnailParams(ImageSize(10, 10), format, effort=effort)
+    assert thumbnail_params.get_save_params() == expected
+
+
 @pytest.mark.parametrize(
     "format, proposed_ext, expected",
     [
@@ -72,6 +112,8 @@ def test_ThumbnailParams_get_save_params(format, quality, expected):
         ("JPEG", ".j", ".jpeg"),
         ("PNG", ".x", ".png"),
         ("PNG", ".PNG", ".PNG"),
+        ("WEBP", ".jpg", ".webp"),
+        ("AVIF", ".png", ".avif"),
     ],
 )
 def test_ThumbnailParams_get_ext(format, proposed_ext, expected):
@@ -89,6 +131,8 @@ def test_ThumbnailParams_get_ext(format, proposed_ext, expected):
         ("JPEG", 200, 300, None, True, "200x300_crop"),
         ("PNG", 1, 2, 92, True, "1x2_crop_q9"),
         ("PNG", 4, 5, None, False, "4x5"),
+        ("WEBP", 4, 5, 70, True, "4x5_crop_q70"),
+        ("AVIF", 4, 5, None, False, "4x5"),
     ],
 )
 def test_ThumbnailParams_get_tag(format, width, height, quality, crop, expected):
@@ -96,6 +140,11 @@ def test_ThumbnailParams_get_tag(format, width, height, quality, crop, expected)
     assert thumbnail_params.get_tag() == expected
 
 
+def test_ThumbnailParams_get_tag_effort():
+    thumbnail_params = ThumbnailParams(ImageSize(4, 5), "WEBP", 70, effort=6)
+    assert thumbnail_params.get_tag() == "4x5_q70_e6"
+
+
 @pytest.mark.parametrize(
     "width, height, source_width, source_height, expected",
     [
@@ -179,6 +228,75 @@ def test_convert_icc_profile_to_srgb_no_profile():
     assert "icc_profile" not in im.info
 
 
+@pytest.fixture
+def icc_transforms(monkeypatch):
+    """Start with an empty cache of ICC transforms."""
+    icc_transforms = LRUCache(ICC_TRANSFORM_CACHE_SIZE)
+    monkeypatch.setattr(lektor.imagetools.thumbnail, "_icc_transforms", icc_transforms)
+    return icc_transforms
+
+
+@pytest.fixture(scope="session")
+def icc_profile():
+    with PIL.Image.open(ICC_PROFILE_TEST_JPG) as image:
+        return image.info["icc_profile"]
+
+
+@pytest.mark.usefixtures("icc_transforms")
+def test_get_icc_transform_is_cached(icc_profile, mocker):
+    build_transform = mocker.spy(lektor.imagetools.thumbnail, "_build_icc_transform")
+    transform = _get_icc_transform(icc_profile, "RGB", "RGB")
+    assert _get_icc_transform(bytes(icc_profile), "RGB", "RGB") is transform
+    assert _get_icc_transform(icc_profile, "RGBA", "RGBA") is not transform
+    assert build_transform.call_count == 2
+
+
+def test_get_icc_transform_evicts_least_recently_used(icc_profile, monkeypatch):
+    icc_transforms = LRUCache(2)
+    monkeypatch.setattr(lektor.imagetools.thumbnail, "_icc_transforms", icc_transforms)
+    transform = _get_icc_transform(icc_profile, "RGB", "RGB")
+    _get_icc_transform(icc_profile, "RGBA", "RGBA")
+    assert _get_icc_transform(icc_profile, "RGB", "RGB") is transform
+    _get_icc_transform(icc_profile, "RGBA", "RGB")
+    # Most recently used first
+    assert [key[1:] for key in icc_transforms.keys()] == [
+        ("RGBA", "RGB"),
+        ("RGB", "RGB"),
+    ]
+
+
+@pytest.mark.usefixtures("icc_transforms")
+def test_convert_icc_profile_to_srgb_threaded():
+    params = ThumbnailParams(ImageSize(100, 100), "JPEG")
+
+    def create_thumbnail(_):
+        with PIL.Image.open(ICC_PROFILE_TEST_JPG) as image:
+            return _create_thumbnail(image, params).tobytes()
+
+    expected = create_thumbnail(None)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(create_thumbnail, range(32)))
+    assert results == [expected] * 32
+
+
+@pytest.mark.usefixtures("icc_transforms")
+def test_icc_transform_built_once_for_batch(tmp_path, icc_profile, mocker):
+    # A batch of camera-like JPEGs, all with the same embedded color profile
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"image{i}.jpg"
+        image = PIL.Image.effect_noise((60, 45), 32 + i).convert("RGB")
+        image.save(path, "JPEG", icc_profile=icc_profile)
+        paths.append(path)
+    params = ThumbnailParams(ImageSize(24, 18), "JPEG")
+    build_transform = mocker.spy(PIL.ImageCms, "buildTransform")
+
+    for path in paths:
+        with PIL.Image.open(path) as image:
+            _create_thumbnail(image, params)
+    build_transform.assert_called_once()
+
+
 def test_create_thumbnail(dummy_image):
     thumbnail_params = ThumbnailParams(ImageSize(80, 60), "PNG")
     thumb = _create_thumbnail(dummy_image, thumbnail_params)
@@ -216,6 +334,152 @@ def test_create_thumbnail_converts_cmyk_to_rgb_via_icc_profile(dummy_image):
     assert thumb.getpixel((40, 30)) == approx((162, 148, 145), abs=5)
 
 
+@pytest.fixture(scope="session")
+def large_image():
+    """A large image with some detail in it."""
+    gradient = PIL.Image.linear_gradient("L").resize((2400, 1800))
+    noise = PIL.Image.effect_noise((2400, 1800), 64)
+    return PIL.Image.merge("RGB", (gradient, noise, gradient.transpose(0)))
+
+
+@pytest.fixture(scope="session")
+def large_jpg_path(tmp_path_factory, large_image):
+    large_jpg = tmp_path_factory.mktemp("images") / "large.jpg"
+    large_image.save(large_jpg, "JPEG", quality=90)
+    return large_jpg
+
+
+def _create_thumbnail_without_draft(path, params):
+    with PIL.Image.open(path) as image:
+        image.load()
+        return _create_thumbnail(image, params)
+
+
+def _mean_diff(image1, image2):
+    diff = PIL.ImageChops.difference(image1, image2)
+    return max(PIL.ImageStat.Stat(diff).mean)
+
+
+@pytest.mark.parametrize(
+    "size, crop, drafted",
+    [
+        (ImageSize(200, 150), False, True),
+        (ImageSize(800, 600), False, False),  # downscale too small for draft
+        (ImageSize(200, 150), True, False),
+        (ImageSize(3200, 2400), False, False),
+    ],
+)
+def test_create_thumbnail_draft(large_jpg_path, size, crop, drafted, mocker):
+    params = ThumbnailParams(size, "JPEG", crop=crop)
+    draft = mocker.spy(PIL.JpegImagePlugin.JpegImageFile, "draft")
+    with PIL.Image.open(large_jpg_path) as image:
+        thumb = _create_thumbnail(image, params)
+        assert (image.size != (2400, 1800)) is drafted
+    assert thumb.size == size
+    assert draft.call_count == (1 if not crop and size.width < 2400 else 0)
+
+
+@pytest.mark.parametrize("size", [ImageSize(300, 225), ImageSize(80, 60)])
+def test_create_thumbnail_draft_visual_diff(large_image, large_jpg_path, size):
+    params = ThumbnailParams(size, "JPEG")
+    with PIL.Image.open(large_jpg_path) as image:
+        drafted = _create_thumbnail(image, params)
+    reference = _create_thumbnail_without_draft(large_jpg_path, params)
+    # Compare both to a thumbnail of the original (uncompressed) image
+    original = large_image.resize(size)
+    assert _mean_diff(drafted, original) < 3.0
+    assert _mean_diff(drafted, original) < _mean_diff(reference, original) + 0.5
+    assert _mean_diff(drafted, reference) < 4.0
+
+
+def test_create_thumbnail_draft_decoded_size(large_jpg_path, mocker):
+    params = ThumbnailParams(ImageSize(240, 180), "JPEG")
+    draft = mocker.spy(PIL.JpegImagePlugin.JpegImageFile, "draft")
+    resize = mocker.spy(lektor.imagetools.thumbnail, "_resize_image")
+    with PIL.Image.open(large_jpg_path) as image:
+        thumb = _create_thumbnail(image, params)
+    draft.assert_called_once_with(image, None, (480, 360))
+    # The JPEG decoder downscales by a factor of 4, rather than decoding
+    # the full 2400x1800 image.
+    assert resize.call_args.args[0].size == (600, 450)
+    assert thumb.size == (240, 180)
+
+
+def test_create_thumbnails(large_jpg_path, mocker):
+    sizes = [ImageSize(300, 225), ImageSize(1200, 900), ImageSize(80, 60)]
+    params_list = [ThumbnailParams(size, "JPEG") for size in sizes]
+    params_list.append(ThumbnailParams(ImageSize(100, 100), "JPEG", crop=True))
+    resize = mocker.spy(lektor.imagetools.thumbnail, "_resize_image")
+    with PIL.Image.open(large_jpg_path) as image:
+        thumbs = _create_thumbnails(image, params_list)
+    assert [thumb.size for thumb in thumbs] == [*sizes, (100, 100)]
+    # uncropped thumbnails are scaled from the smallest large enough thumbnail
+    sources = {call.args[1].size: call.args[0].size for call in resize.call_args_list}
+    assert sources[(1200, 900)] == (2400, 1800)
+    assert sources[(300, 225)] == (1200, 900)
+    assert sources[(80, 60)] == (300, 225)
+    assert sources[(100, 100)] == (2400, 1800)
+
+    for params, thumb in zip(params_list, thumbs, strict=True):
+        reference = _create_thumbnail_without_draft(large_jpg_path, params)
+        assert _mean_diff(thumb, reference) < 4.0
+
+
+def test_create_thumbnails_draft(large_jpg_path):
+    params_list = [
+        ThumbnailParams(ImageSize(200, 150), "JPEG"),
+        ThumbnailParams(ImageSize(80, 60), "JPEG"),
+    ]
+    with PIL.Image.open(large_jpg_path) as image:
+        thumbs = _create_thumbnails(image, params_list)
+        assert image.size == (600, 450)
+    assert [thumb.size for thumb in thumbs] == [(200, 150), (80, 60)]
+
+
+def test_create_thumbnails_converts_icc_profile_once(mocker):
+    params_list = [
+        ThumbnailParams(ImageSize(40, 30), "JPEG"),
+        ThumbnailParams(ImageSize(10, 8), "JPEG"),
+    ]
+    convert = mocker.spy(lektor.imagetools.thumbnail, "_convert_icc_profile_to_srgb")
+    with PIL.Image.open(ICC_PROFILE_TEST_JPG) as image:
+        thumbs = _create_thumbnails(image, params_list)
+        reference = _create_thumbnail(image, params_list[1])
+    assert all("icc_profile" not in thumb.info for thumb in thumbs)
+    assert convert.call_count == 3
+    assert _mean_diff(thumbs[1], reference) < 8.0
+
+
+@requires_modern_formats
+@pytest.mark.parametrize("format", ["WEBP", "AVIF"])
+def test_encode_modern_formats(dummy_image, format):
+    params = ThumbnailParams(ImageSize(80, 60), format)
+    data = _encode(_create_thumbnail(dummy_image, params), params)
+    with PIL.Image.open(io.BytesIO(data)) as image:
+        assert image.format == format
+        assert image.size == (80, 60)
+
+
+def test_encode_flattens_alpha_for_jpeg():
+    image = PIL.Image.new("RGBA", (10, 10), (255, 0, 0, 0))
+    params = ThumbnailParams(ImageSize(10, 10), "JPEG")
+    data = _encode(_create_thumbnail(image, params), params)
+    with PIL.Image.open(io.BytesIO(data)) as thumb:
+        assert thumb.mode == "RGB"
+        assert thumb.getpixel((5, 5)) == approx((255, 255, 255), abs=5)
+
+
+@requires_modern_formats
+def test_create_thumbnails_shares_resizes_between_formats(dummy_image, mocker):
+    resize = mocker.spy(lektor.imagetools.thumbnail, "_resize_image")
+    params_list = [
+        ThumbnailParams(ImageSize(80, 60), format) for format in ("JPEG", "WEBP")
+    ]
+    thumbs = _create_thumbnails(dummy_image, params_list)
+    assert thumbs[0] is thumbs[1]
+    assert resize.call_count == 1
+
+
 class DummyArtifact:
     image = None
 
@@ -247,6 +511,18 @@ def test_create_artifact_strips_metadata():
     assert not metadata_keys
 
 
+def test_create_artifact_uses_cache(dummy_jpg_path, tmp_path, mocker):
+    cache = ThumbnailCache(tmp_path)
+    thumbnail_params = ThumbnailParams(ImageSize(80, 60), "JPEG")
+    encode = mocker.spy(lektor.imagetools.thumbnail, "_encode_thumbnail")
+    artifacts = [DummyArtifact(), DummyArtifact()]
+    for artifact in artifacts:
+        _create_artifact(dummy_jpg_path, thumbnail_params, artifact, cache)
+    assert encode.call_count == 1
+    assert artifacts[1].image.size == (80, 60)
+    assert cache.stats().count == 1
+
+
 @pytest.mark.parametrize(
     "source_url_path, size, format, expected",
     [
@@ -339,6 +615,158 @@ def test_make_image_thumbnail(
         assert len(ctx.sub_artifacts) == 0  # no implicit upscale
 
 
+def test_make_image_thumbnails(ctx, dummy_jpg_path, mocker):
+    thumbnails = make_image_thumbnails(
+        ctx, dummy_jpg_path, "/urlpath/test.jpg", [80, 200, 440, 200]
+    )
+    assert [(t.width, t.height) for t in thumbnails] == [
+        (80, 60),
+        (200, 150),
+        (400, 300),
+        (200, 150),
+    ]
+    assert str(thumbnails) == (
+        "test@80x60.jpg 80w, test@200x150.jpg 200w, test.jpg 400w"
+    )
+    assert len(ctx.sub_artifacts) == 2
+
+    create_thumbnails = mocker.spy(lektor.imagetools.thumbnail, "_create_thumbnails")
+    artifacts = []
+    for _, build_func in ctx.sub_artifacts:
+        artifact = DummyArtifact()
+        build_func(artifact)
+        artifacts.append(artifact)
+    assert create_thumbnails.call_count == 1
+    assert [artifact.image.size for artifact in artifacts] == [(80, 60), (200, 150)]
+
+    # building again computes the thumbnail anew
+    artifact = DummyArtifact()
+    ctx.sub_artifacts[0][1](artifact)
+    assert artifact.image.size == (80, 60)
+
+
+def test_make_image_thumbnails_skips_current_artifacts(ctx, dummy_jpg_path, mocker):
+    mocker.patch.object(
+        lektor.imagetools.thumbnail, "get_thumbnail_cache", return_value=None
+    )
+    make_image_thumbnails(ctx, dummy_jpg_path, "/test.jpg", [80, 200])
+    (current, _), (_, build_func) = ctx.sub_artifacts
+    current.ensure_dir()
+    Path(current.dst_filename).write_bytes(b"")
+    mocker.patch.object(
+        ctx.build_state,
+        "check_artifact_is_current",
+        side_effect=lambda artifact_name, *args: artifact_name == current.artifact_name,
+    )
+
+    create_thumbnails = mocker.spy(lektor.imagetools.thumbnail, "_create_thumbnails")
+    artifact = DummyArtifact()
+    build_func(artifact)
+    assert artifact.image.size == (200, 150)
+    # only the thumbnail whose artifact is not current is computed
+    assert [params.size for params in create_thumbnails.call_args.args[1]] == [
+        (200, 150)
+    ]
+
+
+def test_make_image_thumbnails_uses_cache(
+    ctx, dummy_jpg_path, tmp_path, monkeypatch, mocker
+):
+    cache = ThumbnailCache(tmp_path)
+    monkeypatch.setattr(
+        lektor.imagetools.thumbnail, "get_thumbnail_cache", lambda pad: cache
+    )
+    for widths in ([80], [80, 200]):
+        ctx.sub_artifacts.clear()
+        make_image_thumbnails(ctx, dummy_jpg_path, "/test.jpg", widths)
+        create_thumbnails = mocker.spy(
+            lektor.imagetools.thumbnail, "_create_thumbnails"
+        )
+        for _, build_func in ctx.sub_artifacts:
+            build_func(DummyArtifact())
+        # only the thumbnail which is not cached is computed
+        assert len(create_thumbnails.call_args.args[1]) == 1
+        mocker.stop(create_thumbnails)
+    assert cache.stats().count == 2
+
+
+def test_ThumbnailSet():
+    thumbnails = ThumbnailSet(
+        [Thumbnail("/urlpath/a@10x5.jpg", 10, 5), Thumbnail("/urlpath/a.jpg", 20, 10)]
+    )
+    assert len(thumbnails) == 2
+    assert thumbnails[1].width == 20
+    assert thumbnails.srcset == "a@10x5.jpg 10w, a.jpg 20w"
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected_size, thumbnail_url_path",
+    [
+        ({"width": 80, "format": "webp"}, (80, 60), "/test@80x60.webp"),
+        (
+            {"width": 80, "format": "WEBP", "quality": 70, "effort": 6},
+            (80, 60),
+            "/test@80x60_q70_e6.webp",
+        ),
+        # converted, but not upscaled
+        ({"width": 440, "format": "webp"}, (400, 300), "/test@400x300.webp"),
+        ({"width": 440, "format": "jpeg"}, (400, 300), "/test.jpg"),
+    ],
+)
+@requires_modern_formats
+def test_make_image_thumbnail_format(
+    ctx, kwargs, expected_size, thumbnail_url_path, dummy_jpg_path
+):
+    thumbnail = make_image_thumbnail(ctx, dummy_jpg_path, "/test.jpg", **kwargs)
+    assert (thumbnail.width, thumbnail.height) == expected_size
+    assert thumbnail.url_path == thumbnail_url_path
+
+
+def test_make_image_thumbnail_unavailable_format(ctx, dummy_jpg_path, monkeypatch):
+    monkeypatch.setattr(PIL.Image, "SAVE", {})
+    with pytest.raises(ValueError, match="WEBP images is not supported"):
+        make_image_thumbnail(ctx, dummy_jpg_path, "/test.jpg", width=8, format="webp")
+
+
+@requires_modern_formats
+def test_make_image_picture(ctx, dummy_jpg_path, mocker):
+    picture = make_image_picture(
+        ctx, dummy_jpg_path, "/test.jpg", [80, 200], formats=["avif", "webp"]
+    )
+    assert [source.type for source in picture.sources] == [
+        "image/avif",
+        "image/webp",
+    ]
+    assert picture.sources[1].srcset == "test@80x60.webp 80w, test@200x150.webp 200w"
+    assert str(picture.img) == "test@80x60.jpg 80w, test@200x150.jpg 200w"
+    assert len(ctx.sub_artifacts) == 6
+
+    create_thumbnails = mocker.spy(lektor.imagetools.thumbnail, "_create_thumbnails")
+    resize = mocker.spy(lektor.imagetools.thumbnail, "_resize_image")
+    formats = []
+    for _, build_func in ctx.sub_artifacts:
+        artifact = DummyArtifact()
+        build_func(artifact)
+        formats.append(artifact.image.format)
+    assert formats == ["AVIF", "AVIF", "WEBP", "WEBP", "JPEG", "JPEG"]
+    assert create_thumbnails.call_count == 1
+    assert resize.call_count == 2
+
+
+def test_make_image_picture_default_formats(ctx, dummy_jpg_path, monkeypatch):
+    monkeypatch.setattr(PIL.Image, "SAVE", {"WEBP": None, "JPEG": None})
+    picture = make_image_picture(ctx, dummy_jpg_path, "/test.jpg", [80])
+    assert [source.type for source in picture.sources] == ["image/webp"]
+
+
+def test_make_image_picture_svg(ctx, dummy_svg_file):
+    svg_file = dummy_svg_file(width="400px", height="300px")
+    picture = make_image_picture(ctx, svg_file, "/dummy.svg", [80])
+    assert picture.sources == []
+    assert str(picture.img) == "dummy.svg 80w"
+    assert len(ctx.sub_artifacts) == 0
+
+
 @pytest.mark.parametrize(
     "params, match",
     [
@@ -453,6 +881,27 @@ class TestArtifactDependencyTracking:
         assert built == ["index.html", "test@20x20.jpg"]
 
 
+def test_image_srcset(scratch_project_data, scratch_builder):
+    page_html = scratch_project_data / "templates/page.html"
+    with page_html.open("a") as fp:
+        fp.write(
+            """
+            {% set im = this.attachments.get('test.jpg') %}
+            <img srcset="{{ im.srcset([10, 20, 400]) }}">
+            """
+        )
+    shutil.copy(ICC_PROFILE_TEST_JPG, scratch_project_data / "content/test.jpg")
+    builder = scratch_builder
+    _, build_state = builder.build(builder.pad.root)
+    assert len(build_state.failed_artifacts) == 0
+    built = {os.path.basename(a.dst_filename) for a in build_state.updated_artifacts}
+    assert built == {"index.html", "test@10x10.jpg", "test@20x20.jpg"}
+    index_html = Path(builder.destination_path, "index.html").read_text("utf-8")
+    assert (
+        'srcset="test@10x10.jpg 10w, test@20x20.jpg 20w, test.jpg 200w"' in index_html
+    )
+
+
 @dataclasses.dataclass
 class DemoThumbnail:
     width: int
@@ -1,10 +1,14 @@
+import tracemalloc
 from pathlib import Path
 
 import pytest
 
 from lektor.builder import Builder
 from lektor.builder import FileInfo
+from lektor.builder import PathCache
+from lektor.environment import Environment
 from lektor.project import Project
+from lektor.reporter import BufferReporter
 from lektor.reporter import NullReporter
 
 
@@ -472,3 +476,192 @@ def test_filenames_with_AT_do_not_get_built_twice(
 
     with AssertBuildsNothingReporter():
         scratch_builder.build_all()
+
+
+@pytest.fixture
+def fingerprinted_project_data(scratch_project_data):
+    lektorproject = scratch_project_data / "Scratch.lektorproject"
+    lektorproject.write_text(
+        lektorproject.read_text().replace(
+            "[project]\n", "[project]\ncollection_fingerprints = yes\n"
+        )
+    )
+    for child in "child1", "child2":
+        child_lr = scratch_project_data / "content" / child / "contents.lr"
+        child_lr.parent.mkdir()
+        child_lr.write_text(f"title: {child}\n")
+    scratch_project_data.joinpath("templates/page.html").write_text(
+        "{% for child in this.children %}{{ child.title }}{% endfor %}"
+    )
+    return scratch_project_data
+
+
+def test_collection_fingerprint_dependency(
+    fingerprinted_project_data, tmp_path, save_sys_path
+):
+    env = Environment(Project.from_path(fingerprinted_project_data))
+    reporter = BufferReporter(env)
+    with reporter:
+        builder = Builder(env.new_pad(), str(tmp_path / "output"))
+        builder.build(builder.pad.root)
+    dependencies = reporter.get_recorded_dependencies()
+    assert "en@/@collection" in dependencies
+    assert "content/child1/contents.lr" not in dependencies
+
+    reporter.clear()
+    with reporter:
+        builder = Builder(env.new_pad(), str(tmp_path / "output"))
+        builder.build(builder.pad.root)
+    assert reporter.get_major_events()[1][1]["is_current"]
+
+    child_lr = fingerprinted_project_data / "content/child2/contents.lr"
+    child_lr.write_text("title: Changed\n")
+    reporter.clear()
+    with reporter:
+        builder = Builder(env.new_pad(), str(tmp_path / "output"))
+        prog, _ = builder.build(builder.pad.root)
+    assert not reporter.get_major_events()[1][1]["is_current"]
+    assert "Changed" in Path(prog.artifacts[0].dst_filename).read_text(encoding="utf-8")
+
+
+def test_field_dependencies(fingerprinted_project_data, tmp_path, save_sys_path):
+    lektorproject = fingerprinted_project_data / "Scratch.lektorproject"
+    lektorproject.write_text(
+        lektorproject.read_text().replace(
+            "[project]\n", "[project]\nfield_dependencies = yes\n"
+        )
+    )
+    env = Environment(Project.from_path(fingerprinted_project_data))
+    reporter = BufferReporter(env)
+
+    def build_root():
+        reporter.clear()
+        with reporter:
+            builder = Builder(env.new_pad(), str(tmp_path / "output"))
+            prog, _ = builder.build(builder.pad.root)
+        return prog.artifacts[0], reporter.get_major_events()[1][1]["is_current"]
+
+    build_root()
+    dependencies = reporter.get_recorded_dependencies()
+    assert "en@/child1@field/title" in dependencies
+    assert "en@/child1@field/_system" in dependencies
+    assert "content/child1/contents.lr" not in dependencies
+
+    # Changing a field which is not rendered does not cause a rebuild
+    child_lr = fingerprinted_project_data / "content/child2/contents.lr"
+    child_lr.write_text("title: child2\n---\nbody: Unrelated\n")
+    _, is_current = build_root()
+    assert is_current
+
+    child_lr.write_text("title: Changed\n---\nbody: Unrelated\n")
+    artifact, is_current = build_root()
+    assert not is_current
+    assert "Changed" in Path(artifact.dst_filename).read_text(encoding="utf-8")
+
+
+def test_field_dependencies_of_cached_query(
+    scratch_project_data, tmp_path, save_sys_path
+):
+    # Without alternatives, the records returned by the query are the very
+    # sources being built.
+    scratch_project_data.joinpath("Scratch.lektorproject").write_text(
+        "[project]\nname = Scratch\n"
+        "collection_fingerprints = yes\nfield_dependencies = yes\n",
+        encoding="utf-8",
+    )
+    scratch_project_data.joinpath("templates/post.html").write_text(
+        "{% for post in site.query('/blog').order_by('title') %}"
+        "{{ post._id }} {% endfor %}",
+        encoding="utf-8",
+    )
+    blog_lr = scratch_project_data / "content/blog/contents.lr"
+    blog_lr.parent.mkdir()
+    blog_lr.write_text("title: Blog\n", encoding="utf-8")
+    for post, title in ("p1", "A"), ("p2", "B"):
+        post_lr = scratch_project_data / "content/blog" / post / "contents.lr"
+        post_lr.parent.mkdir()
+        post_lr.write_text(f"_template: post.html\n---\ntitle: {title}\n", "utf-8")
+
+    env = Environment(Project.from_path(scratch_project_data))
+    reporter = BufferReporter(env)
+    with reporter:
+        Builder(env.new_pad(), str(tmp_path / "output")).build_all()
+    dependencies = {}
+    for event, data in reporter.buffer:
+        if event == "start-artifact-build":
+            artifact_dependencies = dependencies[data["artifact"].artifact_name] = []
+        elif event == "debug-info" and data["key"] == "dependency":
+            artifact_dependencies.append(data["value"])
+
+    # The order depends on the titles of both posts, whichever post ran the
+    # (cached) query first.
+    for post in "p1", "p2":
+        assert {
+            dependency
+            for dependency in dependencies[f"blog/{post}/index.html"]
+            if dependency.endswith("@field/title")
+        } == {"/blog/p1@field/title", "/blog/p2@field/title"}
+
+
+def test_field_dependency_checksums_load_record_once(pad, mocker):
+    coffee = pad.get("/projects/coffee")
+    path_cache = PathCache(pad.env)
+    load_raw_data = mocker.spy(pad.db, "load_raw_data")
+    checksums = {
+        field: coffee._get_field_dependency(field).get_checksum(path_cache)
+        for field in ("name", "description", "_system")
+    }
+    load_raw_data.assert_called_once()
+    assert len(set(checksums.values())) == 3
+
+
+def test_Artifact_render_template_into(scratch_builder, scratch_project_data):
+    scratch_project_data.joinpath("templates/stream.html").write_text(
+        "{% for i in range(3) %}<p>{{ this.title }} {{ i }}</p>{% endfor %}"
+    )
+    build_state = scratch_builder.new_build_state()
+    artifact = build_state.new_artifact("stream.html", sources=())
+    with artifact.update():
+        artifact.render_template_into("stream.html", this=scratch_builder.pad.root)
+    assert Path(artifact.dst_filename).read_text(encoding="utf-8") == (
+        "<p>Index 0</p><p>Index 1</p><p>Index 2</p>\n"
+    )
+
+
+@pytest.mark.slowtest
+def test_Artifact_render_template_into_memory_benchmark(
+    scratch_builder, scratch_project_data
+):
+    # Benchmark: streaming a huge listing page into its artifact should
+    # take much less memory than rendering it to a string first.
+    scratch_project_data.joinpath("templates/huge.html").write_text(
+        "{% for i in range(50000) %}"
+        "<li><a href='/posts/{{ i }}/'>{{ this.title }} number {{ i }}</a></li>\n"
+        "{% endfor %}"
+    )
+    build_state = scratch_builder.new_build_state()
+    root = scratch_builder.pad.root
+
+    def peak_memory(func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def render_to_string():
+        artifact = build_state.new_artifact("huge-string.html", sources=())
+        with artifact.update():
+            rv = build_state.env.render_template("huge.html", root.pad, this=root)
+            with artifact.open("wb") as f:
+                f.write(rv.encode("utf-8") + b"\n")
+
+    def render_streaming():
+        artifact = build_state.new_artifact("huge-stream.html", sources=())
+        with artifact.update():
+            artifact.render_template_into("huge.html", this=root)
+
+    string_peak = peak_memory(render_to_string)
+    streaming_peak = peak_memory(render_streaming)
+    assert streaming_peak < string_peak / 2
@@ -82,6 +82,20 @@ def test_build(project_cli_runner):
     assert result.exit_code == 0
 
 
+def test_build_profile_templates(project_cli_runner):
+    result = project_cli_runner.invoke(
+        cli, ["build", "-O", "build_dir", "--profile-templates", "profile.json"]
+    )
+    assert result.exit_code == 0
+    assert "Template profile written to profile.json" in result.output
+    with open("profile.json", encoding="utf-8") as f:
+        profile = json.load(f)
+    names = {(entry["kind"], entry["name"]) for entry in profile}
+    assert ("template", "page.html") in names
+    assert ("include", "layout.html") in names
+    assert all(entry["calls"] > 0 for entry in profile)
+
+
 def test_build_extra_flag(project_cli_runner, mocker):
     mock_builder = mocker.patch("lektor.builder.Builder")
     mock_builder.return_value.build_all.return_value = 0
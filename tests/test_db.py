@@ -1,4 +1,5 @@
 import inspect
+import operator
 import os
 import re
 from datetime import date
@@ -6,6 +7,7 @@ from datetime import date
 import pytest
 
 from lektor.context import Context
+from lektor.context import ignore_url_unaffecting_dependencies
 from lektor.db import Database
 from lektor.db import F
 from lektor.db import get_alts
@@ -582,3 +584,84 @@ def test_Query_include_hidden_and_undiscoverable(scratch_project_data, scratch_p
         "/undiscoverable",
         "/hidden-undiscoverable",
     }
+
+
+def test_Query_results_are_cached(pad, mocker):
+    iterate = mocker.spy(Query, "_iterate")
+    projects = pad.query("/projects").order_by("-_slug")
+
+    first = [child["_id"] for child in projects.limit(3)]
+    rest = [child["_id"] for child in projects.offset(3)]
+    assert iterate.call_count == 1
+    assert first + rest == [child["_id"] for child in projects]
+    assert first == sorted(first + rest, reverse=True)[:3]
+
+    projects.filter(F._slug.startswith("c")).all()
+    projects.filter(F._slug.startswith("c")).all()
+    assert iterate.call_count == 2
+
+
+def test_Query_results_not_cached_for_callback_filters(pad, mocker):
+    iterate = mocker.spy(Query, "_iterate")
+    projects = pad.query("/projects").order_by("_slug")
+    projects.filter(lambda record: True).all()
+    projects.filter(lambda record: True).all()
+    assert iterate.call_count == 2
+
+
+def test_Query_cache_replays_dependencies(pad):
+    projects = pad.query("/projects").order_by("_slug")
+
+    with Context(pad=pad) as ctx:
+        expected = list(projects)
+    with Context(pad=pad) as ctx2:
+        assert list(projects) == expected
+
+    assert ctx2.referenced_dependencies == ctx.referenced_dependencies
+    coffee = os.path.join("projects", "coffee", "contents.lr")
+    assert any(dep.endswith(coffee) for dep in ctx2.referenced_dependencies)
+
+
+def test_Query_cache_key():
+    assert (F.a == 1)._cache_key() == (F.a == 1)._cache_key()
+    # 1 == True, but the filters differ
+    assert (F.a == 1)._cache_key() != operator.eq(F.a, True)._cache_key()
+    assert F.a.startswith("x")._cache_key() == F.a.startswith("x")._cache_key()
+    assert F.a.startswith("x")._cache_key() != F.a.endswith("x")._cache_key()
+    assert (F.a == [1])._cache_key() is None
+
+
+def test_Database_iter_dependent_models_is_memoized(pad, mocker):
+    db = pad.db
+    projects_model = db.datamodels["projects"]
+    deep_find = mocker.spy(db, "_find_dependent_models")
+    assert set(db.iter_dependent_models(projects_model)) == {db.datamodels["project"]}
+    assert set(db.iter_dependent_models(projects_model)) == {db.datamodels["project"]}
+    assert deep_find.call_count == 1
+
+
+def test_Database_get_dependency_bundle(pad):
+    db = pad.db
+    projects = pad.get("/projects")
+    bundle = db.get_dependency_bundle(projects)
+    assert bundle.dependencies == bundle.url_dependencies
+    assert (
+        os.path.join(db.to_fs_path("/projects"), "contents.lr") in bundle.dependencies
+    )
+    assert db.datamodels["project"].filename in bundle.dependencies
+
+    image = pad.get("/test.jpg")
+    bundle = db.get_dependency_bundle(image)
+    assert bundle.dependencies - bundle.url_dependencies == {image.attachment_filename}
+
+
+def test_track_record_dependency_records_bundle(pad):
+    image = pad.get("/test.jpg")
+    with Context(pad=pad) as ctx:
+        pad.db.track_record_dependency(image)
+    assert ctx.referenced_dependencies == image._dependency_bundle.dependencies
+
+    with Context(pad=pad) as ctx:
+        with ignore_url_unaffecting_dependencies():
+            pad.db.track_record_dependency(image)
+    assert ctx.referenced_dependencies == image._dependency_bundle.url_dependencies
@@ -1,4 +1,5 @@
 import os
+import re
 import textwrap
 
 import pytest
@@ -7,6 +8,7 @@ from inifile import IniFile
 
 import lektor.quickstart
 from lektor.cli import cli
+from lektor.project import Project
 
 
 @pytest.fixture(scope="session")
@@ -388,3 +390,40 @@ def test_new_theme_varying_names(project_cli_runner, theme_name, expected_id):
     assert expected_id in os.listdir("themes")
     path = os.path.join("themes", expected_id, "example-site")
     assert expected_id + ".lektorproject" in os.listdir(path)
+
+
+def test_thumbnail_cache(project_cli_runner, project):
+    directory = project.get_thumbnail_cache_path() / "ab"
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "abcdef").write_bytes(b"x" * 1024)
+
+    result = project_cli_runner.invoke(cli, ["dev", "thumbnail-cache"])
+    assert result.exit_code == 0
+    assert re.search(r"\b[1-9]\d* thumbnails", result.output)
+    assert (directory / "abcdef").exists()
+
+    result = project_cli_runner.invoke(
+        cli, ["dev", "thumbnail-cache", "--prune", "--max-size", "0"]
+    )
+    assert result.exit_code == 0
+    assert re.search(r"Evicted [1-9]\d* thumbnails", result.output)
+    assert not (directory / "abcdef").exists()
+
+
+def test_markdown_cache(project_cli_runner):
+    # The project is copied, so its markdown cache is not that of `project`.
+    directory = Project.discover().get_markdown_cache_path() / "ab"
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "abcdef.json").write_text("x" * 1024, encoding="utf-8")
+
+    result = project_cli_runner.invoke(cli, ["dev", "markdown-cache"])
+    assert result.exit_code == 0
+    assert re.search(r"\b[1-9]\d* entries", result.output)
+    assert (directory / "abcdef.json").exists()
+
+    result = project_cli_runner.invoke(
+        cli, ["dev", "markdown-cache", "--prune", "--max-size", "0"]
+    )
+    assert result.exit_code == 0
+    assert re.search(r"Evicted [1-9]\d* entries", result.output)
+    assert not (directory / "abcdef.json").exists()
@@ -1,4 +1,6 @@
+import copy
 import datetime
+import os
 import re
 import sys
 import weakref
@@ -6,10 +8,16 @@ from html import unescape
 from pathlib import Path
 
 import pytest
+from jinja2.utils import LRUCache
 
 import lektor.context
+import lektor.databags
+from lektor.builder import Builder
 from lektor.db import Pad
 from lektor.environment import Environment
+from lektor.environment import TemplateBytecodeCache
+from lektor.environment.profiling import TemplateProfiler
+from lektor.project import Project
 
 
 @pytest.fixture
@@ -210,3 +218,293 @@ def test_bag_gets_site_from_lektor_context(
     template = scratch_env.jinja_env.from_string("{{ bag('testbag.foo') }}")
     with lektor.context.Context(pad=scratch_pad):
         assert template.render() == "bar"
+
+
+def test_bag_lookup_records_value_dependency(scratch_pad: Pad) -> None:
+    with lektor.context.Context(pad=scratch_pad) as ctx:
+        assert scratch_pad.databags.lookup("testbag.foo") == "bar"
+    assert len(ctx.referenced_virtual_dependencies) == 1
+    dependency = next(iter(ctx.referenced_virtual_dependencies))
+    assert dependency.path == "/@databag/testbag.foo"
+    assert not any(dep.endswith("testbag.ini") for dep in ctx.referenced_dependencies)
+
+    resolved = scratch_pad.get("/@databag/testbag.foo")
+    assert resolved.get_checksum(None) == dependency.get_checksum(None)
+
+
+def test_bag_lookup_of_whole_bag_records_file_dependency(scratch_pad: Pad) -> None:
+    with lektor.context.Context(pad=scratch_pad) as ctx:
+        assert scratch_pad.databags.lookup("testbag") == {"foo": "bar"}
+    assert not ctx.referenced_virtual_dependencies
+    assert any(dep.endswith("testbag.ini") for dep in ctx.referenced_dependencies)
+
+
+def test_databag_value_checksum_tracks_value(scratch_project_data, scratch_env):
+    testbag_ini = scratch_project_data / "databags/testbag.ini"
+    testbag_ini.write_text("foo = bar\nother = 1\n")
+    pad = scratch_env.new_pad()
+    checksum = pad.get("/@databag/testbag.foo").get_checksum(None)
+
+    testbag_ini.write_text("foo = bar\nother = 2\n")
+    pad = scratch_env.new_pad()
+    assert pad.get("/@databag/testbag.foo").get_checksum(None) == checksum
+
+    testbag_ini.write_text("foo = baz\nother = 2\n")
+    pad = scratch_env.new_pad()
+    assert pad.get("/@databag/testbag.foo").get_checksum(None) != checksum
+
+
+def test_databags_are_parsed_once(scratch_env, mocker):
+    load_databag = mocker.spy(lektor.databags, "load_databag")
+    for _ in range(2):
+        assert scratch_env.new_pad().databags.lookup("testbag.foo") == "bar"
+    assert load_databag.call_count == 1
+
+
+def test_databag_values_are_read_only(scratch_project_data, scratch_env):
+    scratch_project_data.joinpath("databags/nested.json").write_text(
+        '{"items": [1, 2], "sub": {"a": 1}}', encoding="utf-8"
+    )
+    bag = scratch_env.new_pad().databags.get_bag("nested")
+    with pytest.raises(TypeError):
+        bag["items"].append(3)
+    with pytest.raises(TypeError):
+        bag["sub"]["b"] = 2
+    assert copy.deepcopy(bag) == {"items": [1, 2], "sub": {"a": 1}}
+    assert scratch_env.new_pad().databags.lookup("nested.items") == [1, 2]
+
+
+def test_databag_merged_from_several_files(scratch_project_data, scratch_env):
+    databags = scratch_project_data / "databags"
+    databags.joinpath("merged.json").write_text('{"sub": {"a": 1}}', encoding="utf-8")
+    databags.joinpath("merged.ini").write_text("sub.b = 2", encoding="utf-8")
+    for _ in range(2):
+        pad = scratch_env.new_pad()
+        assert pad.databags.get_bag("merged") == {"sub": {"a": 1, "b": "2"}}
+
+
+def test_databag_cache_evicts_least_recently_used(
+    scratch_project_data, scratch_env, mocker
+):
+    scratch_project_data.joinpath("databags/other.ini").write_text(
+        "foo = baz", encoding="utf-8"
+    )
+    mocker.patch("lektor.databags.DATABAG_CACHE_SIZE", 1)
+    mocker.patch("lektor.databags._databag_cache", lektor.databags._DatabagCache())
+    load_databag = mocker.spy(lektor.databags, "load_databag")
+    for bag in "testbag", "testbag", "other", "testbag":
+        scratch_env.new_pad().databags.lookup(f"{bag}.foo")
+    assert load_databag.call_count == 3
+
+
+def test_templates_are_cached_on_disk(scratch_project, compile_template, mocker):
+    compile_template("{{ 1 + 1 }}", "cached.html")
+    cache_path = scratch_project.get_template_cache_path()
+
+    env = Environment(scratch_project, load_plugins=False)
+    assert env.jinja_env.get_template("cached.html").render() == "2"
+    (cache_file,) = cache_path.iterdir()
+
+    # A new environment reuses the cached bytecode
+    env = Environment(scratch_project, load_plugins=False)
+    compile = mocker.spy(env.jinja_env, "compile")
+    assert env.jinja_env.get_template("cached.html").render() == "2"
+    compile.assert_not_called()
+
+    # Registering a new filter changes the cache key
+    env = Environment(scratch_project, load_plugins=False)
+    env.jinja_env.filters["newfilter"] = str
+    env.jinja_env.get_template("cached.html")
+    assert {p.name for p in cache_path.iterdir()} > {cache_file.name}
+
+
+def test_template_cache_warm_for_all_templates(project, tmp_path, mocker):
+    # Loading all of the demo project's templates in a new environment
+    # compiles none of them once the bytecode cache is warm.
+    mocker.patch.object(
+        project, "get_template_cache_path", return_value=tmp_path / "templates"
+    )
+    dump_bytecode = mocker.spy(TemplateBytecodeCache, "dump_bytecode")
+
+    def load_all_templates():
+        env = Environment(project, load_plugins=False)
+        compile = mocker.spy(env.jinja_env, "compile")
+        names = env.jinja_env.list_templates()
+        for name in names:
+            env.jinja_env.get_template(name)
+        return names, compile
+
+    names, compile = load_all_templates()
+    assert compile.call_count == dump_bytecode.call_count == len(names) > 0
+
+    dump_bytecode.reset_mock()
+    _, compile = load_all_templates()
+    compile.assert_not_called()
+    dump_bytecode.assert_not_called()
+
+
+@pytest.fixture
+def fragment_template(scratch_env):
+    calls = []
+
+    def count():
+        calls.append(None)
+        return len(calls)
+
+    template = scratch_env.jinja_env.from_string(
+        "{% cache 'nav', persistent=persistent %}"
+        "{{ count() }}:{{ site.get('/sub-page').title }}"
+        "{% endcache %}"
+    )
+    return template, count
+
+
+def test_cache_tag_memoizes_fragment_per_pad(scratch_env, fragment_template):
+    template, count = fragment_template
+    pad = scratch_env.new_pad()
+    with lektor.context.Context(pad=pad):
+        assert template.render(count=count, persistent=False) == "1:Subpage"
+    with lektor.context.Context(pad=pad) as ctx:
+        assert template.render(count=count, persistent=False) == "1:Subpage"
+    assert any(
+        dep.endswith(os.path.join("sub-page", "contents.lr"))
+        for dep in ctx.referenced_dependencies
+    )
+
+    with lektor.context.Context(pad=scratch_env.new_pad()):
+        assert template.render(count=count, persistent=False) == "2:Subpage"
+    # Without a context, fragments are not cached
+    assert template.render(count=count, persistent=False, site=pad) == "3:Subpage"
+
+
+def test_cache_tag_persistent_fragment(
+    scratch_env, scratch_project_data, fragment_template
+):
+    template, count = fragment_template
+
+    def render():
+        with lektor.context.Context(pad=scratch_env.new_pad()):
+            return template.render(count=count, persistent=True)
+
+    assert render() == "1:Subpage"
+    assert render() == "1:Subpage"
+
+    subpage_lr = scratch_project_data / "content/sub-page/contents.lr"
+    subpage_lr.write_text("_model: page\n---\ntitle: Changed title\n")
+    assert render() == "2:Changed title"
+
+
+def test_cache_tag_persistent_fragment_template_changed(
+    scratch_project_data, scratch_env
+):
+    nav_html = scratch_project_data / "templates/nav.html"
+    nav_html.write_text("{% cache 'nav', persistent=true %}OLD{% endcache %}")
+
+    def render():
+        with lektor.context.Context(pad=scratch_env.new_pad()):
+            return scratch_env.jinja_env.get_template("nav.html").render()
+
+    assert render() == "OLD"
+    nav_html.write_text("{% cache 'nav', persistent=true %}NEW{% endcache %}")
+    mtime = nav_html.stat().st_mtime + 2
+    os.utime(nav_html, (mtime, mtime))
+    assert render() == "NEW"
+
+
+def test_cache_tag_persistent_fragments_evicted(scratch_env, monkeypatch):
+    extension = scratch_env.jinja_env.extensions[
+        "lektor.environment.fragment_cache.FragmentCacheExtension"
+    ]
+    monkeypatch.setattr(extension, "_persistent_fragments", LRUCache(2))
+    calls = []
+    template = scratch_env.jinja_env.from_string(
+        "{% cache key, persistent=true %}{{ calls.append(key) or key }}{% endcache %}"
+    )
+
+    def render(key):
+        with lektor.context.Context(pad=scratch_env.new_pad()):
+            return template.render(key=key, calls=calls)
+
+    for key in "a", "b", "a", "c", "a", "b":
+        assert render(key) == key
+    # "b" was the least recently used fragment when "c" was added
+    assert calls == ["a", "b", "c", "b"]
+
+
+@pytest.mark.parametrize(
+    "url_style, expected",
+    [
+        ("relative", {"": "./", "a": "../", "a/b": "../../"}),
+        ("absolute", {"": "/", "a": "/", "a/b": "/"}),
+    ],
+)
+@pytest.mark.usefixtures("save_sys_path")
+def test_cache_tag_fragment_urls(scratch_project_data, tmp_path, url_style, expected):
+    project_file = scratch_project_data / "Scratch.lektorproject"
+    project_file.write_text(
+        project_file.read_text("utf-8").replace(
+            "[project]\n", f"[project]\nurl_style = {url_style}\n"
+        ),
+        "utf-8",
+    )
+    (scratch_project_data / "templates/page.html").write_text(
+        "{% cache 'nav' %}{{ '/'|url }}{% endcache %}", "utf-8"
+    )
+    for path in expected:
+        if path:
+            contents_lr = scratch_project_data / "content" / path / "contents.lr"
+            contents_lr.parent.mkdir(parents=True, exist_ok=True)
+            contents_lr.write_text("_model: page\n", "utf-8")
+
+    env = Environment(Project.from_path(scratch_project_data))
+    output_path = tmp_path / "output"
+    Builder(env.new_pad(), os.fspath(output_path)).build_all()
+    assert {
+        path: output_path.joinpath(path, "index.html").read_text("utf-8").strip()
+        for path in expected
+    } == expected
+
+
+def test_template_profiler(scratch_project_data, scratch_env):
+    templates = scratch_project_data / "templates"
+    (templates / "macros.html").write_text(
+        "{% macro title(path) %}{{ site.get(path).title }}{% endmacro %}"
+    )
+    (templates / "footer.html").write_text("<footer></footer>")
+    (templates / "profiled.html").write_text(
+        "{% from 'macros.html' import title %}"
+        "{% block body %}{{ title('/') }}{{ title('/') }}{% endblock %}"
+        "{% include 'footer.html' %}"
+    )
+    profiler = scratch_env.jinja_env.profiler = TemplateProfiler()
+    pad = scratch_env.new_pad()
+    with lektor.context.Context(pad=pad):
+        rv = scratch_env.render_template("profiled.html", pad=pad)
+    assert rv == "IndexIndex<footer></footer>"
+
+    stats = {(s.kind, s.name): s for s in profiler.get_stats()}
+    assert set(stats) == {
+        ("template", "profiled.html"),
+        ("block", "profiled.html:body"),
+        ("import", "macros.html"),
+        ("include", "macros.html"),
+        ("macro", "macros.html:title"),
+        ("include", "footer.html"),
+    }
+    template = stats["template", "profiled.html"]
+    macro = stats["macro", "macros.html:title"]
+    assert template.calls == 1
+    assert macro.calls == 2
+    assert template.inclusive_time >= template.exclusive_time
+    assert (
+        template.inclusive_time >= stats["block", "profiled.html:body"].inclusive_time
+    )
+    # The root record is loaded once, by the first macro call.
+    assert macro.inclusive_records == macro.exclusive_records == 1
+    assert template.inclusive_records == 1
+    assert template.exclusive_records == 0
+
+    assert [s["name"] for s in profiler.to_json()] == [
+        s.name for s in profiler.get_stats()
+    ]
+    assert "macros.html:title" in profiler.format_report()
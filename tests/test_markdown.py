@@ -1,5 +1,7 @@
+import os
 import re
 import threading
+from pathlib import Path
 
 import pytest
 from markupsafe import Markup
@@ -12,6 +14,7 @@ from lektor.markdown import make_markdown
 from lektor.markdown import Markdown
 from lektor.markdown import markdown_to_html
 from lektor.markdown import MISTUNE_VERSION
+from lektor.markdown.cache import MarkdownCache
 from lektor.markdown.controller import get_renderer_context
 from lektor.markdown.controller import RendererContext
 from lektor.markdown.controller import RendererHelper
@@ -469,6 +472,120 @@ def test_field_options_integration(record, field_options):
     assert markdown.meta["nlinks"] == 22
 
 
+@pytest.fixture
+def scratch_record(scratch_project_data, scratch_pad):
+    (scratch_project_data / "content/target/contents.lr").parent.mkdir()
+    (scratch_project_data / "content/target/contents.lr").write_text(
+        "_model: page\n---\ntitle: Target\n"
+    )
+    return scratch_pad.root
+
+
+def _render_in_new_build(env, source, field_options):
+    pad = env.new_pad()
+    with Context(pad=pad) as ctx:
+        controller = controller_class(env)
+        return controller.render(source, pad.root, field_options), ctx
+
+
+def test_render_cache_persists(scratch_env, field_options, mocker):
+    render = mocker.spy(controller_class, "_render")
+    result1, _ = _render_in_new_build(scratch_env, "*cached*", field_options)
+    result2, _ = _render_in_new_build(scratch_env, "*cached*", field_options)
+    assert result1 == result2
+    assert render.call_count == 1
+
+    _render_in_new_build(scratch_env, "*other*", field_options)
+    assert render.call_count == 2
+
+
+@pytest.mark.usefixtures("scratch_record")
+def test_render_cache_replays_dependencies(
+    scratch_env, scratch_project_data, field_options, mocker
+):
+    render = mocker.spy(controller_class, "_render")
+    source = "[link](target)"
+    target_lr = scratch_project_data / "content/target/contents.lr"
+
+    result1, ctx1 = _render_in_new_build(scratch_env, source, field_options)
+    result2, ctx2 = _render_in_new_build(scratch_env, source, field_options)
+    assert result2 == result1
+    assert render.call_count == 1
+    assert os.fspath(target_lr) in ctx1.referenced_dependencies
+    assert ctx2.referenced_dependencies == ctx1.referenced_dependencies
+
+    # Moving the target changes its URL.
+    target_lr.rename(target_lr.with_name("contents+de.lr"))
+    _render_in_new_build(scratch_env, source, field_options)
+    assert render.call_count == 2
+
+
+def test_render_cache_opt_out(scratch_env, field_options, mocker):
+    class UncacheablePlugin(Plugin):
+        name = "Uncacheable"
+
+        def on_markdown_config(self, config, **kwargs):
+            # pylint: disable=no-self-use
+            config.cacheable = False
+
+    scratch_env.plugin_controller.instanciate_plugin("uncacheable", UncacheablePlugin)
+    render = mocker.spy(controller_class, "_render")
+    _render_in_new_build(scratch_env, "text", field_options)
+    _render_in_new_build(scratch_env, "text", field_options)
+    assert render.call_count == 2
+
+
+@pytest.mark.usefixtures("link_counter_plugin")
+def test_render_cache_config_fingerprint(env):
+    fingerprint = controller_class(env).config_fingerprint
+    assert fingerprint is not None
+    assert fingerprint == controller_class(env).config_fingerprint
+    env.plugin_controller.instanciate_plugin("other-plugin", Plugin)
+    assert controller_class(env).config_fingerprint != fingerprint
+
+
+def _write_aged(cache, key, data, age):
+    # pylint: disable=protected-access
+    cache._write(key, data)
+    path = Path(cache.directory, key[:2], f"{key}.json")
+    mtime = path.stat().st_mtime - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_render_cache_prune_evicts_least_recently_used(tmp_path):
+    # pylint: disable=protected-access
+    _write_aged(MarkdownCache(tmp_path), "aa01", "x" * 10, 300)
+    _write_aged(MarkdownCache(tmp_path), "bb02", "x" * 10, 200)
+    _write_aged(MarkdownCache(tmp_path), "cc03", "x" * 10, 100)
+    # Reading an entry from disk marks it as recently used.
+    assert MarkdownCache(tmp_path)._read("aa01") is not None
+
+    cache = MarkdownCache(tmp_path)
+    assert (cache.stats().count, cache.stats().size) == (3, 30)
+    removed = cache.prune(15)
+    assert (removed.count, removed.size) == (2, 20)
+    assert cache._read("aa01") is not None
+    assert cache._read("bb02") is None
+    assert cache._read("cc03") is None
+
+
+def test_render_cache_evicts_beyond_max_size(tmp_path):
+    cache = MarkdownCache(tmp_path, max_size=25)
+    _write_aged(cache, "aa01", "x" * 10, 200)
+    _write_aged(cache, "bb02", "x" * 10, 100)
+    _write_aged(cache, "cc03", "x" * 10, 0)
+    assert not Path(tmp_path, "aa", "aa01.json").exists()
+    assert cache.stats().size == 20
+
+
+def test_render_cache_max_size(scratch_project_data, scratch_env):
+    assert controller_class(scratch_env).render_cache.max_size == 256 * 1024 * 1024
+    project_file = scratch_project_data / "Scratch.lektorproject"
+    with project_file.open("a") as fp:
+        fp.write("\n[project]\nmarkdown_cache_size = 0\n")
+    assert controller_class(scratch_env).render_cache.max_size is None
+
+
 ################################################################
 #
 # Tests for the bits that are provided for backward compatibility
@@ -6,6 +6,7 @@ import pytest
 from lektor.builder import Builder
 from lektor.context import Context
 from lektor.db import Database
+from lektor.db import SiblingIndex
 from lektor.db import Siblings
 from lektor.environment import Environment
 from lektor.project import Project
@@ -112,3 +113,31 @@ def test_prev_next_virtual_resolver(pntest_pad):
 
         with pytest.raises(NotImplementedError):
             _ = siblings.url_path
+
+
+def test_sibling_index_is_cached_per_pad(pntest_pad, mocker):
+    spy = mocker.spy(SiblingIndex, "__init__")
+    with Context(pad=pntest_pad):
+        for post_id in ("post1", "post2", "post4"):
+            pntest_pad.get(post_id).get_siblings()
+    assert spy.call_count == 1
+
+    with Context(pad=pntest_pad):
+        index = pntest_pad.get_sibling_index(pntest_pad.root)
+    assert len(index) == 3
+
+
+def test_sibling_index_get_neighbors(pntest_pad):
+    with Context(pad=pntest_pad):
+        index = pntest_pad.get_sibling_index(pntest_pad.root)
+        prev_page, next_page = index.get_neighbors(pntest_pad.get("post1"))
+        assert prev_page is None
+        assert next_page["_id"] == "post2"
+        assert index.get_neighbors(pntest_pad.root) == (None, None)
+
+
+def test_siblings_checksum(pntest_pad):
+    with Context(pad=pntest_pad):
+        assert pntest_pad.get("post1@siblings").get_checksum(None) == "|/post2"
+        assert pntest_pad.get("post2@siblings").get_checksum(None) == "/post1|/post4"
+        assert pntest_pad.get("post4@siblings").get_checksum(None) == "/post2|"
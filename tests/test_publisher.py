@@ -1,30 +1,39 @@
 import gc
+import hashlib
 import os
 import re
 import signal
 import sys
+import threading
 import warnings
 import weakref
 from contextlib import ExitStack
+from ftplib import error_perm
 from itertools import chain
 from pathlib import Path
 from shutil import which
 from subprocess import CalledProcessError
+from subprocess import CompletedProcess
 from subprocess import DEVNULL
 from subprocess import PIPE
 from subprocess import run
 
 import pytest
 
+import lektor.publisher
+from lektor.manifest import compute_manifest_entry
 from lektor.publisher import _CompatURLStr
 from lektor.publisher import _ssh_command
 from lektor.publisher import _ssh_key_file
 from lektor.publisher import Command
+from lektor.publisher import FtpConnection
+from lektor.publisher import FtpPublisher
 from lektor.publisher import GithubPagesPublisher
 from lektor.publisher import GitRepo
 from lektor.publisher import publish
 from lektor.publisher import Publisher
 from lektor.publisher import PublishError
+from lektor.publisher import RsyncPublisher
 from lektor.utils import locate_executable
 
 
@@ -435,6 +444,134 @@ def test_GitRepo_publish_ghpages_discard_history(
     assert upstream_repo.ls_files("gh-pages") == {"myfile"}
 
 
+def iter_work_tree_artifacts(work_tree):
+    for path in sorted(work_tree.rglob("*")):
+        name = path.relative_to(work_tree).as_posix()
+        if path.is_file() and not name.startswith(".lektor/"):
+            yield name, os.fspath(path), compute_manifest_entry(path).checksum
+
+
+def test_GitRepo_publish_ghpages_artifacts(publish_ghpages, upstream_repo, work_tree):
+    work_tree.joinpath("sub").mkdir()
+    work_tree.joinpath("sub/file").write_text("test\n")
+    work_tree.joinpath(".nojekyll").write_bytes(b"")
+    work_tree.joinpath("script").write_text("#!/bin/sh\n")
+    work_tree.joinpath("script").chmod(0o755)
+    lektor_dir = work_tree / ".lektor"
+    lektor_dir.mkdir()
+    lektor_dir.joinpath("buildstate").write_text("not published")
+
+    artifacts = list(iter_work_tree_artifacts(work_tree))
+    blobs = {}
+    for line in publish_ghpages(
+        upstream_repo.url, "gh-pages", artifacts=artifacts, blobs=blobs
+    ):
+        print(line)
+    assert upstream_repo.count_commits("gh-pages") == 1
+    assert upstream_repo.ls_files("gh-pages") == {".nojekyll", "script", "sub/file"}
+    assert upstream_repo.run(("ls-tree", "gh-pages", "script")).stdout.startswith(
+        "100755 "
+    )
+    assert set(blobs) == {checksum for _, _, checksum in artifacts}
+
+    work_tree.joinpath("sub/file").rename(work_tree / "renamed-file")
+    artifacts = list(iter_work_tree_artifacts(work_tree))
+    for line in publish_ghpages(
+        upstream_repo.url, "gh-pages", artifacts=artifacts, blobs=blobs
+    ):
+        print(line)
+    assert upstream_repo.count_commits("gh-pages") == 2
+    assert upstream_repo.ls_files("gh-pages") == {
+        ".nojekyll",
+        "renamed-file",
+        "script",
+    }
+
+    assert any(
+        "No changes" in line
+        for line in publish_ghpages(
+            upstream_repo.url, "gh-pages", artifacts=artifacts, blobs=blobs
+        )
+    )
+
+
+def test_GitRepo_publish_ghpages_artifacts_symlink(
+    publish_ghpages, upstream_repo, work_tree
+):
+    work_tree.joinpath("target").write_text("target\n")
+    work_tree.joinpath("link").symlink_to("target")
+    artifacts = list(iter_work_tree_artifacts(work_tree))
+    for line in publish_ghpages(upstream_repo.url, "gh-pages", artifacts=artifacts):
+        print(line)
+    assert upstream_repo.ls_files("gh-pages") == {"link", "target"}
+    assert upstream_repo.run(("ls-tree", "gh-pages", "link")).stdout.startswith(
+        "120000 "
+    )
+    assert upstream_repo.run(("show", "gh-pages:link")).stdout == "target"
+
+
+def test_GitRepo_publish_ghpages_artifacts_dir_symlink(
+    publish_ghpages, upstream_repo, work_tree
+):
+    work_tree.joinpath("real").mkdir()
+    work_tree.joinpath("real/file").write_text("file\n")
+    work_tree.joinpath("linkdir").symlink_to("real", target_is_directory=True)
+    artifacts = [
+        *iter_work_tree_artifacts(work_tree),
+        (
+            "linkdir",
+            os.fspath(work_tree / "linkdir"),
+            hashlib.sha1(b"real").hexdigest(),
+        ),
+    ]
+    for line in publish_ghpages(upstream_repo.url, "gh-pages", artifacts=artifacts):
+        print(line)
+    assert upstream_repo.ls_files("gh-pages") == {"linkdir", "real/file"}
+    assert upstream_repo.run(("ls-tree", "gh-pages", "linkdir")).stdout.startswith(
+        "120000 "
+    )
+    assert upstream_repo.run(("show", "gh-pages:linkdir")).stdout == "real"
+
+
+def test_GitRepo_publish_ghpages_reuses_blobs(
+    publish_ghpages, upstream_repo, work_tree, mocker
+):
+    work_tree.joinpath("unchanged").write_text("unchanged")
+    work_tree.joinpath("changed").write_text("old")
+    blobs = {}
+    artifacts = list(iter_work_tree_artifacts(work_tree))
+    for line in publish_ghpages(
+        upstream_repo.url, "gh-pages", artifacts=artifacts, blobs=blobs
+    ):
+        print(line)
+
+    hash_objects = mocker.spy(GitRepo, "hash_objects")
+    work_tree.joinpath("changed").write_text("new")
+    artifacts = list(iter_work_tree_artifacts(work_tree))
+    for line in publish_ghpages(
+        upstream_repo.url, "gh-pages", artifacts=artifacts, blobs=blobs
+    ):
+        print(line)
+    hash_objects.assert_called_once_with(mocker.ANY, [str(work_tree / "changed")])
+    assert upstream_repo.run(("show", "gh-pages:changed")).stdout == "new"
+    assert upstream_repo.run(("show", "gh-pages:unchanged")).stdout == "unchanged"
+
+
+def test_GitRepo_publish_ghpages_rehashes_missing_blobs(
+    publish_ghpages, upstream_repo, work_tree
+):
+    work_tree.joinpath("myfile").write_text("contents")
+    artifacts = list(iter_work_tree_artifacts(work_tree))
+    # A blob which is not in the (fresh) repository
+    blobs = {artifacts[0][2]: "0123456789abcdef0123456789abcdef01234567"}
+    for line in publish_ghpages(
+        upstream_repo.url, "gh-pages", None, False, artifacts=artifacts, blobs=blobs
+    ):
+        print(line)
+    assert upstream_repo.run(("show", "gh-pages:myfile")).stdout == "contents"
+    assert blobs[artifacts[0][2]] != "0123456789abcdef0123456789abcdef01234567"
+
+
 @pytest.fixture
 def output_path(tmp_path):
     return str(tmp_path / "output_path")
@@ -484,13 +621,42 @@ def test_GithubPagesPublisher_publish(
         repo.set_https_credentials.assert_called_once_with({})
     else:
         repo.set_ssh_credentials.assert_called_once_with({})
-    repo.publish_ghpages.assert_called_once_with(*publish_args)
+    repo.publish_ghpages.assert_called_once_with(*publish_args, artifacts=[], blobs={})
     if warns:
         assert "WARNING" in " ".join(output)
         output = output[-1:]
     assert output == ["Published!"]
 
 
+def test_GithubPagesPublisher_publish_records_blobs(scratch_builder, mocker):
+    scratch_builder.build_all()
+    output = Path(scratch_builder.destination_path)
+    output.joinpath(".nojekyll").write_bytes(b"")
+    output.joinpath("sub/.lektor").mkdir(parents=True)
+    output.joinpath("sub/.lektor/nested").write_bytes(b"")
+    output.joinpath("linkdir").symlink_to("sub", target_is_directory=True)
+    ghp_publisher = GithubPagesPublisher(scratch_builder.env, os.fspath(output))
+
+    def publish_ghpages(*args, artifacts, blobs):
+        for _, _, checksum in artifacts:
+            blobs.setdefault(checksum, f"oid-{checksum}")
+        yield "Published!"
+
+    GitRepo = mocker.patch("lektor.publisher.GitRepo", spec_set=True)
+    repo = GitRepo.return_value.__enter__.return_value
+    repo.publish_ghpages.side_effect = publish_ghpages
+    ghp_publisher.manifest.set_git_blobs({"stale": "oid-stale"})
+
+    assert list(ghp_publisher.publish("ghpages://owner/project")) == ["Published!"]
+    artifacts = repo.publish_ghpages.call_args.kwargs["artifacts"]
+    names = {artifact_name for artifact_name, _, _ in artifacts}
+    assert {"index.html", ".nojekyll", "sub/.lektor/nested", "linkdir"} <= names
+    assert not any(name.startswith(".lektor/") for name in names)
+    assert ghp_publisher.manifest.get_git_blobs() == {
+        checksum: f"oid-{checksum}" for _, _, checksum in artifacts
+    }
+
+
 @pytest.mark.usefixtures("no_utils")
 def test_GithubPagesPublisher_publish_fails_if_no_git(ghp_publisher):
     target_url = "ghpages://owner/project"
@@ -661,3 +827,384 @@ def test_CompatURLStr_works_as_URL():
         warnings.filterwarnings("ignore", "'werkzeug", DeprecationWarning)
         assert dict(url.decode_query()) == {"foo": "bar"}
     assert w[0].filename == __file__
+
+
+class DummyFtpServer:
+    """The state of a fake FTP server, shared by its connections."""
+
+    def __init__(self, max_connections=None):
+        self.max_connections = max_connections
+        self.files = {}
+        self.commands = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        # Errors to raise (once) when storing files
+        self.store_errors = {}
+
+
+class DummyFtp:
+    # pylint: disable=no-self-use,unused-argument
+
+    def __init__(self, server):
+        self.server = server
+
+    def _command(self, command):
+        with self.server.lock:
+            self.server.commands.append(command)
+
+    def connect(self, host, port):
+        with self.server.lock:
+            if self.server.connections == self.server.max_connections:
+                raise ConnectionRefusedError("Too many connections")
+            self.server.connections += 1
+        return "220 Welcome"
+
+    def login(self, **credentials):
+        return "230 Logged in"
+
+    def set_pasv(self, passive):
+        pass
+
+    def cwd(self, path):
+        return "250 OK"
+
+    def mkd(self, path):
+        pass
+
+    def storbinary(self, cmd, fp, blocksize=8192):
+        self._command(cmd)
+        verb, filename = cmd.split(" ", 1)
+        with self.server.lock:
+            error = self.server.store_errors.pop(filename, None)
+            if error is not None:
+                raise error
+            if verb == "APPE":
+                self.server.files.setdefault(filename, b"")
+                self.server.files[filename] += fp.read()
+            else:
+                self.server.files[filename] = fp.read()
+
+    def retrbinary(self, cmd, callback):
+        self._command(cmd)
+        filename = cmd.split(" ", 1)[1]
+        with self.server.lock:
+            data = self.server.files.get(filename)
+        if data is None:
+            raise error_perm("550 No such file")
+        callback(data)
+
+    def rename(self, src, dst):
+        self._command(f"RNFR {src}")
+        with self.server.lock:
+            self.server.files[dst] = self.server.files.pop(src)
+
+    def delete(self, filename):
+        with self.server.lock:
+            self.server.files.pop(filename.decode("utf-8"), None)
+
+    def rmd(self, filename):
+        pass
+
+    def quit(self):
+        with self.server.lock:
+            self.server.connections -= 1
+
+
+@pytest.fixture
+def ftp_server():
+    return DummyFtpServer()
+
+
+@pytest.fixture
+def ftp_publisher(env, tmp_path, ftp_server):
+    class DummyFtpConnection(FtpConnection):
+        @staticmethod
+        def make_connection():
+            return DummyFtp(ftp_server)
+
+    class DummyFtpPublisher(FtpPublisher):
+        connection_class = DummyFtpConnection
+
+    output = tmp_path / "output"
+    output.mkdir()
+    for n in range(10):
+        path = output / f"dir{n % 3}" / f"file{n}.txt"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"content %d" % n)
+    return DummyFtpPublisher(env, output)
+
+
+def test_FtpPublisher_publish(ftp_publisher, ftp_server):
+    log = list(ftp_publisher.publish("ftp://example.org/?connections=3"))
+    assert "000 Uploading over 3 connection(s)" in log
+    assert sum(line.startswith("000 Updating ") for line in log) == 10
+    assert log[-1] == "000 All done!"
+    assert ftp_server.connections == 0
+
+    output = Path(ftp_publisher.output_path)
+    for n in range(10):
+        filename = f"dir{n % 3}/file{n}.txt"
+        assert ftp_server.files[filename] == output.joinpath(filename).read_bytes()
+    listing = ftp_server.files[".lektor/listing"].decode("utf-8").splitlines()
+    assert sorted(line.split("|")[0] for line in listing) == sorted(
+        f"dir{n % 3}/file{n}.txt" for n in range(10)
+    )
+    # The listing is not appended to per artifact.
+    assert not any(cmd.startswith("APPE ") for cmd in ftp_server.commands)
+
+
+def test_FtpPublisher_publish_uploads_changed(ftp_publisher, ftp_server):
+    list(ftp_publisher.publish("ftp://example.org/"))
+    output = Path(ftp_publisher.output_path)
+    output.joinpath("dir1/file1.txt").write_bytes(b"changed")
+    output.joinpath("dir2/file2.txt").unlink()
+    ftp_server.commands.clear()
+
+    log = list(ftp_publisher.publish("ftp://example.org/"))
+    assert [line for line in log if line.startswith("000 Updating ")] == [
+        "000 Updating dir1/file1.txt"
+    ]
+    assert ftp_server.files["dir1/file1.txt"] == b"changed"
+    assert "dir2/file2.txt" not in ftp_server.files
+
+
+def test_FtpPublisher_publish_limited_connections(ftp_publisher, ftp_server):
+    ftp_server.max_connections = 2
+    log = list(ftp_publisher.publish("ftp://example.org/?connections=5"))
+    assert "000 Uploading over 2 connection(s)" in log
+    assert log[-1] == "000 All done!"
+    assert sum(name.endswith(".txt") for name in ftp_server.files) == 10
+
+
+def test_FtpPublisher_publish_appends_listing_in_batches(ftp_publisher, ftp_server):
+    ftp_publisher.listing_flush_count = 3
+    list(ftp_publisher.publish("ftp://example.org/?connections=2"))
+    appends = [cmd for cmd in ftp_server.commands if cmd.startswith("APPE ")]
+    assert 1 <= len(appends) <= 3
+
+
+def test_FtpPublisher_publish_interrupted(ftp_publisher, ftp_server):
+    ftp_publisher.listing_flush_count = 2
+    # Fail while uploading the eighth artifact
+    failing = [name for name, _, _ in ftp_publisher.iter_artifacts()][7]
+    tmp_name = ftp_publisher.get_temp_filename(failing)
+    ftp_server.store_errors[tmp_name] = ConnectionResetError()
+    with pytest.raises(ConnectionResetError):
+        list(ftp_publisher.publish("ftp://example.org/?connections=1"))
+    listing = ftp_server.files[".lektor/listing"].decode("utf-8")
+    assert len(listing.splitlines()) >= 6
+
+    # The artifacts journaled to the listing are not uploaded again.
+    log = list(ftp_publisher.publish("ftp://example.org/?connections=1"))
+    updated = [line for line in log if line.startswith("000 Updating ")]
+    assert f"000 Updating {failing}" in updated
+    assert len(updated) <= 4
+    listing = ftp_server.files[".lektor/listing"].decode("utf-8")
+    assert len(listing.splitlines()) == 10
+
+
+def test_FtpPublisher_publish_failed_upload_retried(ftp_publisher, ftp_server):
+    ftp_server.store_errors["dir1/.file1.txt.tmp"] = error_perm("553 Not allowed")
+    log = list(ftp_publisher.publish("ftp://example.org/"))
+    assert "553 Not allowed" in log
+    assert "dir1/file1.txt" not in ftp_server.files
+    listing = ftp_server.files[".lektor/listing"].decode("utf-8")
+    assert "dir1/file1.txt|" not in listing
+
+    log = list(ftp_publisher.publish("ftp://example.org/"))
+    assert [line for line in log if line.startswith("000 Updating ")] == [
+        "000 Updating dir1/file1.txt"
+    ]
+    assert "dir1/file1.txt" in ftp_server.files
+
+
+def test_FtpPublisher_publish_invalid_connections(ftp_publisher):
+    with pytest.raises(PublishError, match="must be a number"):
+        list(ftp_publisher.publish("ftp://example.org/?connections=many"))
+
+
+@pytest.fixture
+def built_publisher(scratch_builder):
+    scratch_builder.build_all()
+    return Publisher(scratch_builder.env, scratch_builder.destination_path)
+
+
+def test_Publisher_iter_artifacts_uses_manifest(built_publisher, mocker):
+    list(built_publisher.iter_artifacts())
+    compute = mocker.spy(lektor.publisher, "compute_manifest_entry")
+    artifacts = list(built_publisher.iter_artifacts())
+    assert "index.html" in {artifact_name for artifact_name, _, _ in artifacts}
+    assert compute.call_count == 0
+
+    output = Path(built_publisher.output_path)
+    output.joinpath("extra.txt").write_bytes(b"extra")
+    artifacts = list(built_publisher.iter_artifacts())
+    assert (
+        "extra.txt",
+        os.fspath(output / "extra.txt"),
+        hashlib.sha1(b"extra").hexdigest(),
+    ) in artifacts
+    assert compute.call_count == 1
+
+    # Computed checksums are stored in the manifest
+    list(built_publisher.iter_artifacts())
+    assert compute.call_count == 1
+
+
+def test_Publisher_iter_artifacts_dir_links(built_publisher):
+    output = Path(built_publisher.output_path)
+    output.joinpath("real").mkdir()
+    output.joinpath("real/file").write_bytes(b"file")
+    output.joinpath("linkdir").symlink_to("real", target_is_directory=True)
+
+    names = {artifact_name for artifact_name, _, _ in built_publisher.iter_artifacts()}
+    assert "real/file" in names
+    assert not any(name.startswith("linkdir") for name in names)
+
+    artifacts = list(built_publisher.iter_artifacts(include_dir_links=True))
+    assert (
+        "linkdir",
+        os.fspath(output / "linkdir"),
+        hashlib.sha1(b"real").hexdigest(),
+    ) in artifacts
+    assert not any(name.startswith("linkdir/") for name, _, _ in artifacts)
+
+
+def test_Publisher_changed_artifacts(built_publisher):
+    target_url = "rsync://example.org/path"
+    output = Path(built_publisher.output_path)
+    artifacts = {
+        artifact_name: checksum
+        for artifact_name, _, checksum in built_publisher.iter_changed_artifacts(
+            target_url
+        )
+    }
+    assert "index.html" in artifacts
+    built_publisher.record_published(target_url, artifacts)
+    assert not list(built_publisher.iter_changed_artifacts(target_url))
+    assert not list(built_publisher.iter_removed_artifacts(target_url))
+
+    output.joinpath("index.html").write_bytes(b"changed")
+    output.joinpath("de/index.html").unlink()
+    changed = built_publisher.iter_changed_artifacts(target_url)
+    assert [artifact_name for artifact_name, _, _ in changed] == ["index.html"]
+    removed = built_publisher.iter_removed_artifacts(target_url)
+    assert list(removed) == ["de/index.html"]
+
+    # Other targets are independent
+    changed = built_publisher.iter_changed_artifacts("rsync://example.org/other")
+    assert len(list(changed)) == len(artifacts) - 1
+
+
+class DummyRsync:
+    """Stands in for rsync, recording the command lines and the files listed
+    in --files-from.
+    """
+
+    def __init__(self, returncode=0):
+        self.returncode = returncode
+        self.arglines = []
+        self.files_from = []
+
+    def __call__(self, argline, env=None):
+        self.arglines.append(argline)
+        if "--files-from" in argline:
+            files_from = argline[argline.index("--files-from") + 1]
+            with open(files_from, encoding="utf-8") as f:
+                self.files_from.append(f.read().split("\0")[:-1])
+        return self.run(argline)
+
+    def run(self, argline):
+        yield "rsync output"
+        return CompletedProcess(argline, self.returncode)
+
+
+@pytest.fixture
+def dummy_rsync(mocker):
+    rsync = DummyRsync()
+    mocker.patch("lektor.publisher.Command", side_effect=rsync)
+    return rsync
+
+
+@pytest.fixture
+def rsync_publisher(scratch_builder):
+    scratch_builder.build_all()
+    return RsyncPublisher(scratch_builder.env, scratch_builder.destination_path)
+
+
+def test_RsyncPublisher_publish_not_incremental(rsync_publisher, dummy_rsync):
+    target_url = "rsync://example.org/path"
+    for _ in range(2):
+        list(rsync_publisher.publish(target_url))
+    assert len(dummy_rsync.arglines) == 2
+    assert not any("--files-from" in argline for argline in dummy_rsync.arglines)
+    assert rsync_publisher.manifest.get_deploys_since_full(target_url) is None
+
+
+def test_RsyncPublisher_publish_incremental(rsync_publisher, dummy_rsync):
+    target_url = "rsync://example.org/path?incremental&delete"
+    list(rsync_publisher.publish(target_url))
+    assert "--files-from" not in dummy_rsync.arglines[-1]
+    assert "--delete-after" in dummy_rsync.arglines[-1]
+
+    output = Path(rsync_publisher.output_path)
+    output.joinpath("index.html").write_text("changed", "utf-8")
+    output.joinpath("de/index.html").unlink()
+    list(rsync_publisher.publish(target_url))
+    assert dummy_rsync.files_from == [["index.html", "de/index.html"]]
+    assert "--delete-missing-args" in dummy_rsync.arglines[-1]
+    assert "--delete-after" not in dummy_rsync.arglines[-1]
+
+    log = list(rsync_publisher.publish(target_url))
+    assert log == ["Nothing changed since the last deploy."]
+    assert len(dummy_rsync.arglines) == 2
+
+
+def test_RsyncPublisher_publish_incremental_without_delete(
+    rsync_publisher, dummy_rsync
+):
+    target_url = "rsync://example.org/path?incremental"
+    list(rsync_publisher.publish(target_url))
+    Path(rsync_publisher.output_path, "de/index.html").unlink()
+    list(rsync_publisher.publish(target_url))
+    assert len(dummy_rsync.arglines) == 1
+
+
+def test_RsyncPublisher_publish_full_every(rsync_publisher, dummy_rsync):
+    target_url = "rsync://example.org/path?incremental&full_every=3"
+    index = Path(rsync_publisher.output_path, "index.html")
+    for n in range(7):
+        index.write_text(f"version {n}", "utf-8")
+        list(rsync_publisher.publish(target_url))
+    full = ["--files-from" not in argline for argline in dummy_rsync.arglines]
+    assert full == [True, False, False, True, False, False, True]
+
+
+def test_RsyncPublisher_publish_failed(rsync_publisher, dummy_rsync):
+    target_url = "rsync://example.org/path?incremental"
+    dummy_rsync.returncode = 1
+    list(rsync_publisher.publish(target_url))
+    assert rsync_publisher.manifest.get_deploys_since_full(target_url) is None
+
+    dummy_rsync.returncode = 0
+    list(rsync_publisher.publish(target_url))
+    assert "--files-from" not in dummy_rsync.arglines[-1]
+    assert rsync_publisher.manifest.get_deploys_since_full(target_url) == 0
+
+
+@pytest.mark.skipif(
+    which("rsync") is None, reason="rsync is not available on this system"
+)
+def test_RsyncPublisher_incremental_integration(rsync_publisher, tmp_path):
+    target_path = tmp_path / "target"
+    target_path.mkdir()
+    target = f"rsync://{target_path.resolve()}?delete=yes&incremental=yes"
+    list(rsync_publisher.publish(target))
+    assert target_path.joinpath("de/index.html").is_file()
+
+    output = Path(rsync_publisher.output_path)
+    output.joinpath("index.html").write_text("changed", "utf-8")
+    output.joinpath("de/index.html").unlink()
+    list(rsync_publisher.publish(target))
+    assert target_path.joinpath("index.html").read_text("utf-8") == "changed"
+    assert not target_path.joinpath("de/index.html").exists()
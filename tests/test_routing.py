@@ -0,0 +1,154 @@
+import time
+
+import pytest
+
+from lektor.context import Context
+from lektor.devserver import BackgroundBuilder
+from lektor.editor import make_editor_session
+from lektor.routing import RecordRoute
+from lektor.routing import RouteTable
+from lektor.routing import RouteTableCache
+
+
+@pytest.fixture
+def route_table(pad):
+    return RouteTable.build(pad)
+
+
+def _resolve_by_tree_walk(pad, alt, pieces):
+    with Context(pad=pad):
+        return pad.get_root(alt=alt).resolve_url_path(pieces)
+
+
+def test_record_routes_match_tree_walk(pad, route_table):
+    # pylint: disable=protected-access
+    routes = route_table._record_routes
+    assert len(routes) > 0
+    for (alt, key), route in routes.items():
+        if route is Ellipsis:
+            continue
+        pieces = key.split("/") if key else []
+        expected = _resolve_by_tree_walk(pad, alt, pieces)
+        with Context(pad=pad):
+            resolved = pad.get(route.path, alt=route.alt, page_num=route.page_num)
+        assert resolved == expected, key
+
+
+@pytest.mark.parametrize(
+    "alt, url_path, expected",
+    [
+        ("en", "", RecordRoute("/", "en", None)),
+        ("en", "projects", RecordRoute("/projects", "en", 1)),
+        ("en", "projects/page/2", RecordRoute("/projects", "en", 2)),
+        ("en", "projects/index.html", RecordRoute("/projects", "en", None)),
+        ("de", "projects/sklave", RecordRoute("/projects/slave", "de", None)),
+        ("en", "projects/page/99", None),
+        ("en", "missing", None),
+    ],
+)
+def test_lookup_record(route_table, alt, url_path, expected):
+    pieces = url_path.split("/") if url_path else []
+    assert route_table.lookup_record(alt, pieces) == expected
+
+
+def test_lookup_asset(route_table):
+    assert route_table.lookup_asset(["static", "demo.css"]) == ("static", "demo.css")
+    assert route_table.lookup_asset(["static", "missing.css"]) is None
+
+
+def test_ambiguous_routes_are_omitted(scratch_project_data, scratch_env):
+    for name in ("a", "b"):
+        page = scratch_project_data / "content" / name / "contents.lr"
+        page.parent.mkdir()
+        page.write_text("_slug: same\n", "utf-8")
+    pad = scratch_env.new_pad()
+
+    assert RouteTable.build(pad).lookup_record("en", ["same"]) is Ellipsis
+    # Resolution falls back to the tree walk
+    assert pad.resolve_url_path("/same/") is not None
+
+
+def test_custom_url_resolvers_disable_shadowable_routes(pad):
+    pad.env.urlresolver(lambda node, url_path: None)
+    try:
+        route_table = RouteTable.build(pad)
+    finally:
+        pad.env.custom_url_resolvers.pop()
+    assert route_table.lookup_record("en", ["projects", "index.html"]) is Ellipsis
+    assert route_table.lookup_record("en", ["projects"]) == RecordRoute(
+        "/projects", "en", 1
+    )
+
+
+@pytest.fixture
+def route_table_cache(env):
+    env.route_table_cache = cache = RouteTableCache()
+    yield cache
+    env.route_table_cache = None
+
+
+@pytest.mark.usefixtures("route_table_cache")
+def test_resolve_url_path_uses_route_table(pad, mocker):
+    assert len(pad.route_table) > 0
+    resolve_url_path = mocker.spy(type(pad.root), "resolve_url_path")
+    assert pad.resolve_url_path("/projects/coffee/")["_id"] == "coffee"
+    assert pad.resolve_url_path("/static/demo.css").url_path == "/static/demo.css"
+    resolve_url_path.assert_not_called()
+
+
+def test_route_table_cache(env, route_table_cache, mocker):
+    build = mocker.spy(RouteTable, "build")
+    assert env.new_pad().route_table is env.new_pad().route_table
+    assert build.call_count == 1
+
+    route_table_cache.invalidate()
+    env.new_pad().resolve_url_path("/")
+    assert build.call_count == 2
+
+
+def test_no_route_table_without_cache(pad, mocker):
+    build = mocker.spy(RouteTable, "build")
+    assert pad.resolve_url_path("/projects/coffee/")["_id"] == "coffee"
+    assert pad.resolve_url_path("/static/demo.css").url_path == "/static/demo.css"
+    assert pad.route_table is None
+    build.assert_not_called()
+
+
+@pytest.mark.slowtest
+@pytest.mark.usefixtures("route_table_cache")
+def test_resolution_latency(pad):
+    # Benchmark: resolving all URL paths through the route table should be
+    # significantly faster than walking the record tree for each.
+    url_paths = [
+        ("en", key.split("/") if key else [])
+        # pylint: disable=protected-access
+        for (alt, key), route in pad.route_table._record_routes.items()
+        if route is not Ellipsis and alt == "en"
+    ]
+
+    def time_it(resolve):
+        start = time.perf_counter()
+        for alt, pieces in url_paths:
+            assert resolve(alt, pieces) is not None
+        return time.perf_counter() - start
+
+    with Context(pad=pad):
+        walk_time = time_it(lambda alt, pieces: _resolve_by_tree_walk(pad, alt, pieces))
+        table_time = time_it(pad._resolve_record_route)
+    print(f"tree walk: {walk_time:.4f}s, route table: {table_time:.4f}s")
+    assert table_time < walk_time
+
+
+def test_editor_commit_invalidates_route_table_cache(env, route_table_cache, mocker):
+    invalidate = mocker.spy(route_table_cache, "invalidate")
+    pad = env.new_pad()
+    mocker.patch("lektor.editor.EditorSession._save_impl")
+    with make_editor_session(pad, "/projects/coffee") as editor:
+        editor.data["title"] = "Tea"
+    invalidate.assert_called_once()
+
+
+def test_background_builder_installs_route_table_cache(env, tmp_path):
+    background_builder = BackgroundBuilder(env, output_path=tmp_path)
+    assert isinstance(env.route_table_cache, RouteTableCache)
+    assert env.route_table_cache is background_builder.route_table_cache
@@ -1,12 +1,21 @@
+import gc
 import os
+import shutil
+import warnings
 from datetime import timedelta
 
 import pytest
 
+from lektor.context import Context
 from lektor.utils import locate_executable
+from lektor.videotools import _locate_executable
 from lektor.videotools import Dimensions
 from lektor.videotools import get_ffmpeg_quality
 from lektor.videotools import get_timecode
+from lektor.videotools import get_video_info
+from lektor.videotools import locate_video_executable
+from lektor.videotools import make_video_thumbnail
+from lektor.videotools import VideoInfoCache
 
 
 has_ffmpeg = locate_executable("ffmpeg")
@@ -159,3 +168,249 @@ def test_thumbnail_height(builder):
     assert (
         '<img src="test@t00-00-02_160x160_crop.jpg" width="160" height="160">' in html
     )
+
+
+def test_locate_video_executable(tmp_path, monkeypatch, mocker):
+    _locate_executable.cache_clear()
+    locate = mocker.patch(
+        "lektor.videotools.locate_executable", return_value="/bin/ffprobe"
+    )
+    assert locate_video_executable("ffprobe") == "/bin/ffprobe"
+    assert locate_video_executable("ffprobe") == "/bin/ffprobe"
+    assert locate.call_count == 1
+
+    monkeypatch.setenv("PATH", os.fspath(tmp_path))
+    locate_video_executable("ffprobe")
+    assert locate.call_count == 2
+    _locate_executable.cache_clear()
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    video_path = tmp_path / "test.mp4"
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), "demo-project/content/test.mp4"),
+        video_path,
+    )
+    return video_path
+
+
+@pytest.fixture
+def new_video_info_cache(builder):
+    def new_video_info_cache():
+        return VideoInfoCache(builder.connect_to_database)
+
+    return new_video_info_cache
+
+
+@pytest.mark.parametrize(
+    "info",
+    [
+        {"width": 320, "height": 180, "duration": timedelta(seconds=3.25)},
+        {"width": None, "height": None, "duration": None},
+    ],
+)
+def test_VideoInfoCache(new_video_info_cache, video_path, mocker, info):
+    compute = mocker.Mock(return_value=info)
+    cache = new_video_info_cache()
+    assert cache.get_video_info(video_path, compute) == info
+    assert cache.get_video_info(video_path, compute) == info
+    assert compute.call_count == 1
+
+    cache.flush()
+    assert new_video_info_cache().get_video_info(video_path, compute) == info
+    assert compute.call_count == 1
+
+    video_path.write_bytes(b"changed")
+    assert new_video_info_cache().get_video_info(video_path, compute) == info
+    assert compute.call_count == 2
+
+
+def test_VideoInfoCache_prune(new_video_info_cache, video_path):
+    info = {"width": 320, "height": 180, "duration": timedelta(seconds=3)}
+    cache = new_video_info_cache()
+    cache.get_video_info(video_path, lambda filename: info)
+    cache.flush()
+    video_path.unlink()
+    cache.prune()
+
+    con = cache._connect()
+    try:
+        assert con.execute("select * from video_info").fetchall() == []
+    finally:
+        con.close()
+
+
+def test_get_video_info_cached_within_build(builder, video_path, mocker):
+    info = {"width": 320, "height": 180, "duration": timedelta(seconds=3)}
+    probe = mocker.patch("lektor.videotools._get_video_info", return_value=info)
+    build_state = builder.new_build_state()
+    with Context(build_state.new_artifact("dummy-artifact")):
+        assert get_video_info(video_path) == info
+        assert get_video_info(video_path) == info
+    assert probe.call_count == 1
+
+    builder.video_info_cache.flush()
+    builder.video_info_cache = VideoInfoCache(builder.connect_to_database)
+    with Context(build_state.new_artifact("dummy-artifact")):
+        assert get_video_info(video_path) == info
+    assert probe.call_count == 1
+
+
+class FakeFfmpeg:
+    """Stands in for ffmpeg, creating (empty) output files."""
+
+    def __init__(self, max_seek=None, fail_batches=False):
+        self.max_seek = max_seek
+        self.fail_batches = fail_batches
+        self.cmdlines = []
+
+    def __call__(self, cmdline):
+        self.cmdlines.append(cmdline)
+        seeks = [cmdline[i + 1] for i, arg in enumerate(cmdline) if arg == "-ss"]
+        if self.fail_batches and len(seeks) > 1:
+            return 1
+        outputs = [arg for arg in cmdline if arg.endswith((".jpg", ".png"))]
+        for seek, output in zip(seeks, outputs, strict=True):
+            if self.max_seek is None or seek <= self.max_seek:
+                with open(output, "wb"):
+                    pass
+        return 0
+
+
+@pytest.fixture
+def fake_ffmpeg(mocker):
+    mocker.patch(
+        "lektor.videotools.locate_video_executable", return_value="/bin/ffmpeg"
+    )
+    mocker.patch(
+        "lektor.videotools.get_video_info",
+        return_value={"width": 320, "height": 180, "duration": timedelta(seconds=3)},
+    )
+
+    def fake_ffmpeg(**kwargs):
+        ffmpeg = FakeFfmpeg(**kwargs)
+        mocker.patch("lektor.videotools._run_ffmpeg", side_effect=ffmpeg)
+        return ffmpeg
+
+    return fake_ffmpeg
+
+
+@pytest.fixture
+def scratch_videos(scratch_project_data, video_path):
+    videos = []
+    for name in "test.mp4", "other.mp4":
+        path = scratch_project_data / "content" / name
+        shutil.copy(video_path, path)
+        videos.append(path)
+    return videos
+
+
+def build_video_thumbnails(builder, seeks_by_video):
+    build_state = builder.new_build_state()
+    with Context(build_state.new_artifact("dummy-artifact")) as ctx:
+        for video, seeks in seeks_by_video.items():
+            for seek in seeks:
+                make_video_thumbnail(
+                    ctx,
+                    os.fspath(video),
+                    "/" + video.name,
+                    timedelta(seconds=seek),
+                    width=160,
+                )
+    failures = {}
+    for artifact, build_func in ctx.sub_artifacts:
+        sub_ctx = builder.build_artifact(artifact, build_func)
+        if sub_ctx is not None and sub_ctx.exc_info is not None:
+            failures[artifact.artifact_name] = sub_ctx.exc_info[1]
+    return ctx.sub_artifacts, failures
+
+
+def test_make_video_thumbnail_batches_frames(
+    scratch_builder, scratch_videos, fake_ffmpeg
+):
+    ffmpeg = fake_ffmpeg()
+    video_path = scratch_videos[0]
+    artifacts, failures = build_video_thumbnails(
+        scratch_builder, {video_path: [0, 1, 2]}
+    )
+    assert not failures
+    assert len(ffmpeg.cmdlines) == 1
+    assert ffmpeg.cmdlines[0].count("-i") == 3
+    for artifact, _ in artifacts:
+        assert os.path.isfile(artifact.dst_filename)
+
+    # Only frames whose artifacts are not current are extracted.
+    os.unlink(artifacts[0][0].dst_filename)
+    ffmpeg.cmdlines.clear()
+    build_video_thumbnails(scratch_builder, {video_path: [0, 1, 2]})
+    assert len(ffmpeg.cmdlines) == 1
+    assert ffmpeg.cmdlines[0].count("-i") == 1
+
+
+def _get_frame_tmpdir(cmdline):
+    outputs = [arg for arg in cmdline if arg.endswith((".jpg", ".png"))]
+    return os.path.dirname(outputs[0])
+
+
+def test_make_video_thumbnail_removes_tmpdir(
+    scratch_builder, scratch_videos, fake_ffmpeg
+):
+    ffmpeg = fake_ffmpeg()
+    build_video_thumbnails(scratch_builder, {scratch_videos[0]: [0, 1, 2]})
+    assert not os.path.exists(_get_frame_tmpdir(ffmpeg.cmdlines[0]))
+
+
+def test_make_video_thumbnail_removes_tmpdir_of_skipped_frames(
+    scratch_builder, scratch_videos, fake_ffmpeg
+):
+    ffmpeg = fake_ffmpeg()
+    build_state = scratch_builder.new_build_state()
+    with Context(build_state.new_artifact("dummy-artifact")) as ctx:
+        for seek in 0, 1, 2:
+            make_video_thumbnail(
+                ctx,
+                os.fspath(scratch_videos[0]),
+                "/test.mp4",
+                timedelta(seconds=seek),
+                width=160,
+            )
+    # Only one of the frames is built, e.g. because building another
+    # artifact failed.
+    scratch_builder.build_artifact(*ctx.sub_artifacts[0])
+    tmpdir = _get_frame_tmpdir(ffmpeg.cmdlines[0])
+    assert os.path.isdir(tmpdir)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        del ctx
+        gc.collect()
+    assert not os.path.exists(tmpdir)
+    # The directory is not left for the TemporaryDirectory to clean up.
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+
+
+def test_make_video_thumbnail_batches_per_video(
+    scratch_builder, scratch_videos, fake_ffmpeg
+):
+    ffmpeg = fake_ffmpeg()
+    _, failures = build_video_thumbnails(
+        scratch_builder, {video: [0, 1] for video in scratch_videos}
+    )
+    assert not failures
+    assert sorted(cmdline.count("-i") for cmdline in ffmpeg.cmdlines) == [2, 2]
+
+
+@pytest.mark.parametrize("fail_batches", [False, True])
+def test_make_video_thumbnail_failure(
+    scratch_builder, scratch_videos, fake_ffmpeg, fail_batches
+):
+    fake_ffmpeg(max_seek="00:00:01", fail_batches=fail_batches)
+    artifacts, failures = build_video_thumbnails(
+        scratch_builder, {scratch_videos[0]: [0, 1, 2]}
+    )
+    assert list(failures) == ["test@t00-00-02_160.jpg"]
+    assert "Maybe the seek is outside" in str(failures["test@t00-00-02_160.jpg"])
+    for artifact, _ in artifacts:
+        if artifact.artifact_name not in failures:
+            assert os.path.isfile(artifact.dst_filename)